@@ -2,16 +2,23 @@
 
 from typing import Dict, List, Optional, Tuple
 
+# a ParameterizedTrader as the batch engine plays it: (alpha, beta)
+TraderParams = Tuple[float, float]
+
 class Personality:
     def propose_trade(self, player, others) -> Optional[Tuple[Dict[str,int],Dict[str,int]]]:
         raise NotImplementedError
     def accept_trade(self, receiver, offer_give:Dict[str,int], offer_get:Dict[str,int], proposer) -> bool:
         raise NotImplementedError
+    def bank_trade(self, player) -> Optional[Tuple[Dict[str,int],Dict[str,int]]]:
+        # bank/port trade to make after player trading, if any
+        return None
 
 class ParameterizedTrader(Personality):
-    def __init__(self, alpha: float, beta: float):
+    def __init__(self, alpha: float, beta: float, use_bank: bool = False):
         self.alpha = alpha
         self.beta  = beta
+        self.use_bank = use_bank
 
     def propose_trade(self, player, others):
         shortage, surplus = player.resource_delta()
@@ -31,3 +38,9 @@ class ParameterizedTrader(Personality):
         val_in  = sum(prices[r]*c for r,c in offer_give.items())
         val_out = sum(prices[r]*c for r,c in offer_get.items())
         return val_in >= self.beta * val_out
+
+    def bank_trade(self, player):
+        if not self.use_bank:
+            return None
+        from Trades import best_bank_trade
+        return best_bank_trade(player)
@@ -0,0 +1,315 @@
+# Analytics.py
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from Players import RESOURCES, RES_INDEX
+from BatchEngine import GOALS, GOAL_INDEX
+from Replay import Replay
+
+BANK = -1               # Trades.receiver of a bank/port trade
+NEVER = np.iinfo(np.int32).max   # Tiles.city of a tile that never became a city
+
+
+# -------------------------------------------------------------------
+# COLUMNAR TABLES
+# -------------------------------------------------------------------
+# one row per event; game indexes GameLog.rounds/winner, seat the
+# player's position in GameLog.names, rounds count from 1
+class Rolls(NamedTuple):
+    game: np.ndarray        # (n,) int64
+    round: np.ndarray       # (n,) int32
+    roll: np.ndarray        # (n,) int8
+
+    def take(self, idx) -> 'Rolls':
+        return Rolls(*(c[idx] for c in self))
+
+
+class Trades(NamedTuple):
+    game: np.ndarray        # (n,) int64
+    round: np.ndarray       # (n,) int32
+    giver: np.ndarray       # (n,) int8
+    receiver: np.ndarray    # (n,) int8, BANK for the bank
+    give: np.ndarray        # (n, 5) int16 counts in RESOURCES order
+    get: np.ndarray         # (n, 5) int16
+
+    def take(self, idx) -> 'Trades':
+        return Trades(*(c[idx] for c in self))
+
+
+class Builds(NamedTuple):
+    game: np.ndarray        # (n,) int64
+    round: np.ndarray       # (n,) int32
+    seat: np.ndarray        # (n,) int8
+    goal: np.ndarray        # (n,) int8 index into GOALS
+
+    def take(self, idx) -> 'Builds':
+        return Builds(*(c[idx] for c in self))
+
+
+class Tiles(NamedTuple):
+    game: np.ndarray        # (n,) int64
+    seat: np.ndarray        # (n,) int8
+    index: np.ndarray       # (n,) int32 position in the player's resource_sources
+    resource: np.ndarray    # (n,) int8 index into RESOURCES
+    dice: np.ndarray        # (n,) int8
+    added: np.ndarray       # (n,) int32 round built, 0 for initial tiles
+    city: np.ndarray        # (n,) int32 round upgraded, 0 if a city from the start, NEVER if never
+
+    def take(self, idx) -> 'Tiles':
+        return Tiles(*(c[idx] for c in self))
+
+
+class GameLog(NamedTuple):
+    names: List[str]        # seat names
+    rounds: np.ndarray      # (games,) rounds played
+    winner: np.ndarray      # (games,) winning seat, -1 for none
+    rolls: Rolls
+    trades: Trades
+    builds: Builds
+    tiles: Tiles
+
+    @property
+    def n_games(self) -> int:
+        return len(self.rounds)
+
+
+def _columns(rows: List[tuple], dtypes: Sequence) -> List[np.ndarray]:
+    """Transpose Python rows into one array per column."""
+    cols = list(zip(*rows)) if rows else [()] * len(dtypes)
+    return [np.array(c, dtype=dt) for c, dt in zip(cols, dtypes)]
+
+
+def _concat(chunks: List[np.ndarray], dtype, shape=()) -> np.ndarray:
+    return np.concatenate(chunks).astype(dtype, copy=False) if chunks else np.zeros((0,) + shape, dtype=dtype)
+
+
+# -------------------------------------------------------------------
+# EXPORT
+# -------------------------------------------------------------------
+def from_games(games: Iterable, names: Optional[List[str]] = None) -> GameLog:
+    """
+    Columns from recorded games: each a Replay, or the (rounds_log,
+    winner, initial_tiles) that test.simulate_game returns. Seats follow
+    names (default: the first game's initial_tiles order). This walks the
+    logs once in Python; the queries below never do.
+    """
+    rolls, trades, builds, tiles = [], [], [], []
+    rounds, winners = [], []
+    for g, game in enumerate(games):
+        if isinstance(game, Replay):
+            rounds_log, winner, initial = game, game.winner, game.initial_tiles()
+        else:
+            rounds_log, winner, initial = game
+        if names is None:
+            names = list(initial)
+        seat = {name: i for i, name in enumerate(names)}
+        seat['bank'] = BANK
+
+        # tiles are [game, seat, index, resource, dice, added, city], city patched on upgrade
+        owned: Dict[str, List[list]] = {name: [] for name in names}
+        for name, ts in initial.items():
+            for res, dice, is_city in ts:
+                owned[name].append([g, seat[name], len(owned[name]), RES_INDEX[res], dice, 0, 0 if is_city else NEVER])
+
+        n = 0
+        for e in rounds_log:
+            n = r = e['round']
+            rolls.append((g, r, e['roll']))
+            for giver, receiver, give, get in e['trades']:
+                trades.append((g, r, seat[giver], seat[receiver],
+                               [give.get(x, 0) for x in RESOURCES], [get.get(x, 0) for x in RESOURCES]))
+            for name, b in e['builds']:
+                builds.append((g, r, seat[name], GOAL_INDEX[b]))
+            for name, added, upgraded in e['tile_changes']:
+                for i in upgraded:
+                    owned[name][i][6] = r
+                for res, dice, _ in added:
+                    owned[name].append([g, seat[name], len(owned[name]), RES_INDEX[res], dice, r, NEVER])
+        for ts in owned.values():
+            tiles.extend(ts)
+        rounds.append(n)
+        winners.append(-1 if winner is None else seat[winner])
+
+    ints = (np.int64, np.int32)
+    rg, rr, rroll = _columns(rolls, ints + (np.int8,))
+    tg, tr, tgiver, trecv, tgive, tget = _columns(trades, ints + (np.int8, np.int8, np.int16, np.int16))
+    return GameLog(
+        names or [],
+        np.array(rounds, dtype=np.int32),
+        np.array(winners, dtype=np.int8),
+        Rolls(rg, rr, rroll),
+        Trades(tg, tr, tgiver, trecv, tgive.reshape(-1, len(RESOURCES)), tget.reshape(-1, len(RESOURCES))),
+        Builds(*_columns(builds, ints + (np.int8, np.int8))),
+        Tiles(*_columns(tiles, (np.int64, np.int8, np.int32, np.int8, np.int8, np.int32, np.int32))),
+    )
+
+
+def _expand(chunks: List[tuple], j: int, dtype) -> np.ndarray:
+    """Column j of the engine's event chunks, scalars broadcast over each chunk's ids."""
+    return _concat([np.broadcast_to(c[j], len(c[0])) for c in chunks], dtype)
+
+
+def from_batch(engine, names: Optional[List[str]] = None) -> GameLog:
+    """Columns from a BatchTradeEngine built with record=True, without touching single events in Python."""
+    ev = engine.events
+    if ev is None:
+        raise ValueError("engine was not built with record=True")
+    n_players = engine.n_players
+    names = names or [f"seat{i}" for i in range(n_players)]
+    one_hot = np.eye(len(RESOURCES), dtype=np.int16)
+
+    rolls = Rolls(*(_expand(ev['rolls'], j, dt) for j, dt in enumerate((np.int64, np.int32, np.int8))))
+    t = ev['trades']
+    trades = Trades(
+        _expand(t, 0, np.int64), _expand(t, 1, np.int32), _expand(t, 2, np.int8), _expand(t, 3, np.int8),
+        one_hot[_expand(t, 4, np.intp)], one_hot[_expand(t, 5, np.intp)],
+    )
+    builds = Builds(*(_expand(ev['builds'], j, dt) for j, dt in enumerate((np.int64, np.int32, np.int8, np.int8))))
+
+    t = ev['tiles']
+    game, seat, index = _expand(t, 0, np.int64), _expand(t, 1, np.int8), _expand(t, 2, np.int32)
+    city = np.full(len(game), NEVER, dtype=np.int32)
+    # match upgrades to tiles on (game, seat, index)
+    cap = engine._src_res.shape[2]
+    key = (game * n_players + seat) * cap + index
+    order = np.argsort(key)
+    u = ev['upgrades']
+    ukey = (_expand(u, 0, np.int64) * n_players + _expand(u, 1, np.int64)) * cap + _expand(u, 2, np.int64)
+    city[order[np.searchsorted(key[order], ukey)]] = _expand(u, 3, np.int32)
+    tiles = Tiles(game, seat, index, _expand(t, 3, np.int8), _expand(t, 4, np.int8), _expand(t, 5, np.int32), city)
+
+    return GameLog(names, engine.rounds.astype(np.int32), engine.winner.astype(np.int8), rolls, trades, builds, tiles)
+
+
+# -------------------------------------------------------------------
+# QUERIES
+# -------------------------------------------------------------------
+def _roll_lookup(log: GameLog):
+    """Rolls sorted by (game, roll, round), their sort keys and the round span of a key."""
+    span = int(log.rounds.max(initial=0)) + 1
+    r = log.rolls
+    key = (r.game * 13 + r.roll) * span + r.round
+    order = np.argsort(key)
+    return key[order], order, span
+
+
+def _producing(tiles: Tiles, key: np.ndarray, span: int, since: np.ndarray):
+    """Per tile, the [lo, hi) slice of sorted roll keys that hit its dice after round since."""
+    base = (tiles.game * 13 + tiles.dice) * span
+    lo = np.searchsorted(key, base + np.minimum(since, span - 1) + 1)
+    hi = np.searchsorted(key, base + span)
+    return lo, hi
+
+
+def tile_income(log: GameLog) -> np.ndarray:
+    """
+    (T,) cards each row of log.tiles produced over its game. A tile
+    produces from the round after it was built, and twice as much from
+    the round after its upgrade: gains come before building in a round.
+    """
+    key, _, span = _roll_lookup(log)
+    t = log.tiles
+    lo, hi = _producing(t, key, span, t.added)
+    lo_city, _ = _producing(t, key, span, np.maximum(t.added, t.city))
+    return (hi - lo) + (hi - lo_city)
+
+
+class Income(NamedTuple):
+    game: np.ndarray        # (n,) int64
+    round: np.ndarray       # (n,) int32
+    seat: np.ndarray        # (n,) int8
+    tile: np.ndarray        # (n,) row of GameLog.tiles
+    resource: np.ndarray    # (n,) int8
+    amount: np.ndarray      # (n,) int8, 2 for a city
+
+
+def income_events(log: GameLog) -> Income:
+    """Every (round, tile) that produced, ordered by game, round, seat and tile index."""
+    key, order, span = _roll_lookup(log)
+    t = log.tiles
+    lo, hi = _producing(t, key, span, t.added)
+    count = hi - lo
+    tile = np.repeat(np.arange(len(count)), count)
+    start = np.cumsum(count) - count
+    rnd = log.rolls.round[order[np.arange(count.sum()) + np.repeat(lo - start, count)]]
+
+    seat, index = t.seat[tile], t.index[tile]
+    game = t.game[tile]
+    by = np.lexsort((index, seat, rnd, game))
+    tile, rnd = tile[by], rnd[by]
+    amount = (1 + (rnd > t.city[tile])).astype(np.int8)
+    return Income(t.game[tile], rnd, t.seat[tile], tile, t.resource[tile], amount)
+
+
+def income_by_resource(log: GameLog) -> np.ndarray:
+    """(games, players, 5) cards of each resource produced per seat."""
+    n_players, n_res = len(log.names), len(RESOURCES)
+    t = log.tiles
+    cell = (t.game * n_players + t.seat) * n_res + t.resource
+    size = log.n_games * n_players * n_res
+    return np.bincount(cell, tile_income(log), size).astype(np.int64).reshape(log.n_games, n_players, n_res)
+
+
+class TradeFlows(NamedTuple):
+    pairs: np.ndarray       # (5, 5) cards of resource a given for resource b
+    one_way: np.ndarray     # (5,) cards given for nothing in return (market cycle legs)
+
+
+def trade_flows(trades: Trades) -> TradeFlows:
+    """
+    Total flow between resource pairs over trades (filter first, e.g.
+    trades.take(trades.receiver == BANK)). A trade of several resources
+    for several splits each given card over what came back, in proportion.
+    """
+    give, get = trades.give.astype(np.float64), trades.get.astype(np.float64)
+    got = get.sum(axis=1)
+    paired = got > 0
+    pairs = (give[paired] / got[paired, None]).T @ get[paired]
+    return TradeFlows(pairs, give[~paired].sum(axis=0).astype(np.int64))
+
+
+def build_rounds(log: GameLog) -> np.ndarray:
+    """(games, players, most builds) round of each seat's k-th build, 0 past its last."""
+    n_players = len(log.names)
+    b = log.builds
+    key = b.game * n_players + b.seat
+    order = np.lexsort((b.round, key))
+    key = key[order]
+    rank = np.arange(len(key)) - np.searchsorted(key, key)
+    out = np.zeros((log.n_games, n_players, int(rank.max(initial=-1)) + 1), dtype=np.int32)
+    out[b.game[order], b.seat[order], rank] = b.round[order]
+    return out
+
+
+def first_build_round(log: GameLog, goal: str) -> np.ndarray:
+    """(games, players) round each seat first built goal, 0 if it never did."""
+    n_players = len(log.names)
+    b = log.builds.take(log.builds.goal == GOAL_INDEX[goal])
+    key = b.game * n_players + b.seat
+    order = np.lexsort((b.round, key))
+    _, first = np.unique(key[order], return_index=True)
+    first = order[first]
+    out = np.zeros((log.n_games, n_players), dtype=np.int32)
+    out[b.game[first], b.seat[first]] = b.round[first]
+    return out
+
+
+def to_frames(log: GameLog) -> Dict[str, 'pandas.DataFrame']:
+    """The tables as pandas DataFrames (needs pandas), one column per resource for bundles."""
+    import pandas as pd
+
+    def frame(table):
+        cols = {}
+        for name, col in zip(table._fields, table):
+            if col.ndim == 2:
+                cols.update({f"{name}_{r}": col[:, k] for k, r in enumerate(RESOURCES)})
+            else:
+                cols[name] = col
+        return pd.DataFrame(cols)
+
+    frames = {name: frame(getattr(log, name)) for name in ('rolls', 'trades', 'builds', 'tiles')}
+    frames['builds']['goal'] = pd.Categorical.from_codes(log.builds.goal, GOALS)
+    frames['tiles']['resource'] = pd.Categorical.from_codes(log.tiles.resource, RESOURCES)
+    return frames
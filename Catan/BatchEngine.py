@@ -0,0 +1,649 @@
+# BatchEngine.py
+
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from Players import Player, RESOURCES, BUILDING_COSTS, DICE_PROBABILITIES
+from RngStreams import DICE, TILES, SHUFFLE, ROUND_STRIDE, below, stream_keys, words
+
+# Fixed goal queue used by test.simulate_game
+GOAL_QUEUE = ['road', 'settlement', 'city', 'dev_card']
+
+RES_INDEX   = {r: i for i, r in enumerate(RESOURCES)}
+GOALS       = list(BUILDING_COSTS.keys())
+GOAL_INDEX  = {g: i for i, g in enumerate(GOALS)}
+DICE_VALUES = list(DICE_PROBABILITIES.keys())
+
+# cost of every goal as a (goal, resource) matrix
+COST_MATRIX = np.array(
+    [[BUILDING_COSTS[g].get(r, 0) for r in RESOURCES] for g in GOALS],
+    dtype=np.int64
+)
+
+# probability of each dice total, indexed by the total itself (0 for unused slots)
+ROLL_PROBABILITY = np.zeros(13)
+for _d, _p in DICE_PROBABILITIES.items():
+    ROLL_PROBABILITY[_d] = _p
+
+# income divisor of a resource with no source: marginal values are at most
+# 1 and income at least 1/36, so real prices stay below Player's 1000 for
+# a needed resource with no income, and capping the quotient gives it
+_NO_INCOME = 1e-300
+
+_DICE_ARRAY  = np.array(DICE_VALUES, dtype=np.int8)
+
+
+def _draws(keys: np.ndarray, counters: np.ndarray, n) -> np.ndarray:
+    """CounterStream.randbelow(n) of the streams keys at counters (broadcast together), as int64."""
+    return below(words(keys, counters), np.asarray(n, dtype=np.uint64)).astype(np.int64)
+
+
+# -------------------------------------------------------------------
+# BATCHED ENGINE
+# -------------------------------------------------------------------
+class Sources(NamedTuple):
+    res: np.ndarray      # (N, P, S) RES_INDEX of each tile
+    dice: np.ndarray     # (N, P, S) its dice number
+    city: np.ndarray     # (N, P, S) upgraded to a city
+    count: np.ndarray    # (N, P) tiles in use
+
+    @classmethod
+    def from_lists(cls, sources: Sequence[Sequence[Sequence[tuple]]]) -> 'Sources':
+        """From per game, per player lists of (res, dice, is_city)."""
+        n_games, n_players = len(sources), max((len(g) for g in sources), default=0)
+        size = max((len(ps) for g in sources for ps in g), default=0)
+        res  = np.zeros((n_games, n_players, size), dtype=np.int8)
+        dice = np.zeros((n_games, n_players, size), dtype=np.int8)
+        city = np.zeros((n_games, n_players, size), dtype=bool)
+        count = np.zeros((n_games, n_players), dtype=np.int64)
+        for n, game in enumerate(sources):
+            for i, ps in enumerate(game):
+                for s, (r, d, c) in enumerate(ps):
+                    res[n, i, s], dice[n, i, s], city[n, i, s] = RES_INDEX[r], d, c
+                count[n, i] = len(ps)
+        return cls(res, dice, city, count)
+
+
+# marginal value tables by goal queues, shared by every batch that plays them
+_MV_TABLES = {}
+
+
+def _marginal_value_table(goal_queues: Sequence[Sequence[str]]):
+    """
+    Player.marginal_value only depends on the goals still queued and on each
+    hand count clipped to what those goals can consume, so it is tabulated
+    once by calling Player itself on every clipped hand. Returns the
+    (seat, goals_done, hand code, res) table, the per-resource caps and
+    the mixed-radix weights of the hand code.
+    """
+    key = tuple(tuple(q) for q in goal_queues)
+    if key in _MV_TABLES:
+        return _MV_TABLES[key]
+    caps = np.array([
+        max((sum(BUILDING_COSTS[g].get(r, 0) for g in q) for q in goal_queues), default=0)
+        for r in RESOURCES
+    ], dtype=np.int64)
+    radix = np.cumprod(np.concatenate([[1], caps[:0:-1] + 1]))[::-1]
+    hands = np.stack(np.meshgrid(*[np.arange(c + 1) for c in caps], indexing='ij'), -1).reshape(-1, len(RESOURCES))
+    max_goals = max((len(q) for q in goal_queues), default=0)
+    table = np.zeros((len(goal_queues), max_goals + 1, len(hands), len(RESOURCES)))
+    probe = Player('probe')
+    for seat, q in enumerate(goal_queues):
+        for done in range(len(q) + 1):
+            probe.goal_queue = list(q[done:])
+            for h, hand in enumerate(hands.tolist()):
+                probe.resources = dict(zip(RESOURCES, hand))
+                mv = probe.marginal_value()
+                table[seat, done, h] = [mv[r] for r in RESOURCES]
+    _MV_TABLES[key] = table, caps, radix
+    return _MV_TABLES[key]
+
+
+# index of the lowest set bit of every byte, and the bit of each of 8 rows
+_LOWEST_BIT = np.array([(b & -b).bit_length() - 1 if b else 0 for b in range(256)], dtype=np.int64)
+_ROW_BIT    = 1 << np.arange(8, dtype=np.uint8)
+
+
+def _first_max(values: np.ndarray) -> np.ndarray:
+    """np.argmax(values, axis=0) for up to 8 rows, from the rows equal to their max instead of a strided reduction."""
+    top = (values == values.max(axis=0)).view(np.uint8)
+    top *= _ROW_BIT[:len(values)].reshape((-1,) + (1,) * (values.ndim - 1))
+    return _LOWEST_BIT.take(top.sum(axis=0, dtype=np.uint8))
+
+
+class BatchTradeEngine:
+    """
+    Runs N independent games in lockstep. Every game state lives in NumPy
+    arrays, and the per-round rules mirror TradeEngine.run_trading_round
+    with ParameterizedTrader personalities.
+
+    Each game draws from the counter-based streams of its seed exactly
+    where TradeEngine with GameStreams(seed) does: every stream restarts
+    at round * ROUND_STRIDE, and a round's tile and shuffle draws follow
+    seat order. A draw is a pure function of (seed, stream, counter), so
+    a round's draws are computed for just the games that make them, and
+    a batch reproduces TradeEngine with those streams game for game.
+
+    Live state is kept in underscore arrays holding only the games still
+    being played; finished games are written to the public per-game result
+    arrays (winner, rounds, trades, builds, resources, goal_ptr) and the
+    live arrays are compacted once enough of them have ended. Hands and
+    everything read with them are resource-major, (5, P, L), so a round's
+    per-resource steps and reductions run on contiguous rows of all live
+    games; prices and their income divisor, only ever read a few seats at
+    a time, are seat-major, (P, L, 5). What only changes on a build (the
+    current goal, income, per-roll gains) is updated by the build rather
+    than gathered every round, and like Player.shadow_prices each seat's
+    prices and offer are cached: they depend on its hand only through the
+    clipped hand code, so a round re-evaluates just the seats whose code
+    moved.
+    """
+
+    def __init__(
+        self,
+        resources: np.ndarray,
+        sources,
+        goal_queues: Sequence[Sequence[str]],
+        betas: np.ndarray,
+        seeds: Sequence[int],
+        dice_rolls: Optional[np.ndarray] = None,
+        record: bool = False
+    ):
+        """
+        resources   : (N, P, 5) int hand counts, in RESOURCES order
+        sources     : Sources, or per game, per player list of (res, dice, is_city)
+        goal_queues : one goal queue per seat, shared across games
+        betas       : (N, P) acceptance thresholds of each ParameterizedTrader
+        seeds       : (N,) game seeds of the GameStreams each game draws from
+        dice_rolls  : optional (N, R) pre-drawn rolls, used before the dice stream
+        record      : keep every roll, trade, build and tile of the live
+                      games as array chunks in .events, for Analytics.from_batch
+        """
+        resources = np.array(resources, dtype=np.int64)
+        n_games, n_players, n_res = resources.shape
+        self.n_games   = n_games
+        self.n_players = n_players
+        self._keys     = {s: stream_keys(seeds, s) for s in (DICE, TILES, SHUFFLE)}
+        self.dice_rolls = None if dice_rolls is None else np.asarray(dice_rolls, dtype=np.int64)
+        self.roll_index = 0
+        self.round = 0
+
+        # goals: shared (P, G+1) table padded with -1, plus a per-game pointer
+        max_goals = max((len(q) for q in goal_queues), default=0)
+        self.goals = np.full((n_players, max_goals + 1), -1, dtype=np.int64)
+        for i, q in enumerate(goal_queues):
+            self.goals[i, :len(q)] = [GOAL_INDEX[g] for g in q]
+        self.goal_len = np.array([len(q) for q in goal_queues], dtype=np.int64)
+        self.goal_cost = (COST_MATRIX[np.maximum(self.goals, 0)] * (self.goals >= 0)[..., None]).astype(np.int16)
+
+        # hand tables, one block of columns per distinct queue of goals left
+        self._set_hand_tables(goal_queues)
+
+        # per-game results, filled in as games finish
+        self.resources = resources.copy()
+        self.goal_ptr  = np.zeros((n_games, n_players), dtype=np.int64)
+        self.winner    = np.full(n_games, -1, dtype=np.int64)
+        self.rounds    = np.zeros(n_games, dtype=np.int64)
+        self.trades    = np.zeros(n_games, dtype=np.int64)
+        self.builds    = np.zeros((n_games, n_players), dtype=np.int64)
+        self.finished  = np.zeros(n_games, dtype=bool)
+
+        # live state, game index last
+        self._ids    = np.arange(n_games)
+        self._rows   = np.arange(n_games)
+        self._alive  = np.ones(n_games, dtype=bool)
+        self._hand   = np.ascontiguousarray(resources.transpose(2, 1, 0)).astype(np.int16)
+        self._ptr    = np.zeros((n_players, n_games), dtype=np.int64)
+        self._betas  = np.array(np.broadcast_to(np.asarray(betas, dtype=float), (n_games, n_players)).T)
+        self._trades = np.zeros(n_games, dtype=np.int64)
+        self._builds = np.zeros((n_players, n_games), dtype=np.int64)
+        self._busy   = np.ones(n_games, dtype=bool)        # traded or built last round
+        # the current goal of every seat: whether there is one, and its hand table block
+        self._has_goal = np.repeat((self.goal_len > 0)[:, None], n_games, axis=1)
+        self._clip     = np.repeat(self.goal_clip[:, 0].T[..., None], n_games, axis=2)
+        self._radix    = np.repeat(self.goal_radix[:, 0].T[..., None], n_games, axis=2)
+        self._base     = np.repeat(self.goal_base[:, :1], n_games, axis=1)
+        # per seat, evaluated at hand code _code (-1: not yet): shadow prices,
+        # whether it offers and what
+        self._code   = np.full((n_players, n_games), -1, dtype=np.intp)
+        self._prices = np.zeros((n_players, n_games, n_res))
+        self._offer  = np.zeros((n_players, n_games), dtype=bool)
+        self._give   = np.zeros((n_players, n_games), dtype=np.int64)
+        self._want   = np.zeros((n_players, n_games), dtype=np.int64)
+
+        # sources, game index first: fixed capacity (initial + 3 per queued
+        # settlement), whole chunks of 3
+        if not isinstance(sources, Sources):
+            sources = Sources.from_lists(sources)
+        initial = sources.res.shape[2]
+        extra = 3 * max((list(q).count('settlement') for q in goal_queues), default=0)
+        cap = -(-(initial + extra) // 3) * 3
+        self._src_res  = np.zeros((n_games, n_players, cap), dtype=np.int8)
+        self._src_dice = np.zeros((n_games, n_players, cap), dtype=np.int8)
+        self._src_city = np.zeros((n_games, n_players, cap), dtype=bool)
+        self._src_res[..., :initial]  = sources.res
+        self._src_dice[..., :initial] = sources.dice
+        self._src_city[..., :initial] = sources.city
+        self._n_src = np.array(sources.count, dtype=np.int64)
+
+        # derived from sources, refreshed only for players that build:
+        # income, its price divisor (_NO_INCOME where zero) and each roll's
+        # gains, at most two per tile
+        self._income     = np.zeros((n_res, n_players, n_games))
+        self._income_div = np.zeros((n_players, n_games, n_res))
+        self._roll_gain  = np.zeros((n_res, n_players, n_games, 13), dtype=np.int8 if 2 * cap <= 127 else np.int16)
+        for i in range(n_players):
+            self._refresh_sources(slice(None), i)
+
+        # event chunks: (ids, round, ...) arrays per phase and seat, concatenated only on export
+        self.events = None
+        if record:
+            self.events = {'rolls': [], 'trades': [], 'builds': [], 'tiles': [], 'upgrades': []}
+            for i in range(n_players):
+                n_src = self._n_src[:, i]
+                for s in range(cap):
+                    has = np.flatnonzero(n_src > s)
+                    if len(has):
+                        self.events['tiles'].append((has, i, s, self._src_res[has, i, s], self._src_dice[has, i, s], 0))
+                        city = has[self._src_city[has, i, s]]
+                        if len(city):
+                            self.events['upgrades'].append((city, i, s, 0))
+
+    @classmethod
+    def from_games(
+        cls,
+        games: Sequence[Sequence[Player]],
+        seeds: Sequence[int],
+        dice_rolls: Optional[np.ndarray] = None
+    ) -> 'BatchTradeEngine':
+        """
+        Build a batch from per-game Player lists (ParameterizedTrader only),
+        each to be played as by a TradeEngine with GameStreams(seed).
+        """
+        for g in games:
+            for p in g:
+                if not hasattr(p.personality, 'beta') or getattr(p.personality, 'use_bank', False):
+                    raise TypeError(f"{p.name}: batch engine only runs ParameterizedTrader without bank trades")
+        goal_queues = [list(p.goal_queue) for p in games[0]]
+        for g in games:
+            if [list(p.goal_queue) for p in g] != goal_queues:
+                raise ValueError("all games in a batch must share the same goal queues")
+        resources = [[[p.resources[r] for r in RESOURCES] for p in g] for g in games]
+        sources = [[list(p.resource_sources) for p in g] for g in games]
+        betas = [[p.personality.beta for p in g] for g in games]
+        return cls(resources, sources, goal_queues, betas, seeds, dice_rolls)
+
+    # ------------------------------------------------------------------
+    # vectorized player views
+    # ------------------------------------------------------------------
+    def _set_hand_tables(self, goal_queues: Sequence[Sequence[str]]):
+        """
+        What a seat's ParameterizedTrader reads off its hand depends only on
+        the goals left and on each count clipped to what they can use, one
+        more where that is just the current goal's cost so a surplus still
+        shows. Each distinct queue of goals left gets a block of columns,
+        one per clipped hand in mixed radix: the marginal values, the
+        shortfall of each resource, -inf on the resources with no surplus
+        to give (0 elsewhere), whether there is an offer to make and
+        whether the current goal can be built.
+        """
+        n_res = len(RESOURCES)
+        table, caps, caps_radix = _marginal_value_table(goal_queues)
+        need = np.cumsum(self.goal_cost[:, ::-1], axis=1)[:, ::-1]
+        self.goal_clip  = need + (need == self.goal_cost)
+        self.goal_radix = np.zeros_like(self.goal_clip)
+        self.goal_base  = np.zeros(self.goals.shape, dtype=np.intp)
+        blocks, size = {}, 0
+        for i, q in enumerate(goal_queues):
+            for k in range(len(q) + 1):
+                clip = self.goal_clip[i, k].astype(np.int64)
+                self.goal_radix[i, k] = np.cumprod(np.concatenate([[1], clip[:0:-1] + 1]))[::-1]
+                left = tuple(q[k:])
+                if left not in blocks:
+                    hands = np.stack(np.meshgrid(*[np.arange(c + 1) for c in clip], indexing='ij'), -1).reshape(-1, n_res)
+                    blocks[left] = size, i, k, hands
+                    size += len(hands)
+                self.goal_base[i, k] = blocks[left][0]
+        self._mv_table   = np.zeros((n_res, size))
+        self._shortfall  = np.zeros((n_res, size), dtype=np.int16)
+        self._no_surplus = np.zeros((n_res, size))
+        self._offers     = np.zeros(size, dtype=bool)
+        self._can_build  = np.zeros(size, dtype=bool)
+        for left, (base, i, k, hands) in blocks.items():
+            at = slice(base, base + len(hands))
+            d = hands - self.goal_cost[i, k]
+            self._mv_table[:, at]   = table[i, k, (np.minimum(hands, caps) * caps_radix).sum(axis=1)].T
+            self._shortfall[:, at]  = np.maximum(-d, 0).T
+            self._no_surplus[:, at]  = np.where(d > 0, 0.0, -np.inf).T
+            self._offers[at] = (d < 0).any(axis=1) & (d > 0).any(axis=1)
+            self._can_build[at] = (d >= 0).all(axis=1) & bool(left)
+        if size <= np.iinfo(np.int16).max:
+            # every clip * radix is below its block size: hand codes add up in int16, as hands do
+            self.goal_clip  = self.goal_clip.astype(np.int16)
+            self.goal_radix = self.goal_radix.astype(np.int16)
+
+    def _refresh_sources(self, rows, seats, gains: bool = True):
+        """Recompute income of seats (one, or one per row of rows) from their source lists, and per-roll gains with gains."""
+        n_res = len(RESOURCES)
+        src_res  = self._src_res[rows, seats].astype(np.int64)
+        n, cap = src_res.shape
+        src_dice = self._src_dice[rows, seats].astype(np.int64)
+        amt = np.where(self._src_city[rows, seats], 2, 1) * (np.arange(cap) < self._n_src[rows, seats][:, None])
+        game = np.arange(n)[:, None]
+        # Player.expected_income: bincount adds each game's sources in order
+        income = np.bincount((game * n_res + src_res).ravel(), (ROLL_PROBABILITY[src_dice] * amt).ravel(), n * n_res)
+        income = income.reshape(n, n_res).T
+        self._income[:, seats, rows] = income
+        self._income_div[seats, rows] = np.where(income > 0, income, _NO_INCOME).T
+        if gains:
+            gain = np.bincount(((src_res * n + game) * 13 + src_dice).ravel(), amt.ravel(), n_res * n * 13)
+            self._roll_gain[:, seats, rows] = gain.reshape(n_res, n, 13)
+
+    def _hand_code(self, hand: np.ndarray, clip: np.ndarray, radix: np.ndarray, base: np.ndarray) -> np.ndarray:
+        """Hand table column of (5, ...) hands, given their clip, radix and block start."""
+        clipped = np.minimum(hand.reshape(len(hand), -1), clip.reshape(len(clip), -1))
+        clipped *= radix.reshape(len(radix), -1)
+        # the digits sum below the block size, so in the table's dtype; row by
+        # row, as a reduction over the short first axis is strided
+        total = clipped[0] + clipped[1]
+        for row in clipped[2:]:
+            total += row
+        return base + total.reshape(base.shape)
+
+    def _evaluate(self, seats: np.ndarray, code: np.ndarray):
+        """
+        Cache Player.shadow_prices and the ParameterizedTrader offer of the
+        listed seats, as flat (seat, game) indices, at their hand code.
+        """
+        n_res = len(RESOURCES)
+        self._code.reshape(-1)[seats] = code
+        prices = self._mv_table.take(code, axis=1)
+        prices /= self._income_div.reshape(-1, n_res).take(seats, axis=0).T
+        np.minimum(prices, 1000.0, out=prices)
+        self._prices.reshape(-1, n_res)[seats] = prices.T
+
+        # offer one surplus card for one missing card: the shortfall with the
+        # largest value (prices are positive, so only short resources score)
+        # for the cheapest surplus
+        score = np.empty((n_res, 2, len(seats)))
+        np.multiply(self._shortfall.take(code, axis=1), prices, out=score[:, 0])
+        np.subtract(self._no_surplus.take(code, axis=1), prices, out=score[:, 1])
+        self._want.reshape(-1)[seats], self._give.reshape(-1)[seats] = _first_max(score)
+        self._offer.reshape(-1)[seats] = self._offers.take(code)
+
+    # ------------------------------------------------------------------
+    # round phases
+    # ------------------------------------------------------------------
+    def _next_rolls(self) -> np.ndarray:
+        if self.dice_rolls is not None and self.roll_index < self.dice_rolls.shape[1]:
+            rolls = self.dice_rolls[self._ids, self.roll_index]
+            self.roll_index += 1
+            return rolls
+        at = np.uint64((self.round + 1) * ROUND_STRIDE) + np.array([[1], [2]], dtype=np.uint64)
+        return 2 + _draws(self._keys[DICE].take(self._ids), at, 6).sum(axis=0)
+
+    def _trade(self, code: np.ndarray, moved: np.ndarray, lanes: np.ndarray):
+        """
+        Trading phase of the games at lanes from every seat's hand code, which
+        is kept current through the trades; moved lists the flat (seat, game)
+        indices whose code is not the one evaluated.
+        """
+        hand, P, L, n_res = self._hand, self.n_players, len(self._rows), len(RESOURCES)
+        if len(moved):
+            self._evaluate(moved, code.reshape(-1)[moved])
+        flat_hand, flat_prices = hand.reshape(-1), self._prices.reshape(-1)
+        flat_clip, flat_radix = self._clip.reshape(-1), self._radix.reshape(-1)
+        # shuffle draws made this round, per game
+        shuffled = np.zeros(len(lanes), dtype=np.uint64) if P > 2 else None
+        for i in range(P):
+            # the games where the seat offers, as re-evaluated after the trades before it
+            k = np.flatnonzero(self._offer[i, lanes])
+            if not len(k):
+                continue
+            r = lanes[k]
+            gives, wants = self._give[i, r], self._want[i, r]
+            give, want = gives * (P * L) + r, wants * (P * L) + r
+
+            # acceptance of (give 1, get 1) by every other seat, from its hand
+            # at flat (res, seat, game) and its prices at flat (seat, game, res)
+            others = [j for j in range(P) if j != i]
+            accept = np.empty((len(others), len(r)), dtype=bool)
+            for m, j in enumerate(others):
+                at = (j * L + r) * n_res
+                accept[m] = (flat_hand[want + j * L] >= 1) & (flat_prices[at + gives] >= self._betas[j, r] * flat_prices[at + wants])
+
+            # others are shuffled (CounterStream.shuffle) only when an offer is made
+            if len(others) > 1:
+                order = np.broadcast_to(np.arange(len(others)), (len(k), len(others))).copy()
+                rows = np.arange(len(k))
+                n = np.arange(len(others), 1, -1)
+                at = np.uint64((self.round + 1) * ROUND_STRIDE) + shuffled[k] + np.arange(1, len(n) + 1, dtype=np.uint64)[:, None]
+                swaps = _draws(self._keys[SHUFFLE].take(self._ids[r]), at, n[:, None])
+                shuffled[k] += np.uint64(len(n))
+                for m, j in zip(range(len(others) - 1, 0, -1), swaps):
+                    a, b = order[rows, m].copy(), order[rows, j].copy()
+                    order[rows, m], order[rows, j] = b, a
+                sub = np.take_along_axis(accept.T, order, axis=1)
+                first = np.argmax(sub, axis=1)
+                done = sub[rows, first]
+                partner = np.array(others)[order[rows, first]][done]
+            else:
+                done, partner = accept[0], others[0]
+            r = r[done]
+            if not len(r):
+                continue
+
+            w, v = give[done] - r, want[done] - r
+            if self.events is not None:
+                self.events['trades'].append((self._ids[r], self.round + 1, i, partner, w // (P * L), v // (P * L)))
+            # the proposer and its partner, and the card each gives and gets,
+            # all at distinct flat indices
+            seats = np.concatenate([i * L + r, partner * L + r])
+            lost, got = np.concatenate([w, v]) + seats, np.concatenate([v, w]) + seats
+            flat_hand[lost] -= 1
+            flat_hand[got] += 1
+            self._trades[r] += 1
+            self._busy[r] = True
+
+            # a card moves a clipped count, and so the code, by one radix step
+            # while it stays within the clip; later proposers see the traded
+            # hands, the last one's are re-evaluated next round if need be
+            traded = code.reshape(-1)[seats]
+            traded -= flat_radix[lost] * (flat_hand[lost] < flat_clip[lost])
+            traded += flat_radix[got] * (flat_hand[got] <= flat_clip[got])
+            code.reshape(-1)[seats] = traded
+            if i < P - 1:
+                self._evaluate(seats, traded)
+
+    def _build(self, code: np.ndarray, lanes: np.ndarray):
+        """Building phase of the games at lanes from every seat's hand code after trading."""
+        ready = np.flatnonzero(self._can_build.take(code[:, lanes]))
+        if not len(ready):
+            return
+        n_res, L = len(RESOURCES), len(self._rows)
+        n_flat = self.n_players * L
+        # (seat, game) of the seats that build, seat-major, and their flat indices
+        seat, k = np.divmod(ready, len(lanes))
+        k = lanes[k]
+        f = seat * L + k
+        self._busy[k] = True
+        built = self._ptr.reshape(-1)[f]
+        goal = self.goals[seat, built]
+        self._hand.reshape(n_res, -1)[:, f] -= self.goal_cost[seat, built].T
+        done = built + 1
+        self._ptr.reshape(-1)[f] = done
+        self._builds.reshape(-1)[f] += 1
+        self._has_goal.reshape(-1)[f] = done < self.goal_len[seat]
+        self._clip.reshape(n_res, -1)[:, f] = self.goal_clip[seat, done].T
+        self._radix.reshape(n_res, -1)[:, f] = self.goal_radix[seat, done].T
+        self._base.reshape(-1)[f] = self.goal_base[seat, done]
+        if self.events is not None:
+            self.events['builds'].append((self._ids[k], self.round + 1, seat, goal))
+
+        # a settlement draws three (resource, dice) tiles; a city upgrades a
+        # random all-settlement chunk of 3, if there is one, with one draw
+        new = np.flatnonzero(goal == GOAL_INDEX['settlement'])
+        up = np.flatnonzero(goal == GOAL_INDEX['city'])
+        cap = self._src_city.shape[2]
+        chunks = self._src_city[k[up], seat[up]].reshape(len(up), cap // 3, 3).any(axis=2)
+        free = ~chunks & (np.arange(cap // 3) < (self._n_src[k[up], seat[up]] // 3)[:, None])
+        count = free.sum(axis=1)
+        up, free, count = up[count > 0], free[count > 0], count[count > 0]
+        # a game's tile draws this round follow seat order (builds are seat-major)
+        n_draws = np.zeros(len(k), dtype=np.uint64)
+        n_draws[new] = 6
+        n_draws[up] = 1
+        before = np.empty(len(k), dtype=np.uint64)
+        used = np.full(L, np.uint64((self.round + 1) * ROUND_STRIDE))
+        bounds = np.searchsorted(seat, np.arange(self.n_players + 1))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            before[lo:hi] = used[k[lo:hi]]
+            used[k[lo:hi]] += n_draws[lo:hi]
+
+        gained = []
+        if len(new):
+            i, g = seat[new], k[new]
+            s = self._n_src[g, i]
+            at = before[new] + np.arange(1, 7, dtype=np.uint64)[:, None]
+            drawn = _draws(self._keys[TILES].take(self._ids[g]), at, np.array([n_res, len(DICE_VALUES)] * 3)[:, None])
+            res, dice = drawn[0::2], _DICE_ARRAY[drawn[1::2]]
+            slot = s + np.arange(3)[:, None]
+            self._src_res[g, i, slot]  = res
+            self._src_dice[g, i, slot] = dice
+            self._n_src[g, i] = s + 3
+            gained.append((res * n_flat + f[new]) * 13 + dice)
+            if self.events is not None:
+                for j in range(3):
+                    self.events['tiles'].append((self._ids[g], i, slot[j], res[j], dice[j], self.round + 1))
+
+        if len(up):
+            i, g = seat[up], k[up]
+            pick = _draws(self._keys[TILES].take(self._ids[g]), before[up] + np.uint64(1), count)
+            chosen = np.argmax(np.cumsum(free, axis=1) > pick[:, None], axis=1)
+            slot = 3 * chosen + np.arange(3)[:, None]
+            self._src_city[g, i, slot] = True
+            gained.append((self._src_res[g, i, slot].astype(np.int64) * n_flat + f[up]) * 13 + self._src_dice[g, i, slot])
+            if self.events is not None:
+                for j in range(3):
+                    self.events['upgrades'].append((self._ids[g], i, slot[j], self.round + 1))
+
+        # a new or upgraded tile pays one more card on its roll (one tile at a
+        # time, as a seat's tiles may share one); Player adds a new tile's
+        # income in place and sums it afresh on an upgrade, both in source
+        # order as _refresh_sources does
+        if gained:
+            at = np.concatenate(gained, axis=1)
+            flat_gain = self._roll_gain.reshape(-1)
+            for j in range(3):
+                flat_gain[at[j]] += 1
+            changed = np.concatenate([new, up])
+            self._refresh_sources(k[changed], seat[changed], gains=False)
+
+    def run_trading_round(self) -> np.ndarray:
+        """Advance every live game by one round; returns the (N,) rolls, 0 for finished games."""
+        roll = self._play_round()
+        rolls = np.zeros(self.n_games, dtype=np.int64)
+        rolls[self._ids[self._alive]] = roll[self._alive]
+        return rolls
+
+    def _play_round(self) -> np.ndarray:
+        roll = self._next_rolls()
+        if self.events is not None:
+            self.events['rolls'].append((self._ids[self._alive], self.round + 1, roll[self._alive]))
+
+        # 1) Distribute resources
+        gain = self._roll_gain.reshape(len(RESOURCES), self.n_players, -1)
+        self._hand += gain.take(self._rows * 13 + roll, axis=2)
+
+        # a game whose hand codes are those of last round (every clip is at
+        # least 1, so a code also tells which resources a hand has) plays
+        # the round as last round: if it neither traded nor built then, it
+        # doesn't now, so only the others play the phases (finished games,
+        # kept until the batch is compacted, play neither)
+        code = self._hand_code(self._hand, self._clip, self._radix, self._base)
+        moved = code != self._code
+        moved &= self._alive
+        lanes = np.flatnonzero(moved.any(axis=0) | self._busy & self._alive)
+        self._busy[:] = False
+
+        # 2) Trading phase
+        self._trade(code, np.flatnonzero(moved), lanes)
+
+        # 3) Building phase
+        self._build(code, lanes)
+
+        self.round += 1
+        return roll
+
+    def _finish(self, end: np.ndarray, winner: np.ndarray):
+        self._alive[end] = False
+        ids = self._ids[end]
+        self.winner[ids]    = winner
+        self.rounds[ids]    = self.round
+        self.trades[ids]    = self._trades[end]
+        self.builds[ids]    = self._builds.take(end, axis=1).T
+        self.resources[ids] = self._hand.take(end, axis=2).transpose(2, 1, 0)
+        self.goal_ptr[ids]  = self._ptr.take(end, axis=1).T
+        self.finished[ids]  = True
+
+        # drop finished rows once they make up a quarter of the batch
+        if np.count_nonzero(self._alive) < 0.75 * len(self._alive):
+            keep = np.flatnonzero(self._alive)
+            for name in ('_ids', '_alive', '_hand', '_ptr', '_betas', '_trades', '_builds', '_busy', '_has_goal',
+                         '_clip', '_radix', '_base', '_code', '_offer', '_give', '_want', '_income'):
+                setattr(self, name, getattr(self, name).take(keep, axis=-1))
+            for name in ('_prices', '_income_div'):
+                setattr(self, name, getattr(self, name).take(keep, axis=1))
+            for name in ('_src_res', '_src_dice', '_src_city', '_n_src'):
+                setattr(self, name, getattr(self, name)[keep])
+            self._roll_gain = self._roll_gain.take(keep, axis=2)
+            self._rows = np.arange(len(keep))
+
+    def run(self, max_rounds: int = 200) -> np.ndarray:
+        """
+        Play every game to completion using simulate_game's stopping rule:
+        the first seat (in order) with an empty goal queue wins, and games
+        still running after max_rounds + 1 rounds end without a winner.
+        Returns the (N,) winner seat index, -1 for no winner.
+        """
+        while len(self._ids) and self._alive.any():
+            self._play_round()
+            done = ~self._has_goal
+            won = np.flatnonzero(self._alive & done.any(axis=0))
+            if len(won):
+                self._finish(won, np.argmax(done[:, won], axis=0))
+            if self.round > max_rounds and self._alive.any():
+                self._finish(np.flatnonzero(self._alive), -1)
+        return self.winner
+
+
+def simulate_games(
+    alpha1, beta1,
+    alpha2, beta2,
+    seeds: Sequence[int],
+    max_rounds: int = 200,
+    record: bool = False
+) -> BatchTradeEngine:
+    """
+    Batched test.simulate_game(..., streams=True): same Alice/Bob setup,
+    one game per seed, identical results. Parameters may be scalars or
+    per-seed arrays. Returns the finished engine; see .winner (0 Alice,
+    1 Bob, -1 none) and .rounds. record=True keeps its events for
+    Analytics.from_batch.
+    """
+    n = len(seeds)
+
+    # --- Fixed initial tiles, drawn in simulate_game's order from round 0 of the tile stream ---
+    tiles = [['lumber', 'brick', 'wool'], ['ore', 'wool', 'grain']]
+    at = np.arange(1, sum(map(len, tiles)) + 1, dtype=np.uint64)[:, None]
+    drawn = _DICE_ARRAY[_draws(stream_keys(seeds, TILES), at, len(DICE_VALUES))]
+    dice = drawn.T.reshape(n, len(tiles), -1)
+    res = np.broadcast_to(np.array([[RES_INDEX[r] for r in seat] for seat in tiles], dtype=np.int8), dice.shape)
+    sources = Sources(res, dice, np.zeros(dice.shape, dtype=bool), np.full((n, len(tiles)), 3))
+
+    betas = np.stack([np.broadcast_to(beta1, n), np.broadcast_to(beta2, n)], axis=1)
+    resources = np.zeros((n, 2, len(RESOURCES)), dtype=np.int64)
+    engine = BatchTradeEngine(resources, sources, [GOAL_QUEUE, GOAL_QUEUE], betas, seeds, record=record)
+    engine.run(max_rounds)
+    return engine
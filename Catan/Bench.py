@@ -0,0 +1,227 @@
+# Bench.py
+
+import argparse
+import fnmatch
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from Players import Player, CompactPlayer, RESOURCES, DICE_PROBABILITIES
+from Agents import ParameterizedTrader
+from FullEngine import TradeEngine
+from EventSinks import NullSink
+import test
+
+# a benchmark's setup returns fn and how many operations one fn() performs
+Setup = Callable[[], Tuple[Callable[[], object], int]]
+
+DEFAULT_THRESHOLD = 0.10    # flag a drop of more than 10% in throughput
+N_HANDS = 512               # distinct hands cycled through by the per-call benchmarks
+
+
+class Benchmark(NamedTuple):
+    name: str
+    unit: str               # what one operation is, e.g. 'games'
+    setup: Setup
+
+
+class Result(NamedTuple):
+    name: str
+    unit: str
+    best: float             # operations per second of the fastest repeat
+    median: float           # operations per second, median over repeats
+    repeats: int
+
+
+class Regression(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+    change: float           # current / baseline - 1
+
+
+# -------------------------------------------------------------------
+# FIXTURES (fixed seeds, so every run times the same work)
+# -------------------------------------------------------------------
+def _player(cls=Player, name: str = "Alice", beta: float = 1.0, seed: int = 0, tiles: int = 9):
+    """A player with random sources (default: three settlements' worth) and the demo goal queue."""
+    rng = random.Random(seed)
+    p = cls(name, personality=ParameterizedTrader(1.0, beta))
+    p.resource_sources = [(rng.choice(RESOURCES), rng.choice(list(DICE_PROBABILITIES)), False) for _ in range(tiles)]
+    p.goal_queue = list(test.GOAL_QUEUE)
+    return p
+
+
+def _hands(seed: int = 0) -> List[Dict[str, int]]:
+    rng = random.Random(seed)
+    return [{r: rng.randint(0, 4) for r in RESOURCES} for _ in range(N_HANDS)]
+
+
+# -------------------------------------------------------------------
+# BENCHMARKS
+# -------------------------------------------------------------------
+def _simulate_game(games: int = 20) -> Setup:
+    def setup():
+        sink = NullSink()
+        def fn():
+            for seed in range(games):
+                test.simulate_game(0.5, 0.5, 3.0, 3.0, seed=seed, sink=sink)
+        return fn, games
+    return setup
+
+
+def _trading_round(rounds: int = 40) -> Setup:
+    """
+    The first rounds of one engine (fewer than a game lasts), restored
+    to its start before each call so the work doesn't drift.
+    """
+    def setup():
+        players = [_player(name="Alice", beta=0.5, seed=1, tiles=3), _player(name="Bob", beta=3.0, seed=2, tiles=3)]
+        engine = TradeEngine(players, rng=random.Random(42), sink=NullSink())
+        start = engine.snapshot()
+        def fn():
+            engine.restore(start)
+            for _ in range(rounds):
+                engine.run_trading_round()
+        return fn, rounds
+    return setup
+
+
+def _per_hand(call: Callable, cls) -> Setup:
+    """call(player) once per hand; assigning the hand bumps the player's version, so caches miss."""
+    def setup():
+        p, hands = _player(cls), _hands()
+        def fn():
+            for hand in hands:
+                p.resources = hand
+                call(p)
+        return fn, len(hands)
+    return setup
+
+
+def _trader(cls) -> Setup:
+    """ParameterizedTrader: one proposal and its evaluation by the other player per hand pair."""
+    def setup():
+        a, b = _player(cls, "Alice", seed=1), _player(cls, "Bob", seed=2)
+        pairs = list(zip(_hands(1), _hands(2)))
+        def fn():
+            for ha, hb in pairs:
+                a.resources, b.resources = ha, hb
+                offer = a.personality.propose_trade(a, [b])
+                if offer:
+                    b.personality.accept_trade(b, *offer, a)
+        return fn, len(pairs)
+    return setup
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark('simulate_game', 'games', _simulate_game()),
+    Benchmark('run_trading_round', 'rounds', _trading_round()),
+    Benchmark('Player.shadow_prices', 'calls', _per_hand(lambda p: p.shadow_prices(), Player)),
+    Benchmark('Player.resource_delta', 'calls', _per_hand(lambda p: p.resource_delta(), Player)),
+    Benchmark('CompactPlayer.shadow_prices', 'calls', _per_hand(lambda p: p.shadow_prices(), CompactPlayer)),
+    Benchmark('CompactPlayer.resource_delta', 'calls', _per_hand(lambda p: p.resource_delta(), CompactPlayer)),
+    Benchmark('ParameterizedTrader', 'trades', _trader(Player)),
+]
+
+
+# -------------------------------------------------------------------
+# TIMING
+# -------------------------------------------------------------------
+def measure(bench: Benchmark, repeat: int = 5, min_time: float = 0.2, warmup: int = 1) -> Result:
+    """
+    Time bench after warmup calls. Each of the repeat timings runs fn as
+    many times as it takes to last min_time seconds, calibrated on the
+    warmup, so fast and slow benchmarks get the same timer resolution.
+    """
+    fn, ops = bench.setup()
+    t = time.perf_counter_ns()
+    for _ in range(max(warmup, 1)):
+        fn()
+    per_call = (time.perf_counter_ns() - t) / max(warmup, 1)
+    calls = max(1, int(min_time * 1e9 / max(per_call, 1)))
+
+    rates = []
+    for _ in range(repeat):
+        t = time.perf_counter_ns()
+        for _ in range(calls):
+            fn()
+        rates.append(calls * ops * 1e9 / (time.perf_counter_ns() - t))
+    return Result(bench.name, bench.unit, max(rates), statistics.median(rates), repeat)
+
+
+def run(patterns: Optional[Sequence[str]] = None, **kw) -> List[Result]:
+    """Measure every benchmark whose name matches one of patterns (fnmatch; default all)."""
+    chosen = [b for b in BENCHMARKS if not patterns or any(fnmatch.fnmatch(b.name, p) for p in patterns)]
+    return [measure(b, **kw) for b in chosen]
+
+
+# -------------------------------------------------------------------
+# BASELINES
+# -------------------------------------------------------------------
+def save_baseline(results: Sequence[Result], path: str):
+    data = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': {r.name: r._asdict() for r in results},
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def load_baseline(path: str) -> Dict[str, Result]:
+    with open(path) as f:
+        return {name: Result(**r) for name, r in json.load(f)['results'].items()}
+
+
+def compare(results: Sequence[Result], baseline: Dict[str, Result], threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    """Benchmarks whose best throughput fell more than threshold below the baseline's."""
+    slower = []
+    for r in results:
+        base = baseline.get(r.name)
+        if base is None:
+            continue
+        change = r.best / base.best - 1
+        if change < -threshold:
+            slower.append(Regression(r.name, base.best, r.best, change))
+    return slower
+
+
+def report(results: Sequence[Result], baseline: Optional[Dict[str, Result]] = None):
+    for r in results:
+        line = f"{r.name:<30} {r.best:>14,.0f} {r.unit}/s  (median {r.median:,.0f})"
+        if baseline and r.name in baseline:
+            line += f"  {r.best / baseline[r.name].best - 1:+.1%} vs baseline"
+        print(line)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput of the engine hot paths.")
+    parser.add_argument('-k', dest='patterns', action='append', help="only benchmarks matching this glob")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument('--save', metavar='PATH', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="check the results against a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="allowed fractional slowdown")
+    args = parser.parse_args(argv)
+
+    results = run(args.patterns, repeat=args.repeat, min_time=args.min_time)
+    baseline = load_baseline(args.compare) if args.compare else None
+    report(results, baseline)
+    if args.save:
+        save_baseline(results, args.save)
+    if baseline is None:
+        return 0
+    slower = compare(results, baseline, args.threshold)
+    for s in slower:
+        print(f"REGRESSION {s.name}: {s.baseline:,.0f} -> {s.current:,.0f} ({s.change:+.1%})")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
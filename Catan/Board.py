@@ -1,7 +1,10 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import RegularPolygon
 import numpy as np
 
+# axial coords for the 19‐hex layout, row by row; the board graph
+# (vertices, edges, adjacency) over them lives in BoardGraph
+from BoardGraph import AXIAL_COORDS
+from Layouts import generate_layouts
+
 
 class Tile:
     """A single terrain hex on the Catan board."""
@@ -15,15 +18,6 @@ class Tile:
         return f"<Tile {self.resource!r}@({self.q},{self.r})#{self.number}>"
 
 
-# flat‐top axial coords for the 19‐hex layout, row by row:
-AXIAL_COORDS = [
-    (-2,  2), (-1,  2), ( 0,  2),            # 3
-    (-2,  1), (-1,  1), ( 0,  1), ( 1,  1),  # 4
-    (-2,  0), (-1,  0), ( 0,  0), ( 1,  0), ( 2,  0),  # 5
-    (-1, -1), ( 0, -1), ( 1, -1), ( 2, -1),  # 4
-    ( 0, -2), ( 1, -2), ( 2, -2)             # 3
-]
-
 # pick any layout
 # tuple is (resource, number, q, r)
 FIXED_TILE_SPECS = [
@@ -53,12 +47,19 @@ FIXED_TILE_SPECS = [
 ]
 
 class Board:
-    def __init__(self, tile_specs=None):
-        # allow to pass in any tile_specs; default to FIXED_TILE_SPECS
+    def __init__(self, tile_specs=None, variable_setup=False, seed=None):
+        # allow to pass in any tile_specs; default to FIXED_TILE_SPECS,
+        # or a random valid layout (see Layouts.generate_layouts) with variable_setup
+        if variable_setup and tile_specs is None:
+            tile_specs = generate_layouts(1, seed).tile_specs(0)
         specs = tile_specs or FIXED_TILE_SPECS
         self.tiles = [Tile(res, num, q, r) for res, num, q, r in specs]
 
     def draw(self, ax=None, size=1.0):
+        # matplotlib is only imported to draw, so the board model loads without a GUI stack
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import RegularPolygon
+
         color_map = {
             'brick':'#c57440', 'lumber':'#2c4317', 'ore':'#534e61',
             'grain':'#facd40','wool':'#a8cd4b','desert':'#deb887'
@@ -0,0 +1,480 @@
+# BoardGraph.py
+
+import math
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from Players import DICE_PROBABILITIES
+
+# the 19 hexes of the standard board, row by row (also Board.AXIAL_COORDS)
+AXIAL_COORDS = [
+    (-2,  2), (-1,  2), ( 0,  2),            # 3
+    (-2,  1), (-1,  1), ( 0,  1), ( 1,  1),  # 4
+    (-2,  0), (-1,  0), ( 0,  0), ( 1,  0), ( 2,  0),  # 5
+    (-1, -1), ( 0, -1), ( 1, -1), ( 2, -1),  # 4
+    ( 0, -2), ( 1, -2), ( 2, -2)             # 3
+]
+HEX_INDEX = {qr: h for h, qr in enumerate(AXIAL_COORDS)}
+# hexes sharing a side, by the six axial directions
+HEX_NEIGHBORS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(HEX_INDEX[q + dq, r + dr] for dq, dr in ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+          if (q + dq, r + dr) in HEX_INDEX)
+    for q, r in AXIAL_COORDS
+)
+
+MIN_LONGEST_ROAD = 5    # roads needed to claim the longest-road card
+
+
+# -------------------------------------------------------------------
+# TOPOLOGY
+# -------------------------------------------------------------------
+def _corner(q: int, r: int, i: int) -> Tuple[float, float]:
+    """Corner i of a unit pointy-top hex, in the same order as Boardv2.hex_vertices."""
+    cx = math.sqrt(3) * (q + r / 2)
+    cy = 1.5 * r
+    a = math.radians(60 * i - 30)
+    return cx + math.cos(a), cy + math.sin(a)
+
+
+def _build_graph():
+    corners = {}
+    for q, r in AXIAL_COORDS:
+        for i in range(6):
+            x, y = _corner(q, r, i)
+            corners.setdefault((round(x, 6), round(y, 6)), (x, y))
+    # vertex ids run row by row, top to bottom and left to right
+    keys = sorted(corners, key=lambda k: (k[1], k[0]))
+    vid = {k: v for v, k in enumerate(keys)}
+
+    hex_vertices = np.array([
+        [vid[tuple(round(c, 6) for c in _corner(q, r, i))] for i in range(6)]
+        for q, r in AXIAL_COORDS
+    ], dtype=np.int16)
+
+    edges = sorted({tuple(sorted((int(row[i]), int(row[(i + 1) % 6])))) for row in hex_vertices for i in range(6)})
+    return np.array([corners[k] for k in keys]), hex_vertices, np.array(edges, dtype=np.int16)
+
+
+def _padded(lists: List[List[int]], width: int) -> np.ndarray:
+    out = np.full((len(lists), width), -1, dtype=np.int16)
+    for i, items in enumerate(lists):
+        out[i, :len(items)] = sorted(items)
+    return out
+
+
+VERTEX_XY, HEX_VERTICES, EDGE_VERTICES = _build_graph()
+N_HEXES, N_VERTICES, N_EDGES = len(HEX_VERTICES), len(VERTEX_XY), len(EDGE_VERTICES)
+
+_vh: List[List[int]] = [[] for _ in range(N_VERTICES)]
+for _h, _row in enumerate(HEX_VERTICES):
+    for _v in _row:
+        _vh[_v].append(_h)
+_vn: List[List[int]] = [[] for _ in range(N_VERTICES)]
+_ve: List[List[int]] = [[] for _ in range(N_VERTICES)]
+for _e, (_a, _b) in enumerate(EDGE_VERTICES):
+    _vn[_a].append(int(_b)); _vn[_b].append(int(_a))
+    _ve[_a].append(_e);      _ve[_b].append(_e)
+
+# -1 padded adjacency: every vertex touches at most 3 hexes, vertices and edges
+VERTEX_HEXES     = _padded(_vh, 3)
+VERTEX_NEIGHBORS = _padded(_vn, 3)
+VERTEX_EDGES     = _padded(_ve, 3)
+# unpadded tuples of the same, for Python-side loops
+NEIGHBORS: Tuple[Tuple[int, ...], ...] = tuple(tuple(n) for n in _vn)
+EDGES_AT:  Tuple[Tuple[int, ...], ...] = tuple(tuple(e) for e in _ve)
+HEXES_AT:  Tuple[Tuple[int, ...], ...] = tuple(tuple(h) for h in _vh)
+EDGE_ENDS: Tuple[Tuple[int, int], ...] = tuple((int(a), int(b)) for a, b in EDGE_VERTICES)
+EDGE_ID: Dict[Tuple[int, int], int] = {}
+for _e, (_a, _b) in enumerate(EDGE_VERTICES):
+    EDGE_ID[int(_a), int(_b)] = EDGE_ID[int(_b), int(_a)] = _e
+COASTAL_VERTICES = tuple(v for v in range(N_VERTICES) if len(_vh[v]) < 3)
+del _vh, _vn, _ve
+
+
+def layout_from_specs(specs) -> List[Tuple[str, Optional[int]]]:
+    """(resource, number) per hex in AXIAL_COORDS order, from Board-style (resource, number, q, r) specs."""
+    layout: List[Tuple[str, Optional[int]]] = [None] * N_HEXES
+    for res, num, q, r in specs:
+        layout[HEX_INDEX[q, r]] = (res, num)
+    return layout
+
+
+# -------------------------------------------------------------------
+# PLACEMENT
+# -------------------------------------------------------------------
+class Placement:
+    """
+    Who owns which vertex and edge, plus every player's legal settlement,
+    city and road spots, kept up to date on each placement so legality is
+    a set lookup. Follows the base-game rules: the distance rule for
+    settlements, roads and (after setup) settlements must connect to the
+    player's network, and a road can't pass through an opponent's building.
+    """
+
+    def __init__(self, n_players: int):
+        self.n_players = n_players
+        self.vertex_owner = np.full(N_VERTICES, -1, dtype=np.int8)
+        self.edge_owner = np.full(N_EDGES, -1, dtype=np.int8)
+        self.is_city = np.zeros(N_VERTICES, dtype=bool)
+        # vertices free under the distance rule
+        self.open_vertices: Set[int] = set(range(N_VERTICES))
+        self.settlement_spots: List[Set[int]] = [set() for _ in range(n_players)]
+        self.road_spots: List[Set[int]] = [set() for _ in range(n_players)]
+        self.city_spots: List[Set[int]] = [set() for _ in range(n_players)]
+
+    # --- legality, O(1) ---
+    def can_settle(self, p: int, v: int, setup: bool = False) -> bool:
+        return v in self.open_vertices if setup else v in self.settlement_spots[p]
+
+    def can_road(self, p: int, e: int) -> bool:
+        return e in self.road_spots[p]
+
+    def can_city(self, p: int, v: int) -> bool:
+        return v in self.city_spots[p]
+
+    # --- placement ---
+    def place_settlement(self, p: int, v: int, setup: bool = False):
+        if not self.can_settle(p, v, setup):
+            raise ValueError(f"player {p} can't settle vertex {v}")
+        self.vertex_owner[v] = p
+        self.city_spots[p].add(v)
+        for u in (v,) + NEIGHBORS[v]:
+            self.open_vertices.discard(u)
+            for spots in self.settlement_spots:
+                spots.discard(u)
+        for e in EDGES_AT[v]:
+            if self.edge_owner[e] < 0:
+                self.road_spots[p].add(e)
+                # opponents lose roads that only reached e through v
+                for q in range(self.n_players):
+                    if q != p and e in self.road_spots[q] and not self._touches(q, e):
+                        self.road_spots[q].discard(e)
+
+    def place_city(self, p: int, v: int):
+        if not self.can_city(p, v):
+            raise ValueError(f"player {p} has no settlement on vertex {v}")
+        self.is_city[v] = True
+        self.city_spots[p].discard(v)
+
+    def place_road(self, p: int, e: int, setup: bool = False):
+        if not (self.can_road(p, e) or (setup and self.edge_owner[e] < 0)):
+            raise ValueError(f"player {p} can't build road {e}")
+        self.edge_owner[e] = p
+        for spots in self.road_spots:
+            spots.discard(e)
+        for x in EDGE_ENDS[e]:
+            if self.vertex_owner[x] >= 0 and self.vertex_owner[x] != p:
+                continue
+            if x in self.open_vertices:
+                self.settlement_spots[p].add(x)
+            for f in EDGES_AT[x]:
+                if self.edge_owner[f] < 0:
+                    self.road_spots[p].add(f)
+
+    def _touches(self, p: int, e: int) -> bool:
+        """Whether p's network reaches edge e through either endpoint."""
+        for x in EDGE_ENDS[e]:
+            owner = self.vertex_owner[x]
+            if owner == p:
+                return True
+            if owner < 0 and any(self.edge_owner[f] == p for f in EDGES_AT[x]):
+                return True
+        return False
+
+    def copy(self) -> 'Placement':
+        c = Placement.__new__(Placement)
+        c.n_players = self.n_players
+        c.vertex_owner = self.vertex_owner.copy()
+        c.edge_owner = self.edge_owner.copy()
+        c.is_city = self.is_city.copy()
+        c.open_vertices = set(self.open_vertices)
+        c.settlement_spots = [set(s) for s in self.settlement_spots]
+        c.road_spots = [set(s) for s in self.road_spots]
+        c.city_spots = [set(s) for s in self.city_spots]
+        return c
+
+
+# -------------------------------------------------------------------
+# LONGEST ROAD
+# -------------------------------------------------------------------
+def _passable(placement: Placement, p: int, x: int) -> bool:
+    """Whether p's roads continue through vertex x (an opponent's building cuts them)."""
+    owner = placement.vertex_owner[x]
+    return owner < 0 or owner == p
+
+
+def _own_edges(placement: Placement, p: int, x: int) -> List[int]:
+    return [f for f in EDGES_AT[x] if placement.edge_owner[f] == p]
+
+
+def _longest_trail(placement: Placement, p: int, edges: Set[int]) -> int:
+    """
+    Longest trail (no edge twice) through p's roads in edges, by DFS.
+    Only ends (vertices of degree other than 2, or cut by an opponent)
+    need to be tried as starts: a longest trail from anywhere else is
+    a loop that can be rotated to start at one of them. Stops as soon
+    as a trail uses every edge, the common case for a real game's
+    short, mostly branch-free roads.
+    """
+    # (edge bit, far vertex) per vertex, and the vertices p can't pass
+    adj: Dict[int, List[Tuple[int, int]]] = {}
+    for e in edges:
+        a, b = EDGE_ENDS[e]
+        adj.setdefault(a, []).append((1 << e, b))
+        adj.setdefault(b, []).append((1 << e, a))
+    cut = {x for x in adj if not _passable(placement, p, x)}
+    bound = len(edges)
+    best = 0
+
+    def walk(x: int, used: int, length: int):
+        nonlocal best
+        if length > best:
+            best = length
+        if best == bound or (length and x in cut):
+            return
+        for bit, y in adj[x]:
+            if not used & bit:
+                walk(y, used | bit, length + 1)
+                if best == bound:
+                    return
+
+    starts = [x for x, out in adj.items() if len(out) != 2 or x in cut] or [next(iter(adj))]
+    for x in sorted(starts, key=lambda x: len(adj[x]) != 1):
+        walk(x, 0, 0)
+        if best == bound:
+            break
+    return best
+
+
+def longest_road_dfs(placement: Placement, p: int) -> int:
+    """Reference: p's longest road by exhaustive DFS over all of its roads."""
+    edges = {e for e in range(len(placement.edge_owner)) if placement.edge_owner[e] == p}
+    best = 0
+
+    def walk(x: int, used: int, length: int):
+        nonlocal best
+        best = max(best, length)
+        if length and not _passable(placement, p, x):
+            return
+        for f in EDGES_AT[x]:
+            if f in edges and not used & (1 << f):
+                a, b = EDGE_ENDS[f]
+                walk(b if a == x else a, used | (1 << f), length + 1)
+
+    for x in {x for e in edges for x in EDGE_ENDS[e]}:
+        walk(x, 0, 0)
+    return best
+
+
+class LongestRoad:
+    """
+    Every player's longest road, kept up to date as roads and settlements
+    go down. Each player's roads are split into components connected
+    through vertices they can pass; a build only re-walks the one component
+    it touched: the merged component of a new road, or the pieces of an
+    opponent's component that a new settlement cut.
+
+    holder follows the base-game card: at least MIN_LONGEST_ROAD roads,
+    taken only by beating the current length outright, and put back in
+    play when a cut leaves no single longest road.
+    """
+
+    def __init__(self, n_players: int):
+        self.component: List[Dict[int, int]] = [{} for _ in range(n_players)]   # edge -> component id
+        self.members: List[Dict[int, Set[int]]] = [{} for _ in range(n_players)]
+        self.trail: List[Dict[int, int]] = [{} for _ in range(n_players)]        # component id -> longest trail
+        self.length: List[int] = [0] * n_players
+        self.holder: Optional[int] = None
+        self._next_id = 0
+
+    def add_road(self, placement: Placement, p: int, e: int):
+        """Call after p's road e is placed."""
+        comp, members, trail = self.component[p], self.members[p], self.trail[p]
+        merged = {e}
+        for x in EDGE_ENDS[e]:
+            if _passable(placement, p, x):
+                for f in _own_edges(placement, p, x):
+                    c = comp.get(f)
+                    if c is not None and c in members:
+                        merged |= members.pop(c)
+                        del trail[c]
+        self._store(placement, p, merged)
+        self._update_holder()
+
+    def add_settlement(self, placement: Placement, p: int, v: int):
+        """Call after p settles v; opponents' roads through v are cut there."""
+        for q in range(len(self.length)):
+            if q == p:
+                continue
+            through = _own_edges(placement, q, v)
+            if len(through) < 2:
+                continue
+            c = self.component[q][through[0]]
+            edges = self.members[q].pop(c)
+            del self.trail[q][c]
+            for piece in self._split(placement, q, edges):
+                self._store(placement, q, piece)
+        self._update_holder()
+
+    def _store(self, placement: Placement, p: int, edges: Set[int]):
+        c = self._next_id
+        self._next_id += 1
+        for f in edges:
+            self.component[p][f] = c
+        self.members[p][c] = edges
+        self.trail[p][c] = _longest_trail(placement, p, edges)
+        self.length[p] = max(self.trail[p].values())
+
+    @staticmethod
+    def _split(placement: Placement, p: int, edges: Set[int]) -> List[Set[int]]:
+        """Connected pieces of edges for p, by flood fill."""
+        left = set(edges)
+        pieces = []
+        while left:
+            stack = [left.pop()]
+            piece = set(stack)
+            while stack:
+                e = stack.pop()
+                for x in EDGE_ENDS[e]:
+                    if not _passable(placement, p, x):
+                        continue
+                    for f in EDGES_AT[x]:
+                        if f in left:
+                            left.discard(f)
+                            piece.add(f)
+                            stack.append(f)
+            pieces.append(piece)
+        return pieces
+
+    def _update_holder(self):
+        best = max(self.length)
+        leaders = [p for p, n in enumerate(self.length) if n == best]
+        if best < MIN_LONGEST_ROAD:
+            self.holder = None
+        elif self.holder is None or self.length[self.holder] < best:
+            self.holder = leaders[0] if len(leaders) == 1 else None
+
+    def copy(self) -> 'LongestRoad':
+        c = LongestRoad.__new__(LongestRoad)
+        c.component = [dict(d) for d in self.component]
+        # component sets are replaced, never mutated, so they can be shared
+        c.members = [dict(d) for d in self.members]
+        c.trail = [dict(d) for d in self.trail]
+        c.length = list(self.length)
+        c.holder = self.holder
+        c._next_id = self._next_id
+        return c
+
+
+# -------------------------------------------------------------------
+# BOARD = LAYOUT + PLACEMENT + LONGEST ROAD
+# -------------------------------------------------------------------
+class GameBoard:
+    """
+    A layout (resource, number per hex) and the placements on it, for
+    TradeEngine(board=...). Seats are indices into engine.players. Where
+    to build is chosen greedily by production (dice probability of the
+    adjoining numbers), lowest id first on ties.
+    """
+
+    def __init__(self, layout: Sequence[Tuple[str, Optional[int]]], n_players: int):
+        self.layout = list(layout)
+        self.placement = Placement(n_players)
+        self.roads = LongestRoad(n_players)
+        # expected production of each vertex
+        pips = [DICE_PROBABILITIES.get(num, 0.0) if res != 'desert' else 0.0 for res, num in self.layout]
+        self.vertex_value = np.array([sum(pips[h] for h in HEXES_AT[v]) for v in range(N_VERTICES)])
+        # source indices each settlement added to its owner, for city upgrades
+        self.vertex_sources: Dict[int, List[int]] = {}
+
+    @classmethod
+    def from_placements(
+        cls,
+        layout: Sequence[Tuple[str, Optional[int]]],
+        n_players: int,
+        settlements: Dict[int, int],
+        cities: Set[int],
+        roads: Dict[int, int],
+        vertex_sources: Dict[int, List[int]],
+        holder: Optional[int]
+    ) -> 'GameBoard':
+        """
+        The board with these buildings on it (settlements and roads as
+        vertex/edge -> owner), whatever order they went down in. Settlements
+        are placed first, so every road sees the final owners: that gives
+        the same legal spots and road components as play order. Who holds
+        the longest road does depend on the order, so it is given.
+        """
+        board = cls(layout, n_players)
+        placement = board.placement
+        for v, p in settlements.items():
+            placement.place_settlement(p, v, setup=True)
+        for v in cities:
+            placement.place_city(settlements[v], v)
+        for e, p in roads.items():
+            placement.place_road(p, e, setup=True)
+            board.roads.add_road(placement, p, e)
+        board.roads.holder = holder
+        board.vertex_sources = {v: list(s) for v, s in vertex_sources.items()}
+        return board
+
+    def sources_at(self, v: int) -> List[Tuple[str, int]]:
+        """(resource, number) of the producing hexes around vertex v."""
+        return [self.layout[h] for h in HEXES_AT[v] if self.layout[h][0] != 'desert']
+
+    # --- greedy spot choice ---
+    def best_settlement(self, p: int, setup: bool = False) -> Optional[int]:
+        spots = self.placement.open_vertices if setup else self.placement.settlement_spots[p]
+        return max(sorted(spots), key=lambda v: self.vertex_value[v], default=None)
+
+    def best_city(self, p: int) -> Optional[int]:
+        return max(sorted(self.placement.city_spots[p]), key=lambda v: self.vertex_value[v], default=None)
+
+    def best_road(self, p: int) -> Optional[int]:
+        """The legal road whose far end is the most productive open vertex."""
+        placement = self.placement
+        def score(e):
+            return max((self.vertex_value[x] for x in EDGE_VERTICES[e] if x in placement.open_vertices), default=-1.0)
+        return max(sorted(placement.road_spots[p]), key=score, default=None)
+
+    def spot_for(self, p: int, goal: str) -> Optional[int]:
+        """Where p would build goal; None if it has nowhere legal (dev cards need no spot: -1)."""
+        if goal == 'settlement':
+            return self.best_settlement(p)
+        if goal == 'city':
+            return self.best_city(p)
+        if goal == 'road':
+            return self.best_road(p)
+        return -1
+
+    def settle(self, p: int, player, v: int, setup: bool = False) -> List[Tuple[str, int, bool]]:
+        """Place a settlement and give player its sources; returns the added sources."""
+        self.placement.place_settlement(p, v, setup)
+        self.roads.add_settlement(self.placement, p, v)
+        start = len(player.resource_sources)
+        added = [(res, num, False) for res, num in self.sources_at(v)]
+        for res, num, _ in added:
+            player.add_source(res, num)
+        self.vertex_sources[v] = list(range(start, start + len(added)))
+        return added
+
+    def build_road(self, p: int, e: int, setup: bool = False):
+        self.placement.place_road(p, e, setup)
+        self.roads.add_road(self.placement, p, e)
+
+    def upgrade(self, p: int, player, v: int) -> List[int]:
+        """Turn p's settlement at v into a city; returns the upgraded source indices."""
+        self.placement.place_city(p, v)
+        for i in self.vertex_sources[v]:
+            player.upgrade_source(i)
+        return self.vertex_sources[v]
+
+    def copy(self) -> 'GameBoard':
+        c = GameBoard.__new__(GameBoard)
+        c.layout = self.layout
+        c.vertex_value = self.vertex_value
+        c.placement = self.placement.copy()
+        c.roads = self.roads.copy()
+        c.vertex_sources = {v: list(s) for v, s in self.vertex_sources.items()}
+        return c
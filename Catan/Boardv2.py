@@ -1,60 +1,77 @@
 # Boardv2.py
 
-import pygame
+import os
 import sys
 import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from BoardGraph import AXIAL_COORDS, EDGE_ENDS, VERTEX_XY
+
+# Nothing here opens a window: BoardRenderer draws onto plain Surfaces, so
+# frames can be exported with no display (see init_headless); only main()
+# sets a display mode. pygame itself is only imported once something draws
+# (see _load_pygame), so the geometry and drawables below cost no GUI import.
+pygame = None
+
+
+def _load_pygame():
+    global pygame
+    if pygame is None:
+        os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+        import pygame as pg
+        pygame = pg
+    return pygame
 
-pygame.init()
 
 # -------------------------------------------------------------------
-# SCREEN & RENDER SURFACE SETUP
+# RENDER SETTINGS
 # -------------------------------------------------------------------
-DISPLAY_INFO   = pygame.display.Info()
-SCREEN_WIDTH   = DISPLAY_INFO.current_w
-SCREEN_HEIGHT  = DISPLAY_INFO.current_h
+# pieces are drawn at SUPERSAMPLE times the output size and smoothscaled
+# down once per change, which is plenty to anti-alias lines and glyphs
+SUPERSAMPLE   = 2
+DEFAULT_WIDTH = 1024
 
-# use 85% of the screen
-WIDTH, HEIGHT    = int(SCREEN_WIDTH * 0.85), int(SCREEN_HEIGHT * 0.85)
-RENDER_SCALE     = 15
-RENDER_WIDTH     = WIDTH * RENDER_SCALE
-RENDER_HEIGHT    = HEIGHT * RENDER_SCALE
 
-SCREEN         = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-render_surface = pygame.Surface((RENDER_WIDTH, RENDER_HEIGHT))
+def init_headless():
+    """Use SDL's dummy video driver so pygame needs no display; call before anything inits the display."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    _load_pygame()
+    pygame.display.init()
+    pygame.font.init()
 
 
 # -------------------------------------------------------------------
 # COLORS
 # -------------------------------------------------------------------
 COLORS = {
-    'brick':      pygame.Color('#c57440'),
-    'lumber':     pygame.Color('#2b4a27'),
-    'grain':      pygame.Color('#facd40'),
-    'wool':       pygame.Color('#a8cd4b'),
-    'ore':        pygame.Color('#534e61'),
-    'desert':     pygame.Color('#deb887'),
-    'background': pygame.Color('white'),
-    'dice_bg':    pygame.Color('yellow'),
+    'brick':      '#c57440',
+    'lumber':     '#2b4a27',
+    'grain':      '#facd40',
+    'wool':       '#a8cd4b',
+    'ore':        '#534e61',
+    'desert':     '#deb887',
+    'background': 'white',
+    'dice_bg':    'yellow',
 }
 PLAYER_COLORS = {
-    'Alice': pygame.Color('red'),
-    'Bob':   pygame.Color('blue'),
+    'Alice': 'red',
+    'Bob':   'blue',
 }
+# for players without a colour of their own, in order of appearance
+EXTRA_PLAYER_COLORS = ['orange', 'white', 'green', 'brown']
 
 
 # -------------------------------------------------------------------
 # HEX GEOMETRY
 # -------------------------------------------------------------------
-HEX_SIZE    = RENDER_WIDTH // 17
-CENTER_X    = RENDER_WIDTH // 2
-CENTER_Y    = RENDER_HEIGHT // 2
-
-def axial_to_cartesian(q, r, size=HEX_SIZE):
-    x = CENTER_X + size * math.sqrt(3) * (q + r/2)
-    y = CENTER_Y + size * 1.5 * r
+# Coordinates are in hex radii around the board centre (the same frame
+# as BoardGraph.VERTEX_XY); a renderer scales them to pixels.
+def axial_to_cartesian(q, r, size=1.0):
+    x = size * math.sqrt(3) * (q + r/2)
+    y = size * 1.5 * r
     return x, y
 
-def hex_vertices(q, r, size=HEX_SIZE):
+def hex_vertices(q, r, size=1.0):
     cx, cy = axial_to_cartesian(q, r, size)
     return [
         (
@@ -101,80 +118,216 @@ BEGINNER_BUILDINGS = [
     {'v1':      hex_vertices(1,2)[5], 'v2':      hex_vertices(1,1)[0], 'player':'Bob'},
 ]
 
-FONT = pygame.font.SysFont(None, HEX_SIZE//2)
+
+# -------------------------------------------------------------------
+# ENGINE STATE -> DRAWABLES
+# -------------------------------------------------------------------
+def layout_hexes(layout) -> List[dict]:
+    """Hex dicts for a (resource, number) per hex layout in BoardGraph.AXIAL_COORDS order (e.g. GameBoard.layout)."""
+    return [{'q': q, 'r': r, 'resource': res, 'number': num} for (res, num), (q, r) in zip(layout, AXIAL_COORDS)]
+
+
+def placement_buildings(placement, names: Sequence[str]) -> List[dict]:
+    """Building dicts for a BoardGraph.Placement; names[seat] is each seat's player name."""
+    buildings = []
+    for e, owner in enumerate(placement.edge_owner):
+        if owner >= 0:
+            a, b = EDGE_ENDS[e]
+            buildings.append({'v1': tuple(VERTEX_XY[a]), 'v2': tuple(VERTEX_XY[b]), 'player': names[owner]})
+    for v, owner in enumerate(placement.vertex_owner):
+        if owner >= 0:
+            buildings.append({'vertex': tuple(VERTEX_XY[v]), 'player': names[owner],
+                              'building': 'city' if placement.is_city[v] else 'settlement'})
+    return buildings
+
+
+def _layer_key(buildings, kind: str) -> tuple:
+    if kind == 'roads':
+        return tuple((tuple(b['v1']), tuple(b['v2']), b['player']) for b in buildings if 'v1' in b and 'v2' in b)
+    return tuple((tuple(b['vertex']), b['player'], b.get('building', 'settlement')) for b in buildings if 'vertex' in b)
 
 
 # -------------------------------------------------------------------
-# DRAW FUNCTION
+# RENDERER
 # -------------------------------------------------------------------
-def draw_board(hexes, buildings=None, size=HEX_SIZE, show_numbers=True):
-    render_surface.fill(COLORS['background'])
-
-    # tiles + dice‐circles + numbers
-    for h in hexes:
-        verts = hex_vertices(h['q'], h['r'], size)
-        pygame.draw.polygon(render_surface,  COLORS[h['resource']], verts)
-        pygame.draw.polygon(render_surface, pygame.Color('black'), verts, 2)
-
-        if show_numbers and h['number'] is not None:
-            cx, cy = axial_to_cartesian(h['q'], h['r'], size)
-            r = size//3
-            pygame.draw.circle(render_surface, COLORS['dice_bg'], (int(cx),int(cy)), r)
-            pygame.draw.circle(render_surface, pygame.Color('black'),   (int(cx),int(cy)), r, 2)
-            txt = FONT.render(str(h['number']), True, pygame.Color('black'))
-            rect = txt.get_rect(center=(cx,cy))
-            render_surface.blit(txt, rect)
-
-    # roads
-    if buildings:
+class BoardRenderer:
+    """
+    Draws a board at width x height. The tiles (the static layer) are
+    drawn once; roads and buildings are separate transparent layers,
+    each redrawn only when its pieces change. Every layer is drawn at
+    supersample times the output size and smoothscaled down once, so
+    an unchanged frame is just three blits.
+    """
+
+    def __init__(
+        self,
+        hexes: Sequence[dict],
+        width: int = DEFAULT_WIDTH,
+        height: Optional[int] = None,
+        supersample: int = SUPERSAMPLE,
+        show_numbers: bool = True
+    ):
+        _load_pygame()
+        pygame.font.init()
+        self.hexes = list(hexes)
+        self.width = width
+        self.height = height or int(width * 0.85)
+        self.ss = supersample
+        self.show_numbers = show_numbers
+        # hex radius and board centre, in supersampled pixels
+        self.size = min(self.width / 17, self.height / 10) * self.ss
+        self.cx, self.cy = self.width * self.ss / 2, self.height * self.ss / 2
+        self._fonts: Dict[int, pygame.font.Font] = {}
+        self._palette = {name: pygame.Color(c) for name, c in COLORS.items()}
+        self._colors: Dict[str, pygame.Color] = {name: pygame.Color(c) for name, c in PLAYER_COLORS.items()}
+        self._base: Optional[pygame.Surface] = None
+        self._layers: Dict[str, Tuple[tuple, pygame.Surface]] = {}
+        self._frame = pygame.Surface((self.width, self.height), 0, 32)
+        self.redraws = {'tiles': 0, 'roads': 0, 'buildings': 0}
+
+    # --- helpers ---
+    def _px(self, point) -> Tuple[float, float]:
+        x, y = point
+        return self.cx + x * self.size, self.cy + y * self.size
+
+    def _font(self, px: int) -> 'pygame.font.Font':
+        font = self._fonts.get(px)
+        if font is None:
+            font = self._fonts[px] = pygame.font.Font(None, px)
+        return font
+
+    def _color(self, name: str) -> 'pygame.Color':
+        color = self._colors.get(name)
+        if color is None:
+            taken = len(self._colors) - len(PLAYER_COLORS)
+            color = self._colors[name] = pygame.Color(EXTRA_PLAYER_COLORS[taken % len(EXTRA_PLAYER_COLORS)])
+        return color
+
+    def _canvas(self, alpha: bool) -> 'pygame.Surface':
+        size = (self.width * self.ss, self.height * self.ss)
+        if alpha:
+            surf = pygame.Surface(size, pygame.SRCALPHA, 32)
+            surf.fill((0, 0, 0, 0))
+        else:
+            surf = pygame.Surface(size, 0, 32)
+            surf.fill(self._palette['background'])
+        return surf
+
+    def _shrink(self, surf: 'pygame.Surface') -> 'pygame.Surface':
+        return pygame.transform.smoothscale(surf, (self.width, self.height))
+
+    # --- layers ---
+    def _draw_tiles(self) -> 'pygame.Surface':
+        surf = self._canvas(alpha=False)
+        size, line = self.size, 2 * self.ss
+        for h in self.hexes:
+            verts = [self._px(p) for p in hex_vertices(h['q'], h['r'])]
+            pygame.draw.polygon(surf, self._palette[h['resource']], verts)
+            pygame.draw.polygon(surf, pygame.Color('black'), verts, line)
+
+            if self.show_numbers and h['number'] is not None:
+                cx, cy = self._px(axial_to_cartesian(h['q'], h['r']))
+                r = int(size // 3)
+                pygame.draw.circle(surf, self._palette['dice_bg'], (int(cx), int(cy)), r)
+                pygame.draw.circle(surf, pygame.Color('black'), (int(cx), int(cy)), r, line)
+                txt = self._font(int(size // 2)).render(str(h['number']), True, pygame.Color('black'))
+                surf.blit(txt, txt.get_rect(center=(cx, cy)))
+        self.redraws['tiles'] += 1
+        return self._shrink(surf)
+
+    def _draw_roads(self, buildings) -> 'pygame.Surface':
+        surf = self._canvas(alpha=True)
         for b in buildings:
             if 'v1' in b and 'v2' in b:
-                pygame.draw.line(
-                    render_surface,
-                    PLAYER_COLORS[b['player']],
-                    b['v1'], b['v2'],
-                    max(1, size//8)
-                )
-
-    # settlements & cities
-    if buildings:
+                pygame.draw.line(surf, self._color(b['player']), self._px(b['v1']), self._px(b['v2']),
+                                 max(1, int(self.size // 8)))
+        self.redraws['roads'] += 1
+        return self._shrink(surf)
+
+    def _draw_buildings(self, buildings) -> 'pygame.Surface':
+        surf = self._canvas(alpha=True)
+        line = 2 * self.ss
         for b in buildings:
             if 'vertex' in b:
-                x,y   = b['vertex']
-                color = PLAYER_COLORS[b['player']]
-                btype = b.get('building','settlement')
-                if btype=='settlement':
-                    s = size//4
-                    rect = pygame.Rect(x-s,y-s,2*s,2*s)
-                    pygame.draw.rect(render_surface, color, rect)
-                    pygame.draw.rect(render_surface, pygame.Color('black'), rect, 2)
+                x, y  = self._px(b['vertex'])
+                color = self._color(b['player'])
+                if b.get('building', 'settlement') == 'settlement':
+                    s = self.size // 4
+                    rect = pygame.Rect(int(x - s), int(y - s), int(2 * s), int(2 * s))
+                    pygame.draw.rect(surf, color, rect)
+                    pygame.draw.rect(surf, pygame.Color('black'), rect, line)
                 else:  # city
-                    s   = size//3
-                    pts = [(x,y-s),(x+s,y),(x,y+s),(x-s,y)]
-                    pygame.draw.polygon(render_surface, color,     pts)
-                    pygame.draw.polygon(render_surface, pygame.Color('black'), pts, 2)
+                    s   = self.size // 3
+                    pts = [(x, y - s), (x + s, y), (x, y + s), (x - s, y)]
+                    pygame.draw.polygon(surf, color, pts)
+                    pygame.draw.polygon(surf, pygame.Color('black'), pts, line)
+        self.redraws['buildings'] += 1
+        return self._shrink(surf)
+
+    def _layer(self, kind: str, buildings, draw) -> 'pygame.Surface':
+        key = _layer_key(buildings, kind)
+        cached = self._layers.get(kind)
+        if cached is None or cached[0] != key:
+            cached = self._layers[kind] = (key, draw(buildings))
+        return cached[1]
+
+    # --- output ---
+    def render(self, buildings=None) -> 'pygame.Surface':
+        """The board with buildings on it; the returned Surface is reused by the next call."""
+        if self._base is None:
+            self._base = self._draw_tiles()
+        buildings = buildings or []
+        frame = self._frame
+        frame.blit(self._base, (0, 0))
+        frame.blit(self._layer('roads', buildings, self._draw_roads), (0, 0))
+        frame.blit(self._layer('buildings', buildings, self._draw_buildings), (0, 0))
+        return frame
+
+    def save_png(self, path: str, buildings=None):
+        pygame.image.save(self.render(buildings), path)
+
 
-    # down‐scale & blit
-    scaled = pygame.transform.smoothscale(render_surface, (WIDTH, HEIGHT))
-    SCREEN.blit(scaled, (0,0))
-    pygame.display.flip()
+def export_frames(hexes, frames, directory: str, pattern: str = 'frame_{:05d}.png', **renderer_kw) -> int:
+    """
+    Write one PNG per buildings list in frames to directory, headlessly;
+    returns the number written. Consecutive frames share cached layers.
+    """
+    init_headless()
+    os.makedirs(directory, exist_ok=True)
+    renderer = BoardRenderer(hexes, **renderer_kw)
+    n = 0
+    for n, buildings in enumerate(frames, 1):
+        renderer.save_png(os.path.join(directory, pattern.format(n - 1)), buildings)
+    return n
 
 
 # -------------------------------------------------------------------
 # SELF‐RUN DEMO
 # -------------------------------------------------------------------
 def main():
+    _load_pygame()
+    pygame.init()
+    # use 85% of the screen
+    info = pygame.display.Info()
+    width, height = int(info.current_w * 0.85), int(info.current_h * 0.85)
+    screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
     # only here do we set *this* caption:
     pygame.display.set_caption("Catan Board Visualization – Boardv2.py")
+    renderer = BoardRenderer(BEGINNER_HEXES, width, height)
     clock = pygame.time.Clock()
+    dirty = True
     while True:
         for e in pygame.event.get():
             if e.type==pygame.QUIT:
                 pygame.quit(); sys.exit()
-        draw_board(BEGINNER_HEXES,
-                   buildings=BEGINNER_BUILDINGS,
-                   size=HEX_SIZE,
-                   show_numbers=True)
+            if e.type==pygame.VIDEORESIZE:
+                renderer = BoardRenderer(BEGINNER_HEXES, e.w, e.h)
+                dirty = True
+        # nothing changes between frames unless the window does
+        if dirty:
+            screen.blit(renderer.render(BEGINNER_BUILDINGS), (0, 0))
+            pygame.display.flip()
+            dirty = False
         clock.tick(30)
 
 
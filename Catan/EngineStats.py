@@ -0,0 +1,81 @@
+# EngineStats.py
+
+import json
+from typing import Dict, Iterable, Optional
+
+from Players import BUILDING_COSTS
+
+# run_trading_round phases, timed back to back: the roll is part of distribute
+PHASES = ('distribute', 'trade', 'build', 'summary')
+
+# proposals   : offers stated by a personality
+# acceptances : trades executed (each player of a cleared market cycle counts once)
+# rejections  : a responder's accept_trade said no
+# unaffordable: a responder who accepted, or was asked, couldn't pay (execute_trade's check)
+COUNTERS = ('rounds', 'proposals', 'acceptances', 'rejections', 'unaffordable', 'bank_trades') \
+    + tuple(f'build_{g}' for g in BUILDING_COSTS)
+
+
+class EngineStats:
+    """
+    Per-phase nanosecond timers and event counters for TradeEngine. Off
+    unless an instance is passed as TradeEngine(stats=...); the engine
+    then adds to it every round, so one EngineStats shared by many games
+    (or merged from many processes, see Sweep.profile_games) aggregates
+    all of them.
+    """
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        self.counts: Dict[str, int] = dict.fromkeys(tuple(f'{p}_ns' for p in PHASES) + COUNTERS, 0)
+        if counts:
+            self.merge(counts)
+
+    # --- called by the engine, with perf_counter_ns readings ---
+    def add_round(self, t0: int, t1: int, t2: int, t3: int, t4: int):
+        c = self.counts
+        c['distribute_ns'] += t1 - t0
+        c['trade_ns'] += t2 - t1
+        c['build_ns'] += t3 - t2
+        c['summary_ns'] += t4 - t3
+        c['rounds'] += 1
+
+    def count(self, key: str, n: int = 1):
+        self.counts[key] += n
+
+    # --- aggregation and export ---
+    def merge(self, other):
+        """Add another EngineStats (or its as_dict()) into this one."""
+        for k, v in (other.counts if isinstance(other, EngineStats) else other).items():
+            self.counts[k] = self.counts.get(k, 0) + v
+        return self
+
+    @classmethod
+    def combine(cls, parts: Iterable) -> 'EngineStats':
+        total = cls()
+        for p in parts:
+            total.merge(p)
+        return total
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.counts, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'EngineStats':
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def report(self) -> str:
+        c = self.counts
+        rounds = c['rounds'] or 1
+        total = sum(c[f'{p}_ns'] for p in PHASES) or 1
+        lines = [f"{c['rounds']} rounds, {total / rounds / 1000:.1f} us/round"]
+        for p in PHASES:
+            ns = c[f'{p}_ns']
+            lines.append(f"  {p:<16} {ns / rounds / 1000:8.1f} us/round  {ns / total:6.1%}")
+        for k in COUNTERS[1:]:
+            lines.append(f"  {k:<16} {c[k]}")
+        return "\n".join(lines)
@@ -0,0 +1,154 @@
+# Estimator.py
+
+import math
+from typing import List, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+from Agents import ParameterizedTrader, TraderParams
+from Tournament import Entrant, play_game, play_unit
+
+# one side of a matchup: a Personality recipe, or a ParameterizedTrader's (alpha, beta)
+Side = Union[Entrant, TraderParams]
+
+
+class WinRate(NamedTuple):
+    wins: int      # games won by A
+    losses: int    # games won by B
+    draws: int     # no winner within the round limit
+    p: float       # wins / (wins + losses)
+    lo: float      # confidence interval on p
+    hi: float
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.losses + self.draws
+
+    @property
+    def width(self) -> float:
+        return self.hi - self.lo
+
+    @property
+    def decided(self) -> bool:
+        """True once the interval excludes an even matchup."""
+        return self.lo > 0.5 or self.hi < 0.5
+
+
+def wilson_interval(wins: int, n: int, z: float = 1.96) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _entrant(side: Side) -> Entrant:
+    if isinstance(side, Entrant):
+        return side
+    alpha, beta = side
+    return Entrant(f"({alpha}, {beta})", ParameterizedTrader, {'alpha': alpha, 'beta': beta})
+
+
+def play_block(
+    a: Side,
+    b: Side,
+    seeds: Sequence[int],
+    max_rounds: int = 200,
+    engine: str = 'batch'
+) -> Tuple[int, int, int]:
+    """
+    (wins, losses, draws) of A against B. Every seed is played twice, once
+    with A as Alice and once as Bob, on the same GameStreams seed, so seat
+    and dice luck are common to both sides. engine='batch' plays as
+    Tournament.play_unit: in BatchEngine (identical results) when both
+    sides are plain ParameterizedTraders, else on TradeEngine; 'python'
+    always plays on TradeEngine.
+    """
+    a, b = _entrant(a), _entrant(b)
+    if engine == 'batch':
+        first  = play_unit([a, b], seeds, max_rounds)
+        second = play_unit([b, a], seeds, max_rounds)
+    elif engine == 'python':
+        first  = np.array([play_game([a.make(), b.make()], s, max_rounds)[0] for s in seeds])
+        second = np.array([play_game([b.make(), a.make()], s, max_rounds)[0] for s in seeds])
+    else:
+        raise ValueError(f"unknown engine {engine!r}")
+    wins   = int((first == 0).sum() + (second == 1).sum())
+    losses = int((first == 1).sum() + (second == 0).sum())
+    draws  = int((first == -1).sum() + (second == -1).sum())
+    return wins, losses, draws
+
+
+def _win_rate(wins: int, losses: int, draws: int, z: float) -> WinRate:
+    decided = wins + losses
+    lo, hi = wilson_interval(wins, decided, z)
+    return WinRate(wins, losses, draws, wins / decided if decided else 0.5, lo, hi)
+
+
+def _done(rate: WinRate, target_width: float, stop_when_decided: bool, max_games: int) -> bool:
+    return (rate.width <= target_width
+            or (stop_when_decided and rate.decided)
+            or rate.games >= max_games)
+
+
+def estimate_win_rate(
+    a: Side,
+    b: Side,
+    target_width: float = 0.02,
+    batch_size: int = 500,
+    max_games: int = 200_000,
+    z: float = 1.96,
+    seed: int = 0,
+    stop_when_decided: bool = False,
+    max_rounds: int = 200,
+    engine: str = 'batch'
+) -> WinRate:
+    """
+    Play A against B in blocks of batch_size seeds (seed, seed+1, ...) until
+    the Wilson interval on A's win rate is at most target_width wide, or,
+    with stop_when_decided, as soon as it excludes 0.5.
+    """
+    wins = losses = draws = 0
+    start = seed
+    rate = _win_rate(0, 0, 0, z)
+    while not _done(rate, target_width, stop_when_decided, max_games):
+        w, l, d = play_block(a, b, range(start, start + batch_size), max_rounds, engine)
+        wins, losses, draws = wins + w, losses + l, draws + d
+        start += batch_size
+        rate = _win_rate(wins, losses, draws, z)
+    return rate
+
+
+def compare(
+    candidates: Sequence[Side],
+    opponent: Side,
+    target_width: float = 0.02,
+    batch_size: int = 500,
+    max_games: int = 200_000,
+    z: float = 1.96,
+    seed: int = 0,
+    stop_when_decided: bool = False,
+    max_rounds: int = 200,
+    engine: str = 'batch'
+) -> List[WinRate]:
+    """
+    estimate_win_rate for several candidates against one opponent. All
+    candidates see the same seed blocks in the same order (common random
+    numbers), and each stops on its own once its interval is narrow enough.
+    """
+    totals = [[0, 0, 0] for _ in candidates]
+    rates = [_win_rate(0, 0, 0, z) for _ in candidates]
+    start = seed
+    while not all(_done(r, target_width, stop_when_decided, max_games) for r in rates):
+        seeds = range(start, start + batch_size)
+        for i, cand in enumerate(candidates):
+            if _done(rates[i], target_width, stop_when_decided, max_games):
+                continue
+            w, l, d = play_block(cand, opponent, seeds, max_rounds, engine)
+            totals[i] = [totals[i][0] + w, totals[i][1] + l, totals[i][2] + d]
+            rates[i] = _win_rate(*totals[i], z)
+        start += batch_size
+    return rates
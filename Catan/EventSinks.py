@@ -0,0 +1,94 @@
+# EventSinks.py
+
+from typing import Dict, List, Optional
+
+
+class EventSink:
+    """
+    Receives TradeEngine round events. Subclasses override the hooks they
+    care about; enabled=False tells the engine not to build event payloads
+    at all.
+    """
+    enabled = True
+
+    def attach(self, engine):
+        # called once by TradeEngine.__init__, before the first round
+        pass
+    def on_roll(self, roll: int):
+        pass
+    def on_gains(self, player, gains: Dict[str,int]):
+        pass
+    def on_trades(self, trades: List):
+        pass
+    def on_builds(self, builds: List):
+        pass
+    def on_resources(self, players: List):
+        pass
+    def on_game_over(self, winner: Optional[str], rounds: int):
+        pass
+
+
+class NullSink(EventSink):
+    """Drops everything; the engine skips all event bookkeeping."""
+    enabled = False
+
+
+class ConsoleSink(EventSink):
+    """The original console printout of run_trading_round."""
+
+    def on_roll(self, roll):
+        print(f"\n--- Dice roll: {roll} ---")
+
+    def on_gains(self, player, gains):
+        print(f"{player.name} gains {dict(gains)}")
+
+    def on_trades(self, trades):
+        if trades:
+            for g, r, gv, gt in trades:
+                print(f"Trade: {g} → {r} gives {gv}, gets {gt}")
+        else:
+            print("No trades")
+
+    def on_builds(self, builds):
+        if builds:
+            for name, b in builds:
+                print(f"Build: {name} built {b}")
+        else:
+            print("No builds")
+
+    def on_resources(self, players):
+        print("Resources:")
+        for p in players:
+            print(f" {p.name}: {p.resources}")
+
+    def on_game_over(self, winner, rounds):
+        if winner is None:
+            print(f"\n--- No winner after {rounds - 1} rounds ---\n")
+        else:
+            print(f"\n!!! {winner} wins in {rounds} rounds !!!\n")
+
+
+class MemorySink(EventSink):
+    """
+    Collects one dict per round: roll, per-player gains, trades and builds.
+    Hands are not copied each round; they follow from gains and trades.
+    """
+
+    def __init__(self):
+        self.rounds: List[dict] = []
+        self.winner: Optional[str] = None
+
+    def on_roll(self, roll):
+        self.rounds.append({'roll': roll, 'gains': {}, 'trades': [], 'builds': []})
+
+    def on_gains(self, player, gains):
+        self.rounds[-1]['gains'][player.name] = dict(gains)
+
+    def on_trades(self, trades):
+        self.rounds[-1]['trades'] = trades
+
+    def on_builds(self, builds):
+        self.rounds[-1]['builds'] = builds
+
+    def on_game_over(self, winner, rounds):
+        self.winner = winner
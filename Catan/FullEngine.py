@@ -1,10 +1,26 @@
 # FullEngine.py
 
 import random
-from collections import defaultdict
-from typing import List, Optional, Dict, Tuple
+from time import perf_counter_ns
+from typing import List, NamedTuple, Optional, Dict, Tuple
 
-from Players import Player, RESOURCES, BUILDING_COSTS, DICE_PROBABILITIES
+from Players import Player, PlayerState, RESOURCES, BUILDING_COSTS, DICE_PROBABILITIES
+from EventSinks import EventSink, ConsoleSink, NullSink
+from Market import clear_market
+from EngineStats import EngineStats
+
+# RngStreams, Trades and BoardGraph pull in numpy, so they are imported
+# where streams, bank trades or a board are first used: plain games load
+# the engine without it
+
+
+class EngineState(NamedTuple):
+    """Immutable engine snapshot; see TradeEngine.snapshot."""
+    players: Tuple[PlayerState, ...]
+    roll_index: int
+    round_num: int
+    rng_state: tuple    # Random.getstate(), or the (dice, tiles, shuffle) stream counters
+    board: Optional['GameBoard'] = None   # a private copy, when playing on a board
 
 
 class TradeEngine:
@@ -12,19 +28,86 @@ class TradeEngine:
         self,
         players: List[Player],
         dice_rolls: Optional[List[int]] = None,
-        rng: Optional[random.Random] = None
+        rng: Optional[random.Random] = None,
+        sink: Optional[EventSink] = None,
+        streams: Optional['GameStreams'] = None,
+        market: bool = False,
+        board: Optional['GameBoard'] = None,
+        stats: Optional[EngineStats] = None
     ):
         self.players = players
         self.dice_rolls = dice_rolls
         self.roll_index = 0
+        self.round_num = 0
         self.rng = rng or random.Random()
+        self.sink = sink or ConsoleSink()
+        # dice, tiles and partner shuffling share rng unless per-round streams are given
+        self.streams = streams
+        self.dice_rng    = streams.dice    if streams else self.rng
+        self.tile_rng    = streams.tiles   if streams else self.rng
+        self.shuffle_rng = streams.shuffle if streams else self.rng
+        # market=True clears all offers at once (Market.clear_market) instead of one proposer at a time
+        self.market = market
+        # with a board, settlements, cities and roads go on real spots instead of random tiles
+        self.board = board
+        # (player name, added tiles, upgraded tile indices) per build this round
+        self.tile_changes: List[Tuple[str, List, List[int]]] = []
+        # per-phase timers and trade/build counters, only kept when given
+        self.stats = stats
+        self.sink.attach(self)
+
+    # --- state snapshots, for search agents ---
+    def snapshot(self) -> EngineState:
+        """
+        Capture hands, goals, sources, buildings, roll position and RNG state.
+        Player sources are shared, not copied, so this is a few small tuples
+        plus the Mersenne Twister state (or three stream counters).
+        """
+        if self.streams:
+            rng_state = (self.streams.dice.counter, self.streams.tiles.counter, self.streams.shuffle.counter)
+        else:
+            rng_state = self.rng.getstate()
+        board = self.board.copy() if self.board is not None else None
+        return EngineState(tuple(p.snapshot() for p in self.players), self.roll_index, self.round_num, rng_state, board)
+
+    def restore(self, state: EngineState, rng: bool = True):
+        """
+        Roll this engine back (or forward) to a snapshot taken from it or a
+        fork of it. rng=False keeps the engine's own RNG, e.g. for rollouts
+        that reseed it.
+        """
+        for p, ps in zip(self.players, state.players):
+            p.restore(ps)
+        self.roll_index = state.roll_index
+        self.round_num = state.round_num
+        self.board = state.board.copy() if state.board is not None else None
+        if not rng:
+            return
+        if self.streams:
+            for stream, counter in zip((self.streams.dice, self.streams.tiles, self.streams.shuffle), state.rng_state):
+                stream.seek(counter)
+        else:
+            self.rng.setstate(state.rng_state)
+
+    def fork(self, state: Optional[EngineState] = None, sink: Optional[EventSink] = None) -> 'TradeEngine':
+        """
+        An independent engine at state (default: now) with fresh players of
+        the same class. Personalities and dice_rolls are shared; the fork
+        logs to a NullSink unless given a sink.
+        """
+        from RngStreams import GameStreams
+        players = [type(p)(p.name, p.personality) for p in self.players]
+        streams = GameStreams(self.streams.game_seed) if self.streams else None
+        engine = TradeEngine(players, self.dice_rolls, random.Random(0), sink or NullSink(), streams, self.market)
+        engine.restore(state or self.snapshot())
+        return engine
 
     def _next_roll(self) -> int:
         if self.dice_rolls and self.roll_index < len(self.dice_rolls):
             r = self.dice_rolls[self.roll_index]
             self.roll_index += 1
             return r
-        return self.rng.randint(1, 6) + self.rng.randint(1, 6)
+        return self.dice_rng.randint(1, 6) + self.dice_rng.randint(1, 6)
 
     def execute_trade(
         self,
@@ -52,6 +135,9 @@ class TradeEngine:
         If player can build their current goal, pay cost, record building,
         and then for settlement: add 3 new tiles;
         for city: upgrade one existing settlement's 3 tiles to a city.
+        With a board, the building goes on the best legal spot (none: no
+        build), a settlement adds the sources of its adjoining hexes, and
+        board.roads keeps every player's longest road current.
         """
         if not player.goal_queue:
             return False
@@ -62,20 +148,39 @@ class TradeEngine:
         if not all(player.resources.get(r, 0) >= c for r, c in cost.items()):
             return False
 
+        # On a board the building needs a legal spot
+        board = self.board
+        if board is not None:
+            seat = self.players.index(player)
+            spot = board.spot_for(seat, goal)
+            if spot is None:
+                return False
+
         # Pay cost
         for r, c in cost.items():
             player.remove_resource(r, c)
 
         # Record building
         player.buildings.append(goal)
-        player.goal_queue.pop(0)
+        player.pop_goal()
 
-        if goal == 'settlement':
+        if board is not None:
+            if goal == 'settlement':
+                self.tile_changes.append((player.name, board.settle(seat, player, spot), []))
+            elif goal == 'city':
+                self.tile_changes.append((player.name, [], list(board.upgrade(seat, player, spot))))
+            elif goal == 'road':
+                board.build_road(seat, spot)
+
+        elif goal == 'settlement':
             # Add 3 new random settlement tiles
+            added = []
             for _ in range(3):
-                res  = self.rng.choice(RESOURCES)
-                dice = self.rng.choice(list(DICE_PROBABILITIES.keys()))
-                player.resource_sources.append((res, dice, False))
+                res  = self.tile_rng.choice(RESOURCES)
+                dice = self.tile_rng.choice(list(DICE_PROBABILITIES.keys()))
+                player.add_source(res, dice)
+                added.append((res, dice, False))
+            self.tile_changes.append((player.name, added, []))
 
         elif goal == 'city':
             # Find all settlement groups (chunks of 3 with is_city=False)
@@ -86,64 +191,125 @@ class TradeEngine:
                 if not any(is_city for (_, _, is_city) in chunk):
                     groups.append(k)
             if groups:
-                chosen = self.rng.choice(groups)
+                chosen = self.tile_rng.choice(groups)
                 # Upgrade those 3 tiles
                 for j in range(3):
-                    res, dice, _ = player.resource_sources[3*chosen + j]
-                    player.resource_sources[3*chosen + j] = (res, dice, True)
+                    player.upgrade_source(3*chosen + j)
+                self.tile_changes.append((player.name, [], [3*chosen + j for j in range(3)]))
 
         # road or dev_card have no tile effect
         return True
 
-    def run_trading_round(self) -> Tuple[int, List, List]:
-        roll = self._next_roll()
-        print(f"\n--- Dice roll: {roll} ---")
-
-        # 1) Distribute resources
-        for p in self.players:
-            gains = defaultdict(int)
-            for res, dice, is_city in p.resource_sources:
-                if dice == roll:
-                    amt = 2 if is_city else 1
-                    p.add_resource(res, amt)
-                    gains[res] += amt
-            if gains:
-                print(f"{p.name} gains {dict(gains)}")
-
-        # 2) Trading phase
+    def trading_phase(self, start: int = 0) -> List:
+        """Each of players[start:] proposes at most one trade; returns the executed trades."""
         trades = []
-        for p in self.players:
+        for p in self.players[start:]:
             others = [o for o in self.players if o is not p]
             offer = p.personality.propose_trade(p, others)
             if not offer:
                 continue
-            give, get = offer
-            self.rng.shuffle(others)
-            for o in others:
-                if o.personality.accept_trade(o, give, get, p):
-                    if self.execute_trade(p, o, give, get):
-                        trades.append((p.name, o.name, give, get))
-                    break
-        if trades:
-            for g, r, gv, gt in trades:
-                print(f"Trade: {g} → {r} gives {gv}, gets {gt}")
-        else:
-            print("No trades")
+            if self.stats is not None:
+                self.stats.count('proposals')
+            trade = self.offer_trade(p, others, *offer)
+            if trade:
+                trades.append(trade)
+        return trades
 
-        # 3) Building phase
+    def offer_trade(self, p: Player, others: List[Player], give: Dict[str, int], get: Dict[str, int]):
+        """Put p's offer to others in random order; the first to accept trades. Returns the trade or None."""
+        stats = self.stats
+        self.shuffle_rng.shuffle(others)
+        for o in others:
+            if o.personality.accept_trade(o, give, get, p):
+                if self.execute_trade(p, o, give, get):
+                    if stats is not None:
+                        stats.count('acceptances')
+                    return (p.name, o.name, give, get)
+                if stats is not None:
+                    stats.count('unaffordable')
+                return None
+            if stats is not None:
+                stats.count('rejections')
+        return None
+
+    def bank_trade(self, player: Player, give: Dict[str, int], get: Dict[str, int]) -> bool:
+        """Trade with the bank at player's port/bank rates; False if illegal or unaffordable."""
+        from Trades import is_bank_trade
+        if not is_bank_trade(give, get, player.trade_rates):
+            return False
+        if not all(player.resources.get(r, 0) >= c for r, c in give.items()):
+            return False
+        for r, c in give.items():
+            player.remove_resource(r, c)
+        for r, c in get.items():
+            player.add_resource(r, c)
+        return True
+
+    def bank_phase(self) -> List:
+        """Each player may make one bank/port trade, via its personality's bank_trade."""
+        trades = []
+        for p in self.players:
+            offer = p.personality.bank_trade(p)
+            if offer and self.bank_trade(p, *offer):
+                trades.append((p.name, 'bank', offer[0], offer[1]))
+                if self.stats is not None:
+                    self.stats.count('bank_trades')
+        return trades
+
+    def building_phase(self) -> List:
+        """Every player builds their current goal if they can; returns (name, building) pairs."""
         builds = []
+        self.tile_changes = []
         for p in self.players:
             if self.attempt_build(p):
                 builds.append((p.name, p.buildings[-1]))
-        if builds:
-            for name, b in builds:
-                print(f"Build: {name} built {b}")
-        else:
-            print("No builds")
+                if self.stats is not None:
+                    self.stats.count('build_' + p.buildings[-1])
+        return builds
 
-        # 4) Resource summary
-        print("Resources:")
+    def run_trading_round(self) -> Tuple[int, List, List]:
+        sink = self.sink
+        log = sink.enabled
+        stats = self.stats
+        if stats is not None:
+            t0 = perf_counter_ns()
+        self.round_num += 1
+        if self.streams:
+            self.streams.seek_round(self.round_num)
+        roll = self._next_roll()
+        if log:
+            sink.on_roll(roll)
+
+        # 1) Distribute resources
         for p in self.players:
-            print(f" {p.name}: {p.resources}")
+            gains = p.collect(roll, log)
+            if gains and log:
+                sink.on_gains(p, gains)
+
+        if stats is not None:
+            t1 = perf_counter_ns()
+
+        # 2) Trading phase
+        trades = clear_market(self) if self.market else self.trading_phase()
+        trades += self.bank_phase()
+        if log:
+            sink.on_trades(trades)
+
+        if stats is not None:
+            t2 = perf_counter_ns()
+
+        # 3) Building phase
+        builds = self.building_phase()
+        if log:
+            sink.on_builds(builds)
+
+        if stats is not None:
+            t3 = perf_counter_ns()
+
+        # 4) Resource summary
+        if log:
+            sink.on_resources(self.players)
+        if stats is not None:
+            stats.add_round(t0, t1, t2, t3, perf_counter_ns())
 
         return roll, trades, builds
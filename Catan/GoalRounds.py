@@ -0,0 +1,184 @@
+# GoalRounds.py
+
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from Players import RESOURCES, BUILDING_COSTS, DICE_PROBABILITIES
+
+DICE_VALUES = list(DICE_PROBABILITIES.keys())
+# two-dice totals the engine can roll; 7 pays nothing
+ROLL_PROBABILITIES = {t: (6 - abs(t - 7)) / 36 for t in range(2, 13)}
+
+# a tile as (resource index or None for a random one, dice or None, amount)
+Tile = Tuple[object, object, int]
+Gain = Tuple[int, ...]
+
+
+class RoundsDistribution(NamedTuple):
+    pmf: np.ndarray       # pmf[r] = P(last goal is built in round r), pmf[0] = 0
+    unfinished: float     # P(goals still open after max_rounds)
+
+    def mean(self) -> float:
+        """Expected rounds, conditional on finishing within max_rounds."""
+        done = 1.0 - self.unfinished
+        return float(np.arange(len(self.pmf)) @ self.pmf / done) if done > 1e-12 else float('inf')
+
+    def cdf(self) -> np.ndarray:
+        return np.cumsum(self.pmf)
+
+
+def _tile_gain(tile: Tile, roll: int) -> Dict[Gain, float]:
+    """Distribution of one tile's payout on a given roll."""
+    res, dice, amt = tile
+    n = len(RESOURCES)
+    if dice is None:
+        p_hit = 1 / len(DICE_VALUES) if roll in DICE_PROBABILITIES else 0.0
+    else:
+        p_hit = 1.0 if dice == roll else 0.0
+    if p_hit == 0.0:
+        return {(0,) * n: 1.0}
+    out = {(0,) * n: 1.0 - p_hit} if p_hit < 1.0 else {}
+    targets = range(n) if res is None else [res]
+    for j in targets:
+        g = tuple(amt if k == j else 0 for k in range(n))
+        out[g] = out.get(g, 0.0) + p_hit / len(targets)
+    return out
+
+
+def _convolve(a: Dict[Gain, float], b: Dict[Gain, float], caps: Gain) -> Dict[Gain, float]:
+    """Distribution of the sum of two independent gains, clipped to caps."""
+    out: Dict[Gain, float] = {}
+    for ga, pa in a.items():
+        for gb, pb in b.items():
+            g = tuple(min(x + y, c) for x, y, c in zip(ga, gb, caps))
+            out[g] = out.get(g, 0.0) + pa * pb
+    return out
+
+
+def _round_gains(components: List[List[Tuple[float, List[Tile]]]], caps: Gain) -> Dict[Gain, float]:
+    """
+    Per-round gain distribution, clipped to caps: the roll, then every
+    component, where a component is a list of (probability, tiles)
+    alternatives.
+    """
+    zero = (0,) * len(RESOURCES)
+    total: Dict[Gain, float] = {}
+    for roll, p_roll in ROLL_PROBABILITIES.items():
+        dist = {zero: 1.0}
+        for alternatives in components:
+            mix: Dict[Gain, float] = {}
+            for p_alt, tiles in alternatives:
+                d = {zero: 1.0}
+                for tile in tiles:
+                    d = _convolve(d, _tile_gain(tile, roll), caps)
+                for g, p in d.items():
+                    mix[g] = mix.get(g, 0.0) + p_alt * p
+            dist = _convolve(dist, mix, caps)
+        for g, p in dist.items():
+            total[g] = total.get(g, 0.0) + p_roll * p
+    return total
+
+
+def _stage_components(sources, goals: List[str], new_tiles: bool):
+    """Income components in force while each goal is being saved for."""
+    base = [(RESOURCES.index(res), dice, 2 if is_city else 1) for res, dice, is_city in sources]
+    fixed_chunks = [
+        [(r, d, 1) for r, d, _ in base[3*k : 3*k+3]]
+        for k in range(len(sources) // 3)
+        if not any(c for _, _, c in sources[3*k : 3*k+3])
+    ]
+    random_chunk = [(None, None, 1)] * 3
+
+    components = [[(1.0, base)]]
+    per_stage = []
+    settlements = 0
+    for goal in goals:
+        per_stage.append(list(components))
+        if not new_tiles:
+            continue
+        if goal == 'settlement':
+            # attempt_build adds three random (resource, dice) tiles
+            components.append([(1.0, random_chunk)])
+            settlements += 1
+        elif goal == 'city':
+            # one settlement chunk, picked at random, starts paying double
+            chunks = fixed_chunks + [random_chunk] * settlements
+            if chunks:
+                components.append([(1 / len(chunks), c) for c in chunks])
+    return per_stage
+
+
+def _hand_space(caps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Every hand with 0 <= hand <= caps, and the radix that indexes them."""
+    hands = np.stack(np.meshgrid(*[np.arange(c + 1) for c in caps], indexing='ij'), -1).reshape(-1, len(caps))
+    radix = np.cumprod(np.concatenate([[1], caps[:0:-1] + 1]))[::-1]
+    return hands, radix
+
+
+def rounds_to_goals(player, max_rounds: int = 200, new_tiles: bool = True, tol: float = 1e-12) -> RoundsDistribution:
+    """
+    Distribution of the number of rounds until player builds every goal in
+    its goal_queue without trading, following TradeEngine's round order:
+    roll, collect, then build at most the current goal.
+
+    The chain runs over (goals built, hand clipped to what the remaining
+    goals can still use), so it is exact for the player's current sources.
+    With new_tiles, settlements and cities change income the way
+    attempt_build does. This part is a mean-field approximation: the random
+    new tiles and the randomly upgraded chunk are redrawn each round
+    instead of being fixed once.
+    """
+    goals = list(player.goal_queue)
+    pmf = np.zeros(max_rounds + 1)
+    if not goals:
+        return RoundsDistribution(pmf, 0.0)
+
+    # while saving for goal s only what goals s.. still need matters, so
+    # stage s runs over hands clipped to need[s]
+    cost = np.array([[BUILDING_COSTS[g].get(r, 0) for r in RESOURCES] for g in goals], dtype=np.int64)
+    need = np.cumsum(cost[::-1], axis=0)[::-1]
+    need = np.vstack([need, np.zeros(len(RESOURCES), dtype=np.int64)])
+    spaces = [_hand_space(caps) for caps in need]
+
+    # per stage, sparse transitions hand -> hand in this stage | hand in the next
+    stages = _stage_components(player.resource_sources, goals, new_tiles)
+    transitions = []
+    for s, components in enumerate(stages):
+        hands, _ = spaces[s]
+        n_here, n_next = len(hands), len(spaces[s + 1][0])
+        src, dest, weight = [], [], []
+        for gain, p in _round_gains(components, tuple(need[s])).items():
+            after = np.minimum(hands + np.array(gain), need[s])
+            built = (after >= cost[s]).all(axis=1)
+            here = after @ spaces[s][1]
+            there = n_here + (after - cost[s]) @ spaces[s + 1][1]
+            src.append(np.arange(n_here))
+            dest.append(np.where(built, there, here))
+            weight.append(np.full(n_here, p))
+        transitions.append((np.concatenate(src), np.concatenate(dest), np.concatenate(weight), n_here + n_next))
+
+    radix = spaces[0][1]
+    state = [np.zeros(len(space[0])) for space in spaces[:-1]]
+    state[0][np.minimum([player.resources[r] for r in RESOURCES], need[0]) @ radix] = 1.0
+    last = len(goals) - 1
+    for r in range(1, max_rounds + 1):
+        nxt = [np.zeros_like(v) for v in state]
+        for s, (src, dest, weight, size) in enumerate(transitions):
+            if state[s].any():
+                n_here = len(state[s])
+                out = np.bincount(dest, weights=state[s][src] * weight, minlength=size)
+                nxt[s] += out[:n_here]
+                if s < last:
+                    nxt[s + 1] += out[n_here:]
+                else:
+                    pmf[r] = out[n_here:].sum()
+        state = nxt
+        if sum(v.sum() for v in state) < tol:
+            break
+    return RoundsDistribution(pmf, float(max(0.0, sum(v.sum() for v in state))))
+
+
+def expected_rounds(player, max_rounds: int = 200, new_tiles: bool = True) -> float:
+    """Mean rounds to finish the goal queue without trading; see rounds_to_goals."""
+    return rounds_to_goals(player, max_rounds, new_tiles).mean()
@@ -0,0 +1,170 @@
+# Layouts.py
+
+import itertools
+from math import factorial
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from BoardGraph import AXIAL_COORDS, HEX_NEIGHBORS, N_HEXES, VERTEX_HEXES
+from Players import RESOURCES, DICE_PROBABILITIES
+
+# base-game tile and number-token counts
+RESOURCE_COUNTS = {'brick': 3, 'lumber': 4, 'grain': 4, 'wool': 4, 'ore': 3}
+RED_NUMBERS = (6, 6, 8, 8)
+OTHER_NUMBERS = (2, 3, 3, 4, 4, 5, 5, 9, 9, 10, 10, 11, 11, 12)
+
+# resource codes in a layout: RESOURCES order, then the desert
+DESERT = len(RESOURCES)
+TILE_NAMES = list(RESOURCES) + ['desert']
+
+# dice probability per number token, 0 for the desert's 0
+PIPS = np.zeros(13)
+for _n, _p in DICE_PROBABILITIES.items():
+    PIPS[_n] = _p
+
+
+# -------------------------------------------------------------------
+# PRECOMPUTED TABLES
+# -------------------------------------------------------------------
+def _independent_sets(k: int) -> np.ndarray:
+    """Every set of k hexes no two of which share a side."""
+    return np.array([
+        s for s in itertools.combinations(range(N_HEXES), k)
+        if not any(b in HEX_NEIGHBORS[a] for a, b in itertools.combinations(s, 2))
+    ], dtype=np.int8)
+
+# where the 6s and 8s may go
+RED_SETS = _independent_sets(len(RED_NUMBERS))
+
+
+def _red_resources() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Each ordered choice of distinct resources for the red hexes, the 14
+    resource tiles it leaves, and its probability under a uniform draw of
+    the layouts that keep every 6/8 on a different resource.
+    """
+    codes = [c for c, r in enumerate(RESOURCES) for _ in range(RESOURCE_COUNTS[r])]
+    reds, rests, weights = [], [], []
+    for combo in itertools.permutations(range(len(RESOURCES)), len(RED_NUMBERS)):
+        rest = list(codes)
+        for c in combo:
+            rest.remove(c)
+        reds.append(combo)
+        rests.append(rest)
+        # distinct arrangements of the rest
+        weights.append(factorial(len(rest)) / np.prod([factorial(rest.count(c)) for c in set(rest)]))
+    w = np.array(weights, dtype=np.float64)
+    return np.array(reds, dtype=np.int8), np.array(rests, dtype=np.int8), w / w.sum()
+
+RED_RESOURCES, REST_RESOURCES, RED_RESOURCE_P = _red_resources()
+ALL_RESOURCES = np.array([c for c, r in enumerate(RESOURCES) for _ in range(RESOURCE_COUNTS[r])], dtype=np.int8)
+
+# VERTEX_HEXES with the -1 padding pointed at an extra always-zero column
+_VERTEX_HEXES = np.where(VERTEX_HEXES < 0, N_HEXES, VERTEX_HEXES)
+
+
+# -------------------------------------------------------------------
+# LAYOUTS
+# -------------------------------------------------------------------
+class LayoutBatch(NamedTuple):
+    """n layouts over the hexes of AXIAL_COORDS: resource codes (DESERT for the desert) and number tokens (0 on the desert)."""
+    resources: np.ndarray   # (n, 19) int8
+    numbers: np.ndarray     # (n, 19) int8
+
+    def __len__(self):
+        return len(self.resources)
+
+    def layout(self, i: int) -> List[Tuple[str, Optional[int]]]:
+        """Layout i as (resource, number) per hex, for GameBoard."""
+        return [(TILE_NAMES[c], int(n) or None) for c, n in zip(self.resources[i], self.numbers[i])]
+
+    def tile_specs(self, i: int) -> List[Tuple[str, Optional[int], int, int]]:
+        """Layout i as Board-style (resource, number, q, r) specs."""
+        return [(res, num, q, r) for (res, num), (q, r) in zip(self.layout(i), AXIAL_COORDS)]
+
+    def take(self, idx) -> 'LayoutBatch':
+        return LayoutBatch(self.resources[idx], self.numbers[idx])
+
+
+def generate_layouts(n: int, seed: Optional[int] = None, spread: bool = True) -> LayoutBatch:
+    """
+    n random base-game layouts, built so that every one is valid (no
+    rejection): the 6s and 8s go on a random precomputed set of mutually
+    non-adjacent hexes, the desert on one of the other hexes and the
+    remaining tokens and tiles are shuffled over the rest.
+
+    spread=True also keeps every 6/8 on a different resource. Layouts are
+    uniform over those satisfying the constraints.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.arange(n)[:, None]
+
+    red = RED_SETS[rng.integers(len(RED_SETS), size=n)].astype(np.intp)
+    # shuffle the hexes with the red ones last: the first is the desert, the next 14 get the other tokens
+    keys = rng.random((n, N_HEXES))
+    keys[rows, red] = 2.0
+    order = np.argsort(keys, axis=1)
+    desert, others = order[:, 0], order[:, 1:N_HEXES - len(RED_NUMBERS)]
+
+    numbers = np.zeros((n, N_HEXES), dtype=np.int8)
+    numbers[rows, others] = OTHER_NUMBERS
+    numbers[rows, red[rows, np.argsort(rng.random((n, len(RED_NUMBERS))), axis=1)]] = RED_NUMBERS
+
+    resources = np.full((n, N_HEXES), DESERT, dtype=np.int8)
+    tiles = np.concatenate([red, others], axis=1)
+    if spread:
+        pick = rng.choice(len(RED_RESOURCES), size=n, p=RED_RESOURCE_P)
+        rest = REST_RESOURCES[pick]
+        rest = rest[rows, np.argsort(rng.random(rest.shape), axis=1)]
+        resources[rows, tiles] = np.concatenate([RED_RESOURCES[pick], rest], axis=1)
+    else:
+        resources[rows, tiles] = ALL_RESOURCES[np.argsort(rng.random((n, len(ALL_RESOURCES))), axis=1)]
+    return LayoutBatch(resources, numbers)
+
+
+# -------------------------------------------------------------------
+# SCORING
+# -------------------------------------------------------------------
+class LayoutScores(NamedTuple):
+    resource_production: np.ndarray    # (n, 5) expected cards per roll of each resource
+    vertex_production: np.ndarray      # (n, 54) expected cards per roll at each vertex
+    resource_cv: np.ndarray            # (n,) spread of resource_production, relative to its tile count
+    top_gap: np.ndarray                # (n,) best vertex minus the last of the top `picks`
+    fairness: np.ndarray               # (n,) higher is fairer
+
+
+def score_layouts(batch: LayoutBatch, picks: int = 8, gap_weight: float = 10.0) -> LayoutScores:
+    """
+    Production and fairness of every layout at once, from DICE_PROBABILITIES.
+
+    resource_cv is the coefficient of variation of each resource's
+    production per tile, so a board that starves one resource scores
+    badly. top_gap is how much better the best spot is than the
+    picks-th best (8: the opening settlements of 4 players), so a board
+    whose first pick runs away with the game scores badly. fairness is
+    -(resource_cv + gap_weight * top_gap).
+    """
+    n = len(batch)
+    pips = np.zeros((n, N_HEXES + 1))
+    pips[:, :N_HEXES] = PIPS[batch.numbers]
+    vertex = pips[:, _VERTEX_HEXES].sum(axis=2)
+
+    # per-layout sums by resource code, the desert's (zero) column dropped
+    k = len(TILE_NAMES)
+    cells = (np.arange(n)[:, None] * k + batch.resources).ravel()
+    production = np.bincount(cells, pips[:, :N_HEXES].ravel(), n * k).reshape(n, k)[:, :DESERT]
+    per_tile = production / np.array([RESOURCE_COUNTS[r] for r in RESOURCES])
+    cv = per_tile.std(axis=1) / per_tile.mean(axis=1)
+
+    top = -np.partition(-vertex, picks - 1, axis=1)[:, :picks]
+    gap = top.max(axis=1) - top.min(axis=1)
+    return LayoutScores(production, vertex, cv, gap, -(cv + gap_weight * gap))
+
+
+def balanced_layouts(k: int, pool: int = 100_000, seed: Optional[int] = None, **score_kw) -> LayoutBatch:
+    """The k fairest of pool random layouts, fairest first."""
+    batch = generate_layouts(pool, seed)
+    fairness = score_layouts(batch, **score_kw).fairness
+    best = np.argpartition(-fairness, k - 1)[:k]
+    return batch.take(best[np.argsort(-fairness[best])])
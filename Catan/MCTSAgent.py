@@ -0,0 +1,328 @@
+# MCTSAgent.py
+
+import math
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from Agents import Personality, ParameterizedTrader
+from EventSinks import NullSink
+from FullEngine import TradeEngine, EngineState
+from Market import clear_market
+from Players import BUILDING_COSTS
+
+# ('propose', proposer index) or ('accept', proposer index, receiver index, give, get)
+Decision = tuple
+
+# with a pool, the last LOCAL_SHARE of a decision's time budget is kept for
+# this process, which searches it itself if no worker has reported back
+LOCAL_SHARE = 0.25
+
+
+# -------------------------------------------------------------------
+# ROLLOUTS
+# -------------------------------------------------------------------
+def _progress(player) -> float:
+    """Goals built plus the covered fraction of the current goal's cost."""
+    built = len(player.buildings)
+    goal = player.current_goal
+    if goal is None:
+        return float(built)
+    cost = BUILDING_COSTS[goal]
+    have = player.resources
+    return built + sum(min(have.get(r, 0), c) for r, c in cost.items()) / sum(cost.values())
+
+
+def _winner(players) -> Optional[int]:
+    # same rule as simulate_game: the first seat with an empty goal queue
+    for i, p in enumerate(players):
+        if not p.goal_queue:
+            return i
+    return None
+
+
+class _Fixed(Personality):
+    """Proposes action and otherwise plays policy; seat i's stand-in while a rollout replays a market round."""
+
+    def __init__(self, action, policy: Personality):
+        self.action = action
+        self.policy = policy
+
+    def propose_trade(self, player, others):
+        return self.action
+
+    def accept_trade(self, receiver, offer_give, offer_get, proposer):
+        return self.policy.accept_trade(receiver, offer_give, offer_get, proposer)
+
+    def bank_trade(self, player):
+        return self.policy.bank_trade(player)
+
+
+def _rollout(
+    engine: TradeEngine,
+    state: EngineState,
+    decision: Decision,
+    action,
+    seed: int,
+    me: int,
+    horizon: int,
+    max_rounds: int
+) -> float:
+    """
+    Reward in [0, 1] for taking action at decision: finish the current
+    round from state, then play up to horizon more rounds with the
+    engine's (rollout) personalities. 1 or 0 on a win or loss, otherwise
+    a squashed progress lead over the best opponent.
+    """
+    engine.restore(state, rng=False)
+    engine.rng.seed(seed)
+    players = engine.players
+    i = decision[1]
+    if decision[0] == 'accept':
+        # a rejected offer is not passed on to the remaining players (nor,
+        # in a market round, are the round's other unmatched offers)
+        if action:
+            engine.execute_trade(players[i], players[decision[2]], decision[3], decision[4])
+        if not engine.market:
+            engine.trading_phase(i + 1)
+    elif engine.market:
+        # the market collects every offer before clearing, so replay the
+        # round's clearing with this seat's offer fixed to action
+        p = players[i]
+        policy = p.personality
+        p.personality = _Fixed(action, policy)
+        try:
+            clear_market(engine)
+        finally:
+            p.personality = policy
+    else:
+        if action:
+            p = players[i]
+            engine.offer_trade(p, [o for o in players if o is not p], *action)
+        engine.trading_phase(i + 1)
+    engine.bank_phase()
+    engine.building_phase()
+    for k in range(horizon + 1):
+        w = _winner(players)
+        if w is not None:
+            return 1.0 if w == me else 0.0
+        if k == horizon or engine.round_num > max_rounds:
+            break
+        engine.run_trading_round()
+    mine = _progress(players[me])
+    best = max(_progress(p) for j, p in enumerate(players) if j != me)
+    return 0.5 + 0.5 * math.tanh(mine - best)
+
+
+def _ucb_search(engine, state, decision, actions, counts, sums, me, horizon, max_rounds, c, seed, deadline, max_rollouts):
+    """UCB1 over actions until deadline or max_rollouts; updates counts and sums in place."""
+    rng = random.Random(seed)
+    done = 0
+    while done < max_rollouts and time.monotonic() < deadline:
+        total = sum(counts)
+        untried = [k for k, n in enumerate(counts) if n == 0]
+        if untried:
+            k = untried[0]
+        else:
+            log_total = math.log(total)
+            k = max(range(len(actions)), key=lambda a: sums[a] / counts[a] + c * math.sqrt(log_total / counts[a]))
+        reward = _rollout(engine, state, decision, actions[k], rng.getrandbits(64), me, horizon, max_rounds)
+        counts[k] += 1
+        sums[k] += reward
+        done += 1
+    return done
+
+
+def _make_engine(spec: tuple, dice_rolls) -> TradeEngine:
+    market, seats = spec
+    players = [cls(name, personality) for cls, name, personality in seats]
+    return TradeEngine(players, dice_rolls, random.Random(0), NullSink(), market=market)
+
+
+# per-process rollout engines for parallel search, keyed by their rules and seats
+_WORKER_ENGINES: Dict[tuple, TradeEngine] = {}
+
+def _rollout_engine(spec: tuple, dice_rolls) -> TradeEngine:
+    market, seats = spec
+    key = (market, tuple((cls, name) for cls, name, _ in seats))
+    engine = _WORKER_ENGINES.get(key)
+    if engine is None:
+        engine = _WORKER_ENGINES[key] = _make_engine(spec, None)
+    for p, (_, _, personality) in zip(engine.players, seats):
+        p.personality = personality
+    engine.dice_rolls = dice_rolls
+    return engine
+
+
+def _warm_worker(spec, dice_rolls):
+    _rollout_engine(spec, dice_rolls)
+
+
+def _search_worker(spec, dice_rolls, state, decision, actions, me, horizon, max_rounds, c, seed, deadline, max_rollouts):
+    engine = _rollout_engine(spec, dice_rolls)
+    counts, sums = [0] * len(actions), [0.0] * len(actions)
+    _ucb_search(engine, state, decision, actions, counts, sums, me, horizon, max_rounds, c, seed, deadline, max_rollouts)
+    return counts, sums
+
+
+# -------------------------------------------------------------------
+# PERSONALITY
+# -------------------------------------------------------------------
+class MCTSTrader(Personality):
+    """
+    Chooses trades by rolling out each candidate action in forked copies
+    of a bound TradeEngine and picking the most visited (UCB1, one level).
+    Candidates are "no offer" plus every 1:1 swap of a surplus for a
+    shortage resource; for an incoming offer they are reject and accept.
+
+    Dice and tiles dominate the game below the first move, so the search
+    is a single level. Statistics are kept in a transposition table keyed
+    by the full player state and the decision, so a situation that recurs
+    in later rounds starts from the visits it already has.
+
+    Rollouts play by the bound engine's rules (market clearing, and the
+    board, which travels in its snapshots) but draw dice and tiles from
+    their own reseeded RNG, not the game's streams, so they sample futures
+    instead of replaying the real one.
+
+    time_budget bounds a decision's wall time (seconds) and max_rollouts
+    bounds its work. workers > 0 spreads rollouts over a persistent process
+    pool. Without bind(engine), or when a decision gets no rollout in its
+    time, the agent follows its rollout policy.
+    """
+
+    def __init__(
+        self,
+        time_budget: float = 0.04,
+        max_rollouts: int = 10_000,
+        horizon: int = 20,
+        exploration: float = 0.7,
+        rollout_policy: Optional[Personality] = None,
+        workers: int = 0,
+        max_rounds: int = 200,
+        table_size: int = 50_000,
+        seed: int = 0
+    ):
+        self.time_budget = time_budget
+        self.max_rollouts = max_rollouts
+        self.horizon = horizon
+        self.exploration = exploration
+        self.rollout_policy = rollout_policy or ParameterizedTrader(1.0, 1.0)
+        self.workers = workers
+        self.max_rounds = max_rounds
+        self.table_size = table_size
+        self.rng = random.Random(seed)
+        self.engine: Optional[TradeEngine] = None
+        self.table: 'OrderedDict[tuple, Tuple[List[int], List[float]]]' = OrderedDict()
+        self.rollouts = 0
+        self.fallbacks = 0          # decisions left to the rollout policy for lack of rollouts
+        self._rollout_engine: Optional[TradeEngine] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def bind(self, engine: TradeEngine) -> 'MCTSTrader':
+        """Search from the live state of engine; call once the players are set up."""
+        self.engine = engine
+        spec = self._spec()
+        self._rollout_engine = _make_engine(spec, engine.dice_rolls)
+        if self.workers > 0 and self._pool is None:
+            # start the workers now so the first decision doesn't pay for it
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            list(self._pool.map(_warm_worker, [spec] * self.workers, [engine.dice_rolls] * self.workers))
+        return self
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _spec(self) -> tuple:
+        """
+        (market, seats) of the bound engine: its trading rule and (class,
+        name, rollout personality) per seat; search agents play their
+        rollout policy.
+        """
+        return self.engine.market, tuple(
+            (type(p), p.name, p.personality.rollout_policy if isinstance(p.personality, MCTSTrader) else p.personality)
+            for p in self.engine.players
+        )
+
+    # --- Personality interface ---
+    def propose_trade(self, player, others):
+        shortage, surplus = player.resource_delta()
+        if self.engine is None or not shortage or not surplus:
+            return self.rollout_policy.propose_trade(player, others)
+        actions = [None] + [({give: 1}, {want: 1}) for want in shortage for give in surplus]
+        me = self._seat(player)
+        return self._search(('propose', me), actions, me,
+                            lambda: self.rollout_policy.propose_trade(player, others))
+
+    def accept_trade(self, receiver, offer_give, offer_get, proposer):
+        if any(receiver.resources.get(r, 0) < c for r, c in offer_get.items()):
+            return False
+        if self.engine is None:
+            return self.rollout_policy.accept_trade(receiver, offer_give, offer_get, proposer)
+        me = self._seat(receiver)
+        decision = ('accept', self._seat(proposer), me, offer_give, offer_get)
+        return self._search(decision, [False, True], me,
+                            lambda: self.rollout_policy.accept_trade(receiver, offer_give, offer_get, proposer))
+
+    def _seat(self, player) -> int:
+        return next(i for i, p in enumerate(self.engine.players) if p is player)
+
+    # --- search ---
+    def _search(self, decision: Decision, actions: list, me: int, fallback):
+        deadline = time.monotonic() + self.time_budget
+        state = self.engine.snapshot()
+        key = (tuple((ps.hand, ps.goals, ps.sources) for ps in state.players), _freeze(decision))
+        counts, sums = self.table.pop(key, None) or ([0] * len(actions), [0.0] * len(actions))
+        self.table[key] = counts, sums
+        while len(self.table) > self.table_size:
+            self.table.popitem(last=False)
+
+        done = self._search_parallel(state, decision, actions, counts, sums, me, deadline) if self.workers > 0 else 0
+        if done == 0:
+            done = _ucb_search(
+                self._rollout_engine, state, decision, actions, counts, sums, me,
+                self.horizon, self.max_rounds, self.exploration, self.rng.getrandbits(64), deadline, self.max_rollouts)
+        self.rollouts += done
+        if done == 0:
+            # no time for a single rollout: don't act on an untried first action or old counts
+            self.fallbacks += 1
+            return fallback()
+        best = max(range(len(actions)), key=lambda k: (counts[k], sums[k] / counts[k] if counts[k] else 0.0))
+        return actions[best]
+
+    def _search_parallel(self, state, decision, actions, counts, sums, me, deadline) -> int:
+        """
+        Fan the search out to the pool; returns the rollouts the workers
+        reported. Workers stop LOCAL_SHARE of the budget before deadline
+        and are waited for up to half of that, which leaves the rest for a
+        local search if none made it.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        spec = self._spec()
+        share = max(1, self.max_rollouts // self.workers)
+        reserve = LOCAL_SHARE * self.time_budget
+        futures = [
+            self._pool.submit(_search_worker, spec, self.engine.dice_rolls, state, decision, actions, me,
+                              self.horizon, self.max_rounds, self.exploration, self.rng.getrandbits(64),
+                              deadline - reserve, share)
+            for _ in range(self.workers)
+        ]
+        # late results are dropped
+        done, _ = wait(futures, timeout=max(0.0, deadline - reserve / 2 - time.monotonic()))
+        rollouts = 0
+        for fut in done:
+            c, s = fut.result()
+            for k in range(len(actions)):
+                counts[k] += c[k]
+                sums[k] += s[k]
+            rollouts += sum(c)
+        return rollouts
+
+
+def _freeze(decision: Decision) -> tuple:
+    return tuple(tuple(sorted(x.items())) if isinstance(x, dict) else x for x in decision)
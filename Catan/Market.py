@@ -0,0 +1,138 @@
+# Market.py
+
+import itertools
+from collections import deque
+from typing import List, Tuple
+
+from Players import RESOURCES, RES_INDEX
+
+# every resource cycle of length 2..5 once (smallest resource first),
+# shortest first; (g, w, x) means one player gives g for w, the next gives
+# w for x and the last gives x for g
+CYCLES: List[Tuple[int, ...]] = sorted(
+    (c for k in range(2, len(RESOURCES) + 1)
+     for c in itertools.permutations(range(len(RESOURCES)), k)
+     if c[0] == min(c)),
+    key=len
+)
+# the (give, want) offer buckets each cycle draws from, and the same as a bit mask
+CYCLE_EDGES = [tuple((c[k], c[(k + 1) % len(c)]) for k in range(len(c))) for c in CYCLES]
+CYCLE_MASKS = [sum(1 << (g * len(RESOURCES) + w) for g, w in edges) for edges in CYCLE_EDGES]
+
+
+def _is_unit_swap(give, get) -> bool:
+    return (len(give) == 1 and len(get) == 1 and give.keys() != get.keys()
+            and sum(give.values()) == 1 and sum(get.values()) == 1)
+
+
+def _settle(engine, members, cycle) -> List:
+    """members[k] gives one cycle[k] to members[k-1], who asked for it."""
+    if len(members) == 2:
+        a, b = members
+        engine.execute_trade(a, b, {RESOURCES[cycle[0]]: 1}, {RESOURCES[cycle[1]]: 1})
+        return [(a.name, b.name, {RESOURCES[cycle[0]]: 1}, {RESOURCES[cycle[1]]: 1})]
+    trades = []
+    for k, giver in enumerate(members):
+        res = RESOURCES[cycle[k]]
+        receiver = members[k - 1]
+        giver.remove_resource(res, 1)
+        receiver.add_resource(res, 1)
+        trades.append((giver.name, receiver.name, {res: 1}, {}))
+    return trades
+
+
+def _offer_to_some(engine, seat: int, give, get, tries: int):
+    """Put an offer to up to tries distinct random other players; the first who can pay and accepts trades."""
+    players = engine.players
+    p = players[seat]
+    rng = engine.shuffle_rng
+    stats = engine.stats
+    m = len(players) - 1
+    asked = set()
+    while len(asked) < min(tries, m):
+        j = rng.randint(0, m - 1)
+        if j in asked:
+            continue
+        asked.add(j)
+        o = players[j if j < seat else j + 1]
+        if not all(o.resources.get(r, 0) >= c for r, c in get.items()):
+            if stats is not None:
+                stats.count('unaffordable')
+            continue
+        if o.personality.accept_trade(o, give, get, p):
+            if engine.execute_trade(p, o, give, get):
+                if stats is not None:
+                    stats.count('acceptances')
+                return (p.name, o.name, give, get)
+            if stats is not None:
+                stats.count('unaffordable')
+            return None
+        if stats is not None:
+            stats.count('rejections')
+    return None
+
+
+def clear_market(engine, tries: int = 4) -> List:
+    """
+    Market-clearing trading phase for engine.players.
+
+    Every player states one offer through its personality's propose_trade,
+    as in the sequential phase. 1:1 offers are bucketed by (give, want) and
+    cleared in bulk along resource cycles, shortest first: in a 2-cycle two
+    players swap, in longer ones A gives g for w, B gives w for x, ..., and
+    the last gives back g. Every participant gets exactly what it asked for,
+    so no acceptance step is needed. With 5 resources there are 84 cycles,
+    so clearing is linear in the number of offers.
+
+    Offers left unmatched, and any that are not 1:1, are then put to up
+    to tries random other players, first acceptor wins, which keeps the
+    whole phase linear where offer_trade asks everyone.
+
+    Returns trades as (giver, receiver, give, get); a 2-cycle is one
+    bilateral trade, longer cycles are one entry per transfer with an
+    empty get.
+    """
+    players = engine.players
+    buckets = {}
+    unmatched = []
+    for seat, p in enumerate(players):
+        offer = p.personality.propose_trade(p, [o for o in players if o is not p])
+        if not offer:
+            continue
+        if engine.stats is not None:
+            engine.stats.count('proposals')
+        give, get = offer
+        g = next(iter(give))
+        if _is_unit_swap(give, get) and p.resources[g] >= 1:
+            key = (RES_INDEX[g], RES_INDEX[next(iter(get))])
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = deque()
+            bucket.append((seat, p, give, get))
+        else:
+            unmatched.append((seat, p, give, get))
+
+    trades = []
+    if len(buckets) > 1:
+        n = len(RESOURCES)
+        live = sum(1 << (g * n + w) for g, w in buckets)
+        for cycle, keys, mask in zip(CYCLES, CYCLE_EDGES, CYCLE_MASKS):
+            if live & mask != mask:
+                continue
+            edges = [buckets[k] for k in keys]
+            while all(edges):
+                members = [e.popleft()[1] for e in edges]
+                trades.extend(_settle(engine, members, cycle))
+                if engine.stats is not None:
+                    engine.stats.count('acceptances', len(members))
+            for (g, w), e in zip(keys, edges):
+                if not e:
+                    live &= ~(1 << (g * n + w))
+
+    unmatched.extend(o for bucket in buckets.values() for o in bucket)
+    unmatched.sort(key=lambda o: o[0])
+    for seat, _, give, get in unmatched:
+        trade = _offer_to_some(engine, seat, give, get, tries)
+        if trade:
+            trades.append(trade)
+    return trades
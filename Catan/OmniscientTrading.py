@@ -1,4 +1,4 @@
-from Catan.Players import Player
+from Players import Player
 
 def propose_trade(p1: Player, p2: Player):
     s1, x1 = p1.resource_delta()
@@ -24,7 +24,7 @@ if __name__ == "__main__":
         'lumber': 3,
         'ore': 0
     }
-    alice.current_goal = 'settlement'
+    alice.goal_queue = ['settlement']
 
     bob.resources = {
         'brick': 1,
@@ -33,7 +33,7 @@ if __name__ == "__main__":
         'lumber': 0,  
         'ore': 0
     }
-    bob.current_goal = 'road'
+    bob.goal_queue = ['road']
 
 
     trade = propose_trade(bob, alice)
@@ -0,0 +1,168 @@
+# Opening.py
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from BoardGraph import GameBoard, EDGE_ENDS, EDGES_AT, HEXES_AT, NEIGHBORS, N_VERTICES
+from Players import RESOURCES, RES_INDEX, DICE_PROBABILITIES
+
+# vertices a settlement at v keeps anyone else from settling: v and its neighbours
+_CLOSED = np.zeros((N_VERTICES, N_VERTICES), dtype=bool)
+for _v in range(N_VERTICES):
+    _CLOSED[_v, (_v,) + NEIGHBORS[_v]] = True
+
+_POPCOUNT = np.array([bin(m).count('1') for m in range(1 << len(RESOURCES))])
+
+
+class Opening(NamedTuple):
+    picks: List[Tuple[int, int]]        # (seat, vertex) in draft order
+    roads: List[Tuple[int, int]]        # (seat, edge), one per pick
+    value: List[float]                  # each seat's opening score
+
+
+# -------------------------------------------------------------------
+# VERTEX TABLES
+# -------------------------------------------------------------------
+def vertex_income(layout: Sequence[Tuple[str, Optional[int]]]) -> np.ndarray:
+    """(54, 5) expected cards per roll of each resource at each vertex, as Player.add_source counts them."""
+    income = np.zeros((N_VERTICES, len(RESOURCES)))
+    for v in range(N_VERTICES):
+        for h in HEXES_AT[v]:
+            res, num = layout[h]
+            if res != 'desert':
+                income[v, RES_INDEX[res]] += DICE_PROBABILITIES.get(num, 0.0)
+    return income
+
+
+def resource_weights(player) -> np.ndarray:
+    """
+    What a card of each resource is worth to player: its goal-queue
+    urgency (resource_urgency_vector), scaled so that equal urgency is 1
+    per resource. A player with nothing left to build values all alike.
+    """
+    urgency = player.resource_urgency_vector()
+    w = np.array([urgency[r] for r in RESOURCES]) * len(RESOURCES)
+    return w if w.any() else np.ones(len(RESOURCES))
+
+
+def pair_table(income: np.ndarray, weights: np.ndarray, diversity: float) -> np.ndarray:
+    """
+    (54, 54) score of opening on vertices v and u: urgency-weighted
+    expected cards per roll (in 36ths, i.e. pips) plus diversity per
+    resource the pair produces at all. -inf where the distance rule
+    forbids the pair.
+    """
+    single = (income * 36.0) @ weights
+    produces = (income > 0) @ (1 << np.arange(len(RESOURCES)))
+    table = single[:, None] + single[None, :] + diversity * _POPCOUNT[produces[:, None] | produces[None, :]]
+    table[_CLOSED] = -np.inf
+    return table
+
+
+# -------------------------------------------------------------------
+# SNAKE DRAFT
+# -------------------------------------------------------------------
+class _Draft:
+    """
+    Subgame-perfect snake draft: in the first round each seat picks the
+    vertex that maximises its final pair, given everyone after it does
+    the same; second picks are then greedy, since nothing after them
+    changes the picker's pair. The last seat picks twice in a row, so
+    its pair is just its best open pair. Earlier seats try first-round
+    candidates in order of their best pair on the current open set and
+    stop as soon as that bound can't beat the best realised pair (branch
+    and bound). For the second-last seat, a candidate that leaves the
+    last seat's best pair open leaves its reply unchanged, so its real
+    value is one row lookup; only the few that close that pair are
+    searched. What seats k.. end up with depends only on the open set
+    when seat k picks, so each (k, open set) is solved once.
+    """
+
+    def __init__(self, tables: List[np.ndarray]):
+        self.tables = tables
+        self.n = len(tables)
+        self.nodes = 0
+        self.memo: Dict[Tuple[int, bytes], Tuple[List[int], List[int], np.ndarray]] = {}
+
+    def last_pair(self, open_: np.ndarray) -> Tuple[int, int]:
+        """The last seat's best open pair, the first in row order as the branch and bound would take it."""
+        table = self.tables[-1]
+        return divmod(int(np.where(open_[:, None] & open_[None, :], table, -np.inf).argmax()), N_VERTICES)
+
+    def solve(self, k: int, open_: np.ndarray) -> Tuple[List[int], List[int], np.ndarray]:
+        """
+        Picks of seats k.. when seat k is first to pick in the first round
+        on open_: (their first picks, their second picks, the open set left
+        for the second picks of seats before k).
+        """
+        key = (k, open_.tobytes())
+        hit = self.memo.get(key)
+        if hit is not None:
+            return hit
+        self.nodes += 1
+        table = self.tables[k]
+        if k == self.n - 1:
+            x, y = self.last_pair(open_)
+            result = [x], [y], open_ & ~_CLOSED[x] & ~_CLOSED[y]
+        else:
+            cols = np.where(open_, 0.0, -np.inf)
+            bound = np.where(open_, (table + cols).max(axis=1), -np.inf)
+            if k == self.n - 2:
+                x, y = self.last_pair(open_)
+                # first picks that leave (x, y) open
+                rest = open_ & ~_CLOSED[x] & ~_CLOSED[y]
+            result, best_value = None, -np.inf
+            for v in np.argsort(-bound, kind='stable'):
+                if bound[v] <= best_value or bound[v] == -np.inf:
+                    break
+                v = int(v)
+                if k == self.n - 2 and rest[v]:
+                    first, second, left = [x], [y], rest & ~_CLOSED[v]
+                else:
+                    first, second, left = self.solve(k + 1, open_ & ~_CLOSED[v])
+                u = int(np.where(left, table[v], -np.inf).argmax())
+                if table[v, u] > best_value:
+                    result, best_value = ([v] + first, [u] + second, left & ~_CLOSED[u]), table[v, u]
+        self.memo[key] = result
+        return result
+
+
+def snake_draft(board: GameBoard, players: Sequence, diversity: float = 2.0) -> Opening:
+    """
+    Opening settlements and roads for every seat of board, in snake order
+    (0..n-1, then n-1..0), on the vertices still open. Each seat scores a
+    pair of vertices by pair_table with its own goal-queue weights. Each
+    road points from its settlement toward the seat's best spot still
+    open after the draft.
+    """
+    income = vertex_income(board.layout)
+    tables = [pair_table(income, resource_weights(p), diversity) for p in players]
+    open_ = np.zeros(N_VERTICES, dtype=bool)
+    open_[list(board.placement.open_vertices)] = True
+
+    first, second, _ = _Draft(tables).solve(0, open_)
+    n = len(players)
+    picks = [(s, first[s]) for s in range(n)] + [(s, second[s]) for s in reversed(range(n))]
+    for _, v in picks:
+        open_ &= ~_CLOSED[v]
+
+    single = [(income * 36.0) @ resource_weights(p) for p in players]
+    roads = []
+    for s, v in picks:
+        # the spot each edge leads toward: the best open neighbour of its far end
+        def reach(e):
+            x = EDGE_ENDS[e][1] if EDGE_ENDS[e][0] == v else EDGE_ENDS[e][0]
+            return max((single[s][y] for y in NEIGHBORS[x] if open_[y]), default=-1.0)
+        roads.append((s, max(EDGES_AT[v], key=reach)))
+    value = [float(tables[s][first[s], second[s]]) for s in range(n)]
+    return Opening(picks, roads, value)
+
+
+def place_opening(board: GameBoard, players: Sequence, opening: Optional[Opening] = None, **kw) -> Opening:
+    """Settle board with opening (default: snake_draft), giving each player its sources."""
+    opening = opening or snake_draft(board, players, **kw)
+    for (s, v), (_, e) in zip(opening.picks, opening.roads):
+        board.settle(s, players[s], v, setup=True)
+        board.build_road(s, e, setup=True)
+    return opening
@@ -0,0 +1,254 @@
+# Optimizer.py
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Agents import TraderParams
+from BatchEngine import simulate_games
+
+# ParameterizedTrader's parameters and the value of any not being searched.
+# alpha is stored but no decision reads it, so the default space is beta alone.
+DEFAULTS = {'alpha': 1.0, 'beta': 1.0}
+BOUNDS = {'alpha': (0.0, 3.0), 'beta': (0.0, 5.0)}
+
+# the opponent pool
+DEFAULT_OPPONENTS: List[TraderParams] = [(1.0, 0.5), (1.0, 1.0), (1.0, 2.0)]
+
+# (candidate (alpha, beta), opponent, candidate's seat, seed block) -> (score, games)
+CacheKey = Tuple[TraderParams, TraderParams, int, int]
+
+
+class Generation(NamedTuple):
+    number: int
+    mean: Dict[str, float]      # the search distribution's centre, in parameter units
+    best: Dict[str, float]      # best candidate seen so far
+    fitness: float              # its fitness
+    sigma: float                # step size, as a fraction of the box
+
+
+class OptimizeResult(NamedTuple):
+    best: Dict[str, float]
+    fitness: float
+    history: List[Generation]
+    games: int                  # games played
+    cache_hits: int             # (candidate, opponent, seat, block) results reused
+
+
+# -------------------------------------------------------------------
+# FITNESS
+# -------------------------------------------------------------------
+def _play_rows(rows: Sequence[Tuple[TraderParams, TraderParams, int]], seeds: np.ndarray, max_rounds: int) -> np.ndarray:
+    """
+    Score of each (candidate, opponent, candidate's seat) row over the
+    same seeds (common random numbers), all rows in one batched run:
+    1 per win, 0.5 per game without a winner.
+    """
+    n, k = len(rows), len(seeds)
+    alice = np.array([c if seat == 0 else opp for c, opp, seat in rows], dtype=np.float64).repeat(k, axis=0)
+    bob = np.array([opp if seat == 0 else c for c, opp, seat in rows], dtype=np.float64).repeat(k, axis=0)
+    engine = simulate_games(alice[:, 0], alice[:, 1], bob[:, 0], bob[:, 1], np.tile(seeds, n), max_rounds=max_rounds)
+    winner = engine.winner.reshape(n, k)
+    seat = np.array([seat for _, _, seat in rows])[:, None]
+    return (winner == seat).sum(axis=1) + 0.5 * (winner == -1).sum(axis=1)
+
+
+class Evaluator:
+    """
+    Fitness of traders against an opponent pool: the mean score over
+    every opponent, both seats and blocks seed blocks of block_size games.
+    Every candidate plays the same seeds, so differences between them are
+    not dice luck. Results are cached per (candidate, opponent, seat,
+    block), candidates rounded to resolution; a cache path makes the
+    cache persist across runs, and is refused if it was played with a
+    different base_seed, block_size or max_rounds. The missing results of a seed block are
+    played as one batch, split over a process pool when workers > 1.
+    """
+
+    def __init__(
+        self,
+        opponents: Sequence[TraderParams] = DEFAULT_OPPONENTS,
+        blocks: int = 2,
+        block_size: int = 500,
+        base_seed: int = 0,
+        workers: Optional[int] = None,
+        max_rounds: int = 200,
+        resolution: float = 1e-3,
+        cache_path: Optional[str] = None
+    ):
+        self.opponents = [tuple(float(x) for x in o) for o in opponents]
+        self.blocks = blocks
+        self.block_size = block_size
+        self.base_seed = base_seed
+        self.workers = workers or os.cpu_count() or 1
+        self.max_rounds = max_rounds
+        self.resolution = resolution
+        self.cache_path = cache_path
+        self.cache: Dict[CacheKey, Tuple[float, int]] = {}
+        self.games = 0
+        self.cache_hits = 0
+        self._pool = None
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                saved = json.load(f)
+            if not isinstance(saved, dict) or 'setup' not in saved:
+                raise ValueError(f"{cache_path} is not an evaluator cache")
+            if saved['setup'] != self.setup:
+                raise ValueError(f"{cache_path} was played with {saved['setup']}, not {self.setup}")
+            for key, value in saved['results']:
+                self.cache[(tuple(key[0]), tuple(key[1]), key[2], key[3])] = tuple(value)
+
+    @property
+    def setup(self) -> Dict[str, int]:
+        """What a seed block's results depend on besides the traders; a cache is only valid for one setup."""
+        return {'base_seed': self.base_seed, 'block_size': self.block_size, 'max_rounds': self.max_rounds}
+
+    def rounded(self, trader: TraderParams) -> TraderParams:
+        """The point fitness actually evaluates (and caches) for trader."""
+        return tuple(round(round(x / self.resolution) * self.resolution, 9) for x in trader)
+
+    def seeds(self, block: int) -> np.ndarray:
+        lo = self.base_seed + block * self.block_size
+        return np.arange(lo, lo + self.block_size, dtype=np.int64)
+
+    def fitness(self, candidates: Sequence[TraderParams]) -> np.ndarray:
+        """(n,) mean score per game of each (alpha, beta) candidate, in [0, 1]."""
+        candidates = [self.rounded(c) for c in candidates]
+        keys = {(c, opp, seat, block) for c in candidates for opp in self.opponents for seat in (0, 1) for block in range(self.blocks)}
+        missing = sorted(k for k in keys if k not in self.cache)
+        self.cache_hits += len(keys) - len(missing)
+
+        # each block's missing rows in one batch, cut into a job per worker
+        jobs = []
+        for block in range(self.blocks):
+            rows = [k for k in missing if k[3] == block]
+            step = -(-len(rows) // self.workers) if rows else 1
+            for i in range(0, len(rows), step):
+                jobs.append((rows[i:i + step], self.seeds(block)))
+        if self.workers > 1 and len(jobs) > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self._pool.submit(_play_rows, [k[:3] for k in rows], seeds, self.max_rounds) for rows, seeds in jobs]
+            scores = [f.result() for f in futures]
+        else:
+            scores = [_play_rows([k[:3] for k in rows], seeds, self.max_rounds) for rows, seeds in jobs]
+        for (rows, _), score in zip(jobs, scores):
+            for k, s in zip(rows, score):
+                self.cache[k] = (float(s), self.block_size)
+        self.games += len(missing) * self.block_size
+        if missing and self.cache_path:
+            self.save()
+
+        out = np.empty(len(candidates))
+        for i, c in enumerate(candidates):
+            parts = [self.cache[(c, opp, seat, block)] for opp in self.opponents for seat in (0, 1) for block in range(self.blocks)]
+            out[i] = sum(s for s, _ in parts) / sum(g for _, g in parts)
+        return out
+
+    def save(self):
+        with open(self.cache_path, 'w') as f:
+            results = [[[list(c), list(opp), seat, block], list(v)] for (c, opp, seat, block), v in self.cache.items()]
+            json.dump({'setup': self.setup, 'results': results}, f)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------------------------------------------------
+# CMA-ES
+# -------------------------------------------------------------------
+def optimize(
+    evaluator: Evaluator,
+    params: Sequence[str] = ('beta',),
+    generations: int = 30,
+    popsize: Optional[int] = None,
+    sigma: float = 0.3,
+    start: Optional[Dict[str, float]] = None,
+    seed: int = 0,
+    tol: float = 1e-3,
+    verbose: bool = False
+) -> OptimizeResult:
+    """
+    Maximise evaluator.fitness over params (names of DEFAULTS; the rest
+    stay at their defaults) with CMA-ES (Hansen's (mu/mu_w, lambda)
+    rules). The search runs in the unit box over BOUNDS and candidates
+    are clipped into it; sigma is the initial step as a fraction of the
+    box. Stops after generations, or once sigma falls below tol.
+    """
+    n = len(params)
+    lo = np.array([BOUNDS[p][0] for p in params])
+    span = np.array([BOUNDS[p][1] - BOUNDS[p][0] for p in params])
+    start = {**DEFAULTS, **(start or {})}
+
+    def trader(x: np.ndarray) -> TraderParams:
+        values = dict(start)
+        values.update(zip(params, lo + span * np.clip(x, 0.0, 1.0)))
+        return (float(values['alpha']), float(values['beta']))
+
+    def named(t: TraderParams) -> Dict[str, float]:
+        return {p: t[0] if p == 'alpha' else t[1] for p in params}
+
+    # strategy parameters
+    lam = popsize or 4 + int(3 * np.log(n))
+    mu = lam // 2
+    w = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    w /= w.sum()
+    mueff = 1.0 / (w ** 2).sum()
+    cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+    cs = (mueff + 2) / (n + mueff + 5)
+    c1 = 2 / ((n + 1.3) ** 2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+    damps = 1 + 2 * max(0.0, np.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+    chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+    rng = np.random.default_rng(seed)
+    mean = np.clip((np.array([start[p] for p in params]) - lo) / span, 0.0, 1.0)
+    C = np.eye(n)
+    pc, ps = np.zeros(n), np.zeros(n)
+    best, best_fit = evaluator.rounded(trader(mean)), -np.inf
+    history = []
+
+    for g in range(1, generations + 1):
+        vals, B = np.linalg.eigh(C)
+        D = np.sqrt(np.maximum(vals, 1e-20))
+        z = rng.standard_normal((lam, n))
+        y = (z * D) @ B.T
+        x = mean + sigma * y
+        # rounded, so best names the point its fitness was measured at
+        candidates = [evaluator.rounded(trader(xi)) for xi in x]
+        fit = evaluator.fitness(candidates)
+
+        order = np.argsort(-fit, kind='stable')
+        if fit[order[0]] > best_fit:
+            best, best_fit = candidates[order[0]], float(fit[order[0]])
+        y_sel = y[order[:mu]]
+        y_w = w @ y_sel
+        mean = np.clip(mean + sigma * y_w, 0.0, 1.0)
+
+        # step-size and covariance paths
+        inv_sqrt = B @ np.diag(1 / D) @ B.T
+        ps = (1 - cs) * ps + np.sqrt(cs * (2 - cs) * mueff) * (inv_sqrt @ y_w)
+        h = np.linalg.norm(ps) / np.sqrt(1 - (1 - cs) ** (2 * g)) < (1.4 + 2 / (n + 1)) * chi_n
+        pc = (1 - cc) * pc + h * np.sqrt(cc * (2 - cc) * mueff) * y_w
+        C = ((1 - c1 - cmu) * C + c1 * (np.outer(pc, pc) + (not h) * cc * (2 - cc) * C)
+             + cmu * (y_sel.T * w) @ y_sel)
+        sigma *= np.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+
+        history.append(Generation(g, named(trader(mean)), named(best), best_fit, float(sigma)))
+        if verbose:
+            print(f"gen {g:3d}  mean {named(trader(mean))}  best {named(best)} {best_fit:.4f}  sigma {sigma:.4f}")
+        if sigma * np.sqrt(D.max()) < tol:
+            break
+
+    return OptimizeResult(named(best), best_fit, history, evaluator.games, evaluator.cache_hits)
@@ -1,6 +1,8 @@
 # Players.py
 
-from typing import Dict, List, Tuple, Optional
+from array import array
+from collections.abc import Mapping
+from typing import Dict, List, NamedTuple, Tuple, Optional
 from Agents import Personality
 
 # All five resource types
@@ -21,25 +23,158 @@ DICE_PROBABILITIES = {
 
 DISCOUNT_FACTOR = 0.6
 
+# resources given per resource got when trading with the bank
+BANK_RATE = 4           # default, any resource
+GENERIC_PORT_RATE = 3   # with a 3:1 port
+SPECIAL_PORT_RATE = 2   # with a 2:1 port, for that port's resource
+
+RES_INDEX = {r: i for i, r in enumerate(RESOURCES)}
+# BUILDING_COSTS as fixed-index vectors over RESOURCES
+COST_VECTORS = {g: tuple(c.get(r, 0) for r in RESOURCES) for g, c in BUILDING_COSTS.items()}
+
+# Hit/miss counts of the per-player urgency and shadow-price caches,
+# summed over every Player in this process.
+CACHE_STATS = {'urgency_hits': 0, 'urgency_misses': 0, 'price_hits': 0, 'price_misses': 0}
+
+def cache_hit_rate(kind: str = 'price') -> float:
+    hits, misses = CACHE_STATS[f'{kind}_hits'], CACHE_STATS[f'{kind}_misses']
+    return hits / (hits + misses) if hits + misses else 0.0
+
+def reset_cache_stats():
+    for k in CACHE_STATS:
+        CACHE_STATS[k] = 0
+
+class PlayerState(NamedTuple):
+    """
+    Immutable copy of a player's mutable state, from snapshot(). sources
+    is the backend's own (immutable) source tuple, shared rather than
+    copied, so a state only restores into the same player class.
+    """
+    hand: Tuple[int, ...]       # counts in RESOURCES order
+    goals: Tuple[str, ...]      # remaining goals
+    sources: tuple
+    buildings: Tuple[str, ...]
+    trade_rates: Tuple[int, ...]
+
 class Player:
     def __init__(self, name: str, personality: Optional[Personality] = None):
         self.name = name
+        # bumped on every change to resources, goals or sources; see shadow_prices
+        self._version = 0
+        self._urgency_cache = None
+        self._price_cache = None
         # Initialize all five resources
         self.resources: Dict[str,int] = {r: 0 for r in RESOURCES}
         self.buildings: List[str] = []
-        self.resource_sources: List[Tuple[str, int, bool]] = []
+        self.resource_sources = []
         self.goal_queue: List[str] = ['settlement','city','dev_card']
         self.personality = personality
+        # bank rate per resource, in RESOURCES order; see add_port
+        self.trade_rates: Tuple[int, ...] = (BANK_RATE,) * len(RESOURCES)
+
+    # resources and goal_queue must be changed through add_resource,
+    # remove_resource, pop_goal or by assignment so the caches see it
+    @property
+    def resources(self) -> Dict[str,int]:
+        return self._resources
+
+    @resources.setter
+    def resources(self, hand: Dict[str,int]):
+        self._resources = hand
+        self._version += 1
+
+    @property
+    def goal_queue(self) -> List[str]:
+        return self._goal_queue
+
+    @goal_queue.setter
+    def goal_queue(self, goals: List[str]):
+        self._goal_queue = goals
+        self._version += 1
+
+    def pop_goal(self) -> str:
+        self._version += 1
+        return self._goal_queue.pop(0)
 
     @property
     def current_goal(self) -> Optional[str]:
-        return self.goal_queue[0] if self.goal_queue else None
+        return self._goal_queue[0] if self._goal_queue else None
+
+    # --- resource sources and their per-roll index ---
+    @property
+    def resource_sources(self) -> Tuple[Tuple[str, int, bool], ...]:
+        # immutable so the indexes below can't go stale; use add_source/upgrade_source
+        return self._sources
+
+    @resource_sources.setter
+    def resource_sources(self, sources):
+        self._sources = tuple(sources)
+        self._rebuild_income()
+        self._version += 1
+
+    def add_source(self, resource: str, dice: int, is_city: bool = False):
+        self._version += 1
+        self._sources += ((resource, dice, is_city),)
+        amt = 2 if is_city else 1
+        gains = self.roll_gains.setdefault(dice, {})
+        gains[resource] = gains.get(resource, 0) + amt
+        self._income[resource] += DICE_PROBABILITIES.get(dice, 0) * amt
+
+    def upgrade_source(self, index: int):
+        res, dice, is_city = self._sources[index]
+        if is_city:
+            return
+        self._version += 1
+        self._sources = self._sources[:index] + ((res, dice, True),) + self._sources[index+1:]
+        self.roll_gains[dice][res] += 1
+        # recomputed rather than patched so income stays equal to a fresh sum
+        self._income = self._sum_income()
+
+    def _sum_income(self) -> Dict[str,float]:
+        income = {r: 0.0 for r in RESOURCES}
+        for res, dice, is_city in self._sources:
+            prob = DICE_PROBABILITIES.get(dice, 0)
+            income[res] += prob * (2 if is_city else 1)
+        return income
+
+    def _rebuild_income(self):
+        # roll -> {resource: amount}, in source order
+        self.roll_gains: Dict[int, Dict[str,int]] = {}
+        for res, dice, is_city in self._sources:
+            gains = self.roll_gains.setdefault(dice, {})
+            gains[res] = gains.get(res, 0) + (2 if is_city else 1)
+        self._income = self._sum_income()
+
+    def collect(self, roll: int, record: bool = True) -> Optional[Dict[str,int]]:
+        """Add the income for this roll to the hand; returns the gains, if any."""
+        gains = self.roll_gains.get(roll)
+        if gains:
+            hand = self._resources
+            for res, amt in gains.items():
+                hand[res] += amt
+            self._version += 1
+        return gains
 
     def add_resource(self, resource: str, count: int = 1):
-        self.resources[resource] += count
+        self._resources[resource] += count
+        self._version += 1
 
     def remove_resource(self, resource: str, count: int = 1):
-        self.resources[resource] = max(0, self.resources[resource] - count)
+        self._resources[resource] = max(0, self._resources[resource] - count)
+        self._version += 1
+
+    def hand_vector(self) -> Tuple[int, ...]:
+        hand = self._resources
+        return tuple([hand[r] for r in RESOURCES])
+
+    def add_port(self, resource: Optional[str] = None):
+        """A 3:1 port (resource None) or a 2:1 port for resource; rates only ever improve."""
+        if resource is None:
+            self.trade_rates = tuple(min(k, GENERIC_PORT_RATE) for k in self.trade_rates)
+        else:
+            i = RES_INDEX[resource]
+            self.trade_rates = self.trade_rates[:i] + (min(self.trade_rates[i], SPECIAL_PORT_RATE),) + self.trade_rates[i+1:]
+
 
     def resource_delta(self) -> Tuple[Dict[str,int], Dict[str,int]]:
         if self.current_goal is None:
@@ -59,13 +194,18 @@ class Player:
         return shortage, surplus
 
     def expected_income(self) -> Dict[str,float]:
-        income = {r: 0.0 for r in RESOURCES}
-        for res, dice, is_city in self.resource_sources:
-            prob = DICE_PROBABILITIES.get(dice, 0)
-            income[res] += prob * (2 if is_city else 1)
-        return income
+        return dict(self._income)
 
     def resource_urgency_vector(self) -> Dict[str,float]:
+        cached = self._urgency_cache
+        if cached is not None and cached[0] == self._version:
+            CACHE_STATS['urgency_hits'] += 1
+        else:
+            CACHE_STATS['urgency_misses'] += 1
+            cached = self._urgency_cache = (self._version, self._compute_urgency())
+        return dict(cached[1])
+
+    def _compute_urgency(self) -> Dict[str,float]:
         urgency = {r: 0.0 for r in RESOURCES}
         hand = self.resources.copy()
         discount = 1.0
@@ -89,7 +229,16 @@ class Player:
         return self.resource_urgency_vector()
 
     def shadow_prices(self) -> Dict[str,float]:
-        exp_inc = self.expected_income()
+        cached = self._price_cache
+        if cached is not None and cached[0] == self._version:
+            CACHE_STATS['price_hits'] += 1
+        else:
+            CACHE_STATS['price_misses'] += 1
+            cached = self._price_cache = (self._version, self._compute_prices())
+        return dict(cached[1])
+
+    def _compute_prices(self) -> Dict[str,float]:
+        exp_inc = self._income
         mv = self.marginal_value()
         prices: Dict[str,float] = {}
         for r in RESOURCES:
@@ -101,6 +250,274 @@ class Player:
                 prices[r] = 0.0
         return prices
 
+    # --- snapshots ---
+    def snapshot(self) -> PlayerState:
+        return PlayerState(self.hand_vector(), tuple(self._goal_queue),
+                           self._sources, tuple(self.buildings), self.trade_rates)
+
+    def restore(self, state: PlayerState):
+        self._resources = dict(zip(RESOURCES, state.hand))
+        self._goal_queue = list(state.goals)
+        self.buildings = list(state.buildings)
+        self.trade_rates = state.trade_rates
+        # sources only change by replacing the tuple, so identity means the index is current
+        if state.sources is not self._sources:
+            self._sources = state.sources
+            self._rebuild_income()
+        self._version += 1
+
+    def __str__(self):
+        return (f"{self.name} | Res: {self.resources} | "
+                f"Builds: {self.buildings} | Goals: {self.goal_queue}")
+
+
+class HandView(Mapping):
+    """Dict-style view of a CompactPlayer's hand, keyed by resource name."""
+    __slots__ = ('_player',)
+
+    def __init__(self, player: 'CompactPlayer'):
+        self._player = player
+
+    def __getitem__(self, resource: str) -> int:
+        return self._player._hand[RES_INDEX[resource]]
+
+    def __setitem__(self, resource: str, count: int):
+        p = self._player
+        p._hand[RES_INDEX[resource]] = count
+        p._version += 1
+
+    def get(self, resource: str, default=None):
+        i = RES_INDEX.get(resource)
+        return default if i is None else self._player._hand[i]
+
+    def __iter__(self):
+        return iter(RESOURCES)
+
+    def __len__(self):
+        return len(RESOURCES)
+
+    def copy(self) -> Dict[str,int]:
+        return dict(zip(RESOURCES, self._player._hand))
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class CompactPlayer:
+    """
+    Player backend for holding very many live game states. Same public API
+    as Player, but stored in __slots__: the hand is a list indexed like
+    RESOURCES, goals are a shared tuple plus a pointer, sources are packed
+    into small ints and per-roll income is a flat (roll, resource) byte table.
+    resources is exposed through a HandView.
+    """
+    __slots__ = ('name', 'personality', 'buildings', 'trade_rates',
+                 '_hand', '_goals', '_goal_idx', '_sources', '_gain', '_pay_mask', '_values',
+                 '_version', '_urgency_version', '_prices_version')
+
+    # _values packs three float vectors over RESOURCES into one array
+    _INCOME, _URGENCY, _PRICES = 0, len(RESOURCES), 2 * len(RESOURCES)
+
+    def __init__(self, name: str, personality: Optional[Personality] = None):
+        self.name = name
+        self.personality = personality
+        self.buildings: List[str] = []
+        self.trade_rates: Tuple[int, ...] = (BANK_RATE,) * len(RESOURCES)
+        self._version = 0
+        self._values = array('d', bytes(8 * 3 * len(RESOURCES)))
+        self._urgency_version = self._prices_version = -1
+        self._hand = [0] * len(RESOURCES)
+        self.resource_sources = ()
+        self.goal_queue = ('settlement', 'city', 'dev_card')
+
+    # --- hand ---
+    @property
+    def resources(self) -> HandView:
+        return HandView(self)
+
+    @resources.setter
+    def resources(self, hand: Dict[str,int]):
+        self._hand = [hand.get(r, 0) for r in RESOURCES]
+        self._version += 1
+
+    def add_resource(self, resource: str, count: int = 1):
+        self._hand[RES_INDEX[resource]] += count
+        self._version += 1
+
+    def remove_resource(self, resource: str, count: int = 1):
+        i = RES_INDEX[resource]
+        self._hand[i] = max(0, self._hand[i] - count)
+        self._version += 1
+
+    def hand_vector(self) -> Tuple[int, ...]:
+        return tuple(self._hand)
+
+    add_port = Player.add_port
+
+    def collect(self, roll: int, record: bool = True) -> Optional[Dict[str,int]]:
+        """Add the income for this roll to the hand; returns the gains when record is set."""
+        if not (self._pay_mask >> roll) & 1:
+            return None
+        hand, gain, base = self._hand, self._gain, roll * len(RESOURCES)
+        for j in range(len(RESOURCES)):
+            if gain[base + j]:
+                hand[j] += gain[base + j]
+        self._version += 1
+        if record:
+            return {r: gain[base + j] for j, r in enumerate(RESOURCES) if gain[base + j]}
+        return None
+
+    # --- goals ---
+    @property
+    def goal_queue(self) -> List[str]:
+        return list(self._goals[self._goal_idx:])
+
+    @goal_queue.setter
+    def goal_queue(self, goals):
+        # a tuple is kept as is, so players built from one queue share it
+        self._goals = goals if isinstance(goals, tuple) else tuple(goals)
+        self._goal_idx = 0
+        self._version += 1
+
+    def pop_goal(self) -> str:
+        goal = self._goals[self._goal_idx]
+        self._goal_idx += 1
+        self._version += 1
+        return goal
+
+    @property
+    def current_goal(self) -> Optional[str]:
+        return self._goals[self._goal_idx] if self._goal_idx < len(self._goals) else None
+
+    # --- sources, packed as (res_index * 13 + dice) * 2 + is_city ---
+    @property
+    def resource_sources(self) -> Tuple[Tuple[str, int, bool], ...]:
+        return tuple((RESOURCES[(c >> 1) // 13], (c >> 1) % 13, bool(c & 1)) for c in self._sources)
+
+    @resource_sources.setter
+    def resource_sources(self, sources):
+        self._set_codes(tuple((RES_INDEX[res] * 13 + dice) * 2 + bool(is_city) for res, dice, is_city in sources))
+        self._version += 1
+
+    def _set_codes(self, codes: Tuple[int, ...]):
+        self._sources = codes
+        self._gain = bytearray(13 * len(RESOURCES))
+        self._pay_mask = 0
+        for c in codes:
+            self._count_source(c, 2 if c & 1 else 1)
+        self._sum_income()
+
+    def _count_source(self, code: int, amt: int):
+        dice = (code >> 1) % 13
+        self._gain[dice * len(RESOURCES) + (code >> 1) // 13] += amt
+        self._pay_mask |= 1 << dice
+
+    def add_source(self, resource: str, dice: int, is_city: bool = False):
+        code = (RES_INDEX[resource] * 13 + dice) * 2 + bool(is_city)
+        self._sources += (code,)
+        amt = 2 if is_city else 1
+        self._count_source(code, amt)
+        self._values[RES_INDEX[resource]] += DICE_PROBABILITIES.get(dice, 0) * amt
+        self._version += 1
+
+    def upgrade_source(self, index: int):
+        code = self._sources[index]
+        if code & 1:
+            return
+        self._sources = self._sources[:index] + (code | 1,) + self._sources[index+1:]
+        self._count_source(code, 1)
+        # recomputed rather than patched so income stays equal to a fresh sum
+        self._sum_income()
+        self._version += 1
+
+    def _sum_income(self):
+        values = self._values
+        for j in range(len(RESOURCES)):
+            values[j] = 0.0
+        for c in self._sources:
+            values[(c >> 1) // 13] += DICE_PROBABILITIES.get((c >> 1) % 13, 0) * (2 if c & 1 else 1)
+
+    # --- valuation ---
+    def resource_delta(self) -> Tuple[Dict[str,int], Dict[str,int]]:
+        goal = self.current_goal
+        if goal is None:
+            return {}, {}
+        cost = COST_VECTORS[goal]
+        shortage, surplus = {}, {}
+        for j, have in enumerate(self._hand):
+            if have < cost[j]:
+                shortage[RESOURCES[j]] = cost[j] - have
+            elif have > cost[j]:
+                surplus[RESOURCES[j]] = have - cost[j]
+        return shortage, surplus
+
+    def expected_income(self) -> Dict[str,float]:
+        return dict(zip(RESOURCES, self._values[:len(RESOURCES)]))
+
+    def _update_urgency(self):
+        if self._urgency_version == self._version:
+            CACHE_STATS['urgency_hits'] += 1
+            return
+        CACHE_STATS['urgency_misses'] += 1
+        n = len(RESOURCES)
+        urgency = [0.0] * n
+        hand = list(self._hand)
+        discount = 1.0
+        goals = self._goals
+        for k in range(self._goal_idx, len(goals)):
+            cost = COST_VECTORS[goals[k]]
+            for j in range(n):
+                req, have = cost[j], hand[j]
+                if have < req:
+                    urgency[j] += discount * (req - have)
+                    hand[j] = 0
+                else:
+                    hand[j] -= req
+            discount *= DISCOUNT_FACTOR
+        total = sum(urgency)
+        off = self._URGENCY
+        for j in range(n):
+            self._values[off + j] = urgency[j] / total if total != 0 else 0.0
+        self._urgency_version = self._version
+
+    def resource_urgency_vector(self) -> Dict[str,float]:
+        self._update_urgency()
+        return dict(zip(RESOURCES, self._values[self._URGENCY:self._PRICES]))
+
+    def marginal_value(self) -> Dict[str,float]:
+        return self.resource_urgency_vector()
+
+    def shadow_prices(self) -> Dict[str,float]:
+        if self._prices_version == self._version:
+            CACHE_STATS['price_hits'] += 1
+        else:
+            CACHE_STATS['price_misses'] += 1
+            self._update_urgency()
+            v, urg, prc = self._values, self._URGENCY, self._PRICES
+            for j in range(len(RESOURCES)):
+                if v[j] > 0:
+                    v[prc + j] = v[urg + j] / v[j]
+                elif v[urg + j] > 0:
+                    v[prc + j] = 1000.0
+                else:
+                    v[prc + j] = 0.0
+            self._prices_version = self._version
+        return dict(zip(RESOURCES, self._values[self._PRICES:]))
+
+    # --- snapshots ---
+    def snapshot(self) -> PlayerState:
+        return PlayerState(tuple(self._hand), self._goals[self._goal_idx:], self._sources,
+                           tuple(self.buildings), self.trade_rates)
+
+    def restore(self, state: PlayerState):
+        self._hand = list(state.hand)
+        self._goals, self._goal_idx = state.goals, 0
+        self.buildings = list(state.buildings)
+        self.trade_rates = state.trade_rates
+        if state.sources is not self._sources:
+            self._set_codes(state.sources)
+        self._version += 1
+
     def __str__(self):
         return (f"{self.name} | Res: {self.resources} | "
                 f"Builds: {self.buildings} | Goals: {self.goal_queue}")
@@ -0,0 +1,493 @@
+# Replay.py
+
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from EventSinks import EventSink
+from FullEngine import EngineState
+from Players import Player, PlayerState, RESOURCES, RES_INDEX, BUILDING_COSTS
+
+# File layout
+#   header    MAGIC, version, keyframe_every, player names, then whether the
+#             game is on a board and, if so, its layout
+#   chunks    tag (KEYFRAME | ROUND), payload length, payload; one ROUND per
+#             round, a KEYFRAME after round 0 and every keyframe_every rounds.
+#             On a board, keyframes end with every placement and ROUNDs with
+#             the round's new ones
+#   index     the offset of every ROUND chunk (rounds 1..n), (round, offset)
+#             of every KEYFRAME, the winner, then the index offset and
+#             INDEX_MAGIC as a fixed-size trailer
+# All integers are little-endian. A file without an index (the game never
+# finished) is still readable: Replay scans the chunks instead. Version 1
+# files (no board section) are still read.
+MAGIC, INDEX_MAGIC, VERSION = b'CTNR', b'CTNI', 2
+KEYFRAME, ROUND = b'K', b'R'
+BANK_SEAT = 255
+NO_WINNER = 255
+NO_SEAT = 255       # an empty vertex or edge, or no longest-road holder
+GOALS = list(BUILDING_COSTS)
+GOAL_CODE = {g: i for i, g in enumerate(GOALS)}
+TILES = list(RESOURCES) + ['desert']
+TILE_CODE = {t: i for i, t in enumerate(TILES)}
+
+_CHUNK = struct.Struct('<cI')
+_TRAILER = struct.Struct('<I4s')
+_N = len(RESOURCES)
+
+
+def _counts(bundle: Dict[str, int]) -> bytes:
+    v = [0] * _N
+    for r, c in bundle.items():
+        v[RES_INDEX[r]] = c
+    return bytes(v)
+
+
+def _bundle(counts: bytes) -> Dict[str, int]:
+    return {RESOURCES[j]: c for j, c in enumerate(counts) if c}
+
+
+def _sources(sources) -> bytes:
+    out = bytearray([len(sources)])
+    for res, dice, is_city in sources:
+        out += bytes((RES_INDEX[res], dice, is_city))
+    return bytes(out)
+
+
+class _Cursor:
+    """Sequential reads over one chunk payload."""
+
+    def __init__(self, data: bytes):
+        self.data, self.pos = data, 0
+
+    def u8(self) -> int:
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def take(self, n: int) -> bytes:
+        self.pos += n
+        return self.data[self.pos - n:self.pos]
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        self.pos += fmt.size
+        return fmt.unpack_from(self.data, self.pos - fmt.size)
+
+    def sources(self) -> List[Tuple[str, int, bool]]:
+        return [(RESOURCES[r], d, bool(c)) for r, d, c in (self.take(3) for _ in range(self.u8()))]
+
+    def owners(self, n: int) -> Dict[int, int]:
+        """n spot owners as {spot: seat}, empty spots left out."""
+        return {i: s for i, s in enumerate(self.take(n)) if s != NO_SEAT}
+
+    def seat(self) -> Optional[int]:
+        s = self.u8()
+        return None if s == NO_SEAT else s
+
+
+# -------------------------------------------------------------------
+# RECORDING
+# -------------------------------------------------------------------
+_KEY_HEAD = struct.Struct('<IIB')       # round_num, roll_index, rng kind
+_HAND = struct.Struct(f'<{_N}H')
+_STREAMS = struct.Struct('<3Q')
+_RANDOM = struct.Struct('<625I')
+RNG_NONE, RNG_STREAMS, RNG_RANDOM = 0, 1, 2
+
+
+class Recorder(EventSink):
+    """
+    Writes a game to path as it is played: pass it as the engine's sink.
+    Each round is one small chunk of roll, gains, trades, builds and tile
+    changes; every keyframe_every rounds a keyframe holds the full player
+    state. Stream counters are always kept; rng=True also keeps the 2.5 kB
+    Random state in keyframes so a restored engine can play on exactly.
+    On a board, keyframes also hold every settlement, city and road and
+    the longest-road holder, and rounds the spots built on.
+    """
+
+    def __init__(self, path: str, keyframe_every: int = 16, rng: bool = False):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.rng = rng
+        self.engine = None
+        self._f = None
+        self._index: List[Tuple[bytes, int, int]] = []     # (tag, round, offset)
+
+    def attach(self, engine):
+        self.engine = engine
+        self._seat = {p.name: i for i, p in enumerate(engine.players)}
+        self._f = open(self.path, 'wb')
+        head = bytearray(MAGIC) + struct.pack('<BHB', VERSION, self.keyframe_every, len(engine.players))
+        for p in engine.players:
+            name = p.name.encode()
+            head += bytes([len(name)]) + name
+        board = engine.board
+        head.append(board is not None)
+        if board is not None:
+            head.append(len(board.layout))
+            for res, num in board.layout:
+                head += bytes((TILE_CODE[res], num or 0))
+            self._placed = self._placements()
+        self._f.write(head)
+        self._roll_index = engine.roll_index
+        self._write(KEYFRAME, engine.round_num, self._keyframe())
+
+    def _write(self, tag: bytes, round_num: int, payload: bytes):
+        self._index.append((tag, round_num, self._f.tell()))
+        self._f.write(_CHUNK.pack(tag, len(payload)))
+        self._f.write(payload)
+
+    def _keyframe(self) -> bytes:
+        e = self.engine
+        if e.streams:
+            kind, rng = RNG_STREAMS, _STREAMS.pack(e.streams.dice.counter, e.streams.tiles.counter, e.streams.shuffle.counter)
+        elif self.rng:
+            version, words, _ = e.rng.getstate()
+            kind, rng = RNG_RANDOM, _RANDOM.pack(*words)
+        else:
+            kind, rng = RNG_NONE, b''
+        out = bytearray(_KEY_HEAD.pack(e.round_num, e.roll_index, kind)) + rng
+        for p in e.players:
+            out += _HAND.pack(*p.hand_vector())
+            goals = p.goal_queue
+            out += bytes([len(goals)] + [GOAL_CODE[g] for g in goals])
+            out += _sources(p.resource_sources)
+            out += bytes([len(p.buildings)] + [GOAL_CODE[b] for b in p.buildings])
+            out += bytes(p.trade_rates)
+        board = e.board
+        if board is not None:
+            placement = board.placement
+            # int8 owners: an empty spot (-1) is written as NO_SEAT
+            out += placement.vertex_owner.tobytes() + placement.is_city.tobytes() + placement.edge_owner.tobytes()
+            out.append(_seat_code(board.roads.holder))
+            out.append(len(board.vertex_sources))
+            for v, sources in board.vertex_sources.items():
+                out += bytes([v, len(sources)] + sources)
+        return bytes(out)
+
+    def _placements(self):
+        placement = self.engine.board.placement
+        return placement.vertex_owner.copy(), placement.is_city.copy(), placement.edge_owner.copy()
+
+    def _board_changes(self) -> bytes:
+        """Settlements, cities and roads placed since the last call, and the longest-road holder."""
+        board = self.engine.board
+        placement = board.placement
+        owners, cities, roads = self._placed
+        settled = (placement.vertex_owner != owners).nonzero()[0]
+        upgraded = (placement.is_city != cities).nonzero()[0]
+        built = (placement.edge_owner != roads).nonzero()[0]
+        out = bytearray([len(settled)])
+        for v in settled:
+            sources = board.vertex_sources[v]
+            out += bytes([v, placement.vertex_owner[v], len(sources)] + sources)
+        out += bytes([len(upgraded)] + list(upgraded))
+        out.append(len(built))
+        for e in built:
+            out += bytes((e, placement.edge_owner[e]))
+        out.append(_seat_code(board.roads.holder))
+        if len(settled) or len(upgraded) or len(built):
+            self._placed = self._placements()
+        return bytes(out)
+
+    # --- sink hooks ---
+    def on_roll(self, roll):
+        self._roll = roll
+        self._gains: List[bytes] = []
+        self._trades: List = []
+        self._builds: List = []
+
+    def on_gains(self, player, gains):
+        # encoded now: gains may be the player's own per-roll table, which a later upgrade changes
+        self._gains.append(bytes([self._seat[player.name]]) + _counts(gains))
+
+    def on_trades(self, trades):
+        self._trades = trades
+
+    def on_builds(self, builds):
+        self._builds = builds
+
+    def on_resources(self, players):
+        e = self.engine
+        seat = self._seat
+        advanced = e.roll_index != self._roll_index
+        self._roll_index = e.roll_index
+
+        out = bytearray((self._roll, advanced, len(self._gains)))
+        for gains in self._gains:
+            out += gains
+        out.append(len(self._trades))
+        for giver, receiver, give, get in self._trades:
+            out += bytes((seat[giver], BANK_SEAT if receiver == 'bank' else seat[receiver]))
+            out += _counts(give) + _counts(get)
+        out.append(len(self._builds))
+        for name, b in self._builds:
+            out += bytes((seat[name], GOAL_CODE[b]))
+        out.append(len(e.tile_changes))
+        for name, added, upgraded in e.tile_changes:
+            out += bytes([seat[name]]) + _sources(added) + bytes([len(upgraded)] + list(upgraded))
+        if e.board is not None:
+            out += self._board_changes()
+        self._write(ROUND, e.round_num, bytes(out))
+        if e.round_num % self.keyframe_every == 0:
+            self._write(KEYFRAME, e.round_num, self._keyframe())
+
+    def on_game_over(self, winner, rounds):
+        self.close(winner)
+
+    def close(self, winner: Optional[str] = None):
+        """Write the index and close the file; on_game_over does this for a finished game."""
+        if self._f is None:
+            return
+        f = self._f
+        at = f.tell()
+        rounds = [(r, o) for tag, r, o in self._index if tag == ROUND]
+        keys = [(r, o) for tag, r, o in self._index if tag == KEYFRAME]
+        f.write(struct.pack(f'<I{len(rounds)}I', len(rounds), *(o for _, o in rounds)))
+        f.write(struct.pack('<I', len(keys)) + b''.join(struct.pack('<II', r, o) for r, o in keys))
+        f.write(bytes([NO_WINNER if winner is None else self._seat[winner]]))
+        f.write(_TRAILER.pack(at, INDEX_MAGIC))
+        f.close()
+        self._f = None
+
+
+# -------------------------------------------------------------------
+# REPLAY
+# -------------------------------------------------------------------
+class Replay:
+    """
+    Random access to a recorded game. Rounds are decoded on demand, so
+    iterating a Replay yields the rounds_log dicts of test.simulate_game
+    (plus gains) without holding the game in memory; state(r) rebuilds
+    the engine state after any round, board included, from the nearest
+    earlier keyframe.
+    """
+
+    def __init__(self, path: str):
+        self._f = open(path, 'rb')
+        f = self._f
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a recorded game")
+        version, self.keyframe_every, n = struct.unpack('<BHB', f.read(4))
+        if version not in (1, VERSION):
+            raise ValueError(f"{path}: unsupported version {version}")
+        self.names = []
+        for _ in range(n):
+            self.names.append(f.read(f.read(1)[0]).decode())
+        # (resource, number) per hex of a board game, else None
+        self.layout: Optional[List[Tuple[str, Optional[int]]]] = None
+        if version >= 2 and f.read(1)[0]:
+            self.layout = [(TILES[t], num or None) for t, num in (f.read(2) for _ in range(f.read(1)[0]))]
+        self._body = f.tell()
+        self.winner: Optional[str] = None
+        self.finished = self._read_index()
+        if not self.finished:
+            self._scan()
+
+    def _read_index(self) -> bool:
+        f = self._f
+        f.seek(0, 2)
+        end = f.tell()
+        if end - self._body < _TRAILER.size:
+            return False
+        f.seek(end - _TRAILER.size)
+        at, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != INDEX_MAGIC:
+            return False
+        f.seek(at)
+        data = _Cursor(f.read(end - _TRAILER.size - at))
+        count = struct.Struct('<I')
+        n = data.unpack(count)[0]
+        self._rounds = dict(enumerate(data.unpack(struct.Struct(f'<{n}I')), 1))
+        self._keys = dict(data.unpack(struct.Struct('<II')) for _ in range(data.unpack(count)[0]))
+        w = data.u8()
+        self.winner = None if w == NO_WINNER else self.names[w]
+        return True
+
+    def _scan(self):
+        """Rebuild the index of an unfinished file by walking its chunks."""
+        f = self._f
+        self._rounds, self._keys = {}, {}
+        f.seek(0, 2)
+        end = f.tell()
+        at, last = self._body, 0
+        while at + _CHUNK.size <= end:
+            f.seek(at)
+            tag, size = _CHUNK.unpack(f.read(_CHUNK.size))
+            if at + _CHUNK.size + size > end:
+                break
+            if tag == KEYFRAME:
+                last = struct.unpack('<I', f.read(4))[0]
+                self._keys[last] = at
+            else:
+                last += 1
+                self._rounds[last] = at
+            at += _CHUNK.size + size
+
+    def _chunk(self, offset: int) -> _Cursor:
+        f = self._f
+        f.seek(offset)
+        _, size = _CHUNK.unpack(f.read(_CHUNK.size))
+        return _Cursor(f.read(size))
+
+    @property
+    def n_rounds(self) -> int:
+        return len(self._rounds)
+
+    def __len__(self):
+        return self.n_rounds
+
+    # --- rounds ---
+    def round(self, r: int) -> dict:
+        """Round r (from 1) as a rounds_log entry: round, roll, gains, trades, builds, tile_changes."""
+        return self._decode(r)[1]
+
+    def _decode(self, r: int) -> Tuple[int, dict, Optional[_Cursor]]:
+        """(whether round r took a roll from dice_rolls, its entry, a cursor on its board changes if any)"""
+        c = self._chunk(self._rounds[r])
+        names = self.names
+        roll, advanced, n = c.u8(), c.u8(), c.u8()
+        gains = {}
+        for _ in range(n):
+            s = c.u8()
+            gains[names[s]] = _bundle(c.take(_N))
+        trades = []
+        for _ in range(c.u8()):
+            g, rcv = c.u8(), c.u8()
+            trades.append((names[g], 'bank' if rcv == BANK_SEAT else names[rcv], _bundle(c.take(_N)), _bundle(c.take(_N))))
+        builds = [(names[s], GOALS[b]) for s, b in (c.take(2) for _ in range(c.u8()))]
+        tile_changes = []
+        for _ in range(c.u8()):
+            s = c.u8()
+            added = c.sources()
+            tile_changes.append((names[s], added, list(c.take(c.u8()))))
+        entry = {'round': r, 'roll': roll, 'gains': gains, 'trades': trades, 'builds': builds, 'tile_changes': tile_changes}
+        return advanced, entry, c if self.layout is not None else None
+
+    def rounds(self, start: int = 1, stop: Optional[int] = None) -> Iterator[dict]:
+        for r in range(start, (stop or self.n_rounds) + 1):
+            yield self.round(r)
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.rounds()
+
+    # --- state ---
+    def _read_keyframe(self, c: _Cursor):
+        round_num, roll_index, kind = c.unpack(_KEY_HEAD)
+        rng = None
+        if kind == RNG_STREAMS:
+            rng = c.unpack(_STREAMS)
+        elif kind == RNG_RANDOM:
+            rng = (3, c.unpack(_RANDOM), None)
+        players = []
+        for _ in self.names:
+            hand = list(c.unpack(_HAND))
+            goals = [GOALS[g] for g in c.take(c.u8())]
+            sources = c.sources()
+            buildings = [GOALS[b] for b in c.take(c.u8())]
+            players.append([hand, goals, sources, buildings, tuple(c.take(_N))])
+        return round_num, roll_index, rng, players
+
+    @staticmethod
+    def _read_placements(c: _Cursor) -> list:
+        """A keyframe's board: [settlements, cities, roads, vertex_sources, holder], as GameBoard.from_placements takes them."""
+        from BoardGraph import N_VERTICES, N_EDGES
+        settlements = c.owners(N_VERTICES)
+        cities = {v for v, city in enumerate(c.take(N_VERTICES)) if city}
+        roads = c.owners(N_EDGES)
+        holder = c.seat()
+        vertex_sources = {}
+        for _ in range(c.u8()):
+            v = c.u8()
+            vertex_sources[v] = list(c.take(c.u8()))
+        return [settlements, cities, roads, vertex_sources, holder]
+
+    @staticmethod
+    def _apply_placements(c: _Cursor, board: list):
+        settlements, cities, roads, vertex_sources, _ = board
+        for _ in range(c.u8()):
+            v, s = c.u8(), c.u8()
+            settlements[v] = s
+            vertex_sources[v] = list(c.take(c.u8()))
+        cities.update(c.take(c.u8()))
+        for _ in range(c.u8()):
+            e, s = c.u8(), c.u8()
+            roads[e] = s
+        board[4] = c.seat()
+
+    def state(self, r: int, player_cls=Player) -> EngineState:
+        """
+        Engine state after round r (0: before the first roll), for
+        TradeEngine.restore on an engine of player_cls players; a board
+        game's state has its GameBoard rebuilt from the placements. The
+        RNG state is only known at keyframes; elsewhere it is None and
+        the state should be restored with rng=False.
+        """
+        start = max(k for k in self._keys if k <= r)
+        c = self._chunk(self._keys[start])
+        round_num, roll_index, rng, players = self._read_keyframe(c)
+        board = self._read_placements(c) if self.layout is not None else None
+        seat = {n: i for i, n in enumerate(self.names)}
+        for k in range(start + 1, r + 1):
+            advanced, e, placed = self._decode(k)
+            roll_index += advanced
+            if placed is not None:
+                self._apply_placements(placed, board)
+            for name, gains in e['gains'].items():
+                _add(players[seat[name]][0], gains, 1)
+            for giver, receiver, give, get in e['trades']:
+                p = players[seat[giver]]
+                _add(p[0], give, -1)
+                _add(p[0], get, 1)
+                if receiver != 'bank':
+                    o = players[seat[receiver]]
+                    _add(o[0], give, 1)
+                    _add(o[0], get, -1)
+            for name, b in e['builds']:
+                p = players[seat[name]]
+                _add(p[0], BUILDING_COSTS[b], -1)
+                p[1].pop(0)
+                p[3].append(b)
+            for name, added, upgraded in e['tile_changes']:
+                sources = players[seat[name]][2]
+                for i in upgraded:
+                    res, dice, _ = sources[i]
+                    sources[i] = (res, dice, True)
+                sources.extend(added)
+        states = tuple(
+            PlayerState(tuple(hand), tuple(goals), _backend_sources(player_cls, sources), tuple(buildings), rates)
+            for hand, goals, sources, buildings, rates in players
+        )
+        if board is not None:
+            from BoardGraph import GameBoard
+            board = GameBoard.from_placements(self.layout, len(self.names), *board)
+        return EngineState(states, roll_index, r, rng if r == start else None, board)
+
+    def initial_tiles(self) -> Dict[str, List[Tuple[str, int, bool]]]:
+        """Each player's sources before the first roll, as simulate_game returns them."""
+        _, _, _, players = self._read_keyframe(self._chunk(self._keys[min(self._keys)]))
+        return {name: p[2] for name, p in zip(self.names, players)}
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _seat_code(seat: Optional[int]) -> int:
+    return NO_SEAT if seat is None else seat
+
+
+def _add(hand: List[int], bundle: Dict[str, int], sign: int):
+    for r, c in bundle.items():
+        hand[RES_INDEX[r]] += sign * c
+
+
+def _backend_sources(player_cls, sources) -> tuple:
+    """sources in the form player_cls keeps in its PlayerState."""
+    p = player_cls('')
+    p.resource_sources = sources
+    return p.snapshot().sources
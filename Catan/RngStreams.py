@@ -0,0 +1,144 @@
+# RngStreams.py
+
+from typing import MutableSequence, Sequence
+
+import numpy as np
+
+# subsystem stream ids
+DICE, TILES, SHUFFLE = 0, 1, 2
+STREAMS = {'dice': DICE, 'tiles': TILES, 'shuffle': SHUFFLE}
+
+# draws reserved per round; a stream seeked to round r starts at r * ROUND_STRIDE
+ROUND_STRIDE = 1 << 20
+
+_MASK  = (1 << 64) - 1
+_GAMMA = 0x9E3779B97F4A7C15
+
+
+def _mix64(z: int) -> int:
+    """SplitMix64 finalizer."""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def _mix64_np(z: np.ndarray) -> np.ndarray:
+    z = z ^ (z >> np.uint64(30))
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return z
+
+
+def stream_key(game_seed: int, stream_id: int) -> int:
+    return _mix64((_mix64(game_seed & _MASK) + (stream_id + 1) * _GAMMA) & _MASK)
+
+
+def stream_keys(game_seeds, stream_id: int) -> np.ndarray:
+    """stream_key of every seed in game_seeds, as a uint64 array of the same shape."""
+    seeds = np.asarray(game_seeds)
+    if seeds.dtype.kind not in 'iu':
+        # seeds past int64 (or a mix that numpy turns into floats) are masked one by one
+        seeds = np.array([int(s) & _MASK for s in game_seeds], dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return _mix64_np(_mix64_np(seeds.astype(np.uint64)) + np.uint64(((stream_id + 1) * _GAMMA) & _MASK))
+
+
+def _word(key: int, counter: int) -> int:
+    return _mix64((key + counter * _GAMMA) & _MASK)
+
+
+def words(keys, counters) -> np.ndarray:
+    """Stream outputs at the given counters, broadcasting keys against counters."""
+    with np.errstate(over='ignore'):
+        c = np.asarray(counters, dtype=np.uint64)
+        return _mix64_np(np.asarray(keys, dtype=np.uint64) + c * np.uint64(_GAMMA))
+
+
+def below(w, n):
+    """Map 64-bit words to [0, n) with a 32x32 multiply-shift; works on ints and arrays."""
+    return ((w >> 32) * n) >> 32
+
+
+class CounterStream:
+    """
+    Random draws as a pure function of (game_seed, stream_id, counter), so
+    the stream can be seeked anywhere without replaying the draws before.
+    Implements the part of random.Random the engine uses: randint, choice
+    and shuffle.
+    """
+
+    def __init__(self, game_seed: int, stream_id: int, counter: int = 0):
+        self.game_seed = game_seed
+        self.stream_id = stream_id
+        self.key = stream_key(game_seed, stream_id)
+        self.counter = counter
+
+    def seek(self, counter: int):
+        self.counter = counter
+
+    def tell(self) -> int:
+        return self.counter
+
+    def seek_round(self, round_num: int):
+        self.counter = round_num * ROUND_STRIDE
+
+    def next_word(self) -> int:
+        self.counter += 1
+        return _word(self.key, self.counter)
+
+    def randbelow(self, n: int) -> int:
+        return below(self.next_word(), n)
+
+    def randint(self, a: int, b: int) -> int:
+        return a + self.randbelow(b - a + 1)
+
+    def choice(self, seq: Sequence):
+        return seq[self.randbelow(len(seq))]
+
+    def shuffle(self, x: MutableSequence):
+        for i in reversed(range(1, len(x))):
+            j = self.randbelow(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+
+class GameStreams:
+    """
+    Independent dice, tile and shuffle streams for one game. TradeEngine
+    seeks all three to the start of each round, so a change in how many
+    draws one subsystem makes never moves another subsystem's draws, nor
+    any later round's. Round 0 is left for setup (initial tiles).
+    """
+
+    def __init__(self, game_seed: int):
+        self.game_seed = game_seed
+        self.dice    = CounterStream(game_seed, DICE)
+        self.tiles   = CounterStream(game_seed, TILES)
+        self.shuffle = CounterStream(game_seed, SHUFFLE)
+
+    def seek_round(self, round_num: int):
+        for s in (self.dice, self.tiles, self.shuffle):
+            s.seek_round(round_num)
+
+    def roll(self, round_num: int) -> int:
+        """The dice total of a round, without moving the dice stream."""
+        base = round_num * ROUND_STRIDE
+        return 2 + below(_word(self.dice.key, base + 1), 6) + below(_word(self.dice.key, base + 2), 6)
+
+    def dice_rolls(self, n_rounds: int, first_round: int = 1) -> np.ndarray:
+        return dice_rolls(self.game_seed, n_rounds, first_round)
+
+
+def dice_rolls(game_seed, n_rounds: int, first_round: int = 1) -> np.ndarray:
+    """
+    Every dice total of rounds first_round .. first_round + n_rounds - 1,
+    exactly as GameStreams draws them. game_seed may be an array of seeds,
+    giving one row per game.
+    """
+    keys = stream_keys(np.atleast_1d(game_seed), DICE)
+    base = np.arange(first_round, first_round + n_rounds, dtype=np.uint64) * np.uint64(ROUND_STRIDE)
+    w1 = words(keys[:, None], base + np.uint64(1))
+    w2 = words(keys[:, None], base + np.uint64(2))
+    rolls = (2 + below(w1, np.uint64(6)) + below(w2, np.uint64(6))).astype(np.int8)
+    return rolls[0] if np.ndim(game_seed) == 0 else rolls
@@ -0,0 +1,285 @@
+# Sweep.py
+
+import hashlib
+import itertools
+import os
+import random
+import struct
+import warnings
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from Agents import TraderParams
+from BatchEngine import simulate_games
+from EngineStats import EngineStats
+from EventSinks import NullSink
+
+# Alice's and Bob's ParameterizedTrader
+Params = Tuple[TraderParams, TraderParams]
+
+RECORD_DTYPE = np.dtype([
+    ('param', '<u4'),    # index into the sweep's params list
+    ('seed',  '<i8'),
+    ('winner', 'i1'),    # 0 Alice, 1 Bob, -1 no winner
+    ('rounds', '<i2'),
+])
+
+_FILE_MAGIC  = b'CATSWEEP'
+_BLOCK_MAGIC = 0x424c4f4b   # 'BLOK'
+_FILE_HEADER = struct.Struct('<8s20sI')   # magic, plan fingerprint, chunk size
+_BLOCK_HEADER = struct.Struct('<IQI')     # magic, unit id, record count
+
+
+# -------------------------------------------------------------------
+# PARAMETER PLANS
+# -------------------------------------------------------------------
+def grid(alphas1, betas1, alphas2, betas2) -> List[Params]:
+    """Every combination of the given per-player alpha/beta values."""
+    return [((float(a1), float(b1)), (float(a2), float(b2)))
+            for a1, b1, a2, b2 in itertools.product(alphas1, betas1, alphas2, betas2)]
+
+
+def random_params(
+    n: int,
+    alpha_range: Tuple[float, float] = (0.0, 3.0),
+    beta_range: Tuple[float, float] = (0.0, 3.0),
+    seed: int = 0
+) -> List[Params]:
+    """n uniform samples from the (alpha, beta) box for both players."""
+    rng = random.Random(seed)
+    return [
+        ((rng.uniform(*alpha_range), rng.uniform(*beta_range)),
+         (rng.uniform(*alpha_range), rng.uniform(*beta_range)))
+        for _ in range(n)
+    ]
+
+
+def _units(n_params: int, n_seeds: int, chunk_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    """(unit_id, param index, seed start, seed stop); unit ids are stable for a plan."""
+    blocks = -(-n_seeds // chunk_size)
+    for p in range(n_params):
+        for b in range(blocks):
+            yield p * blocks + b, p, b * chunk_size, min(n_seeds, (b + 1) * chunk_size)
+
+
+def _fingerprint(params: Sequence[Params], seeds: np.ndarray) -> bytes:
+    h = hashlib.sha1()
+    h.update(np.asarray(params, dtype=np.float64).tobytes())
+    h.update(seeds.tobytes())
+    return h.digest()
+
+
+# -------------------------------------------------------------------
+# APPEND-ONLY RESULT STORE
+# -------------------------------------------------------------------
+class ResultStore:
+    """
+    Binary log of finished work units: a file header tying the log to one
+    sweep plan, then one block per unit (header + packed RECORD_DTYPE rows).
+    Blocks are only ever appended and flushed whole, so after a crash the
+    log is valid up to the last complete block; a torn tail is cut off
+    when the store is reopened.
+    """
+
+    def __init__(self, path: str, fingerprint: bytes, chunk_size: int):
+        self.path = path
+        self.completed: Set[int] = set()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._recover(fingerprint, chunk_size)
+        else:
+            with open(path, 'wb') as f:
+                f.write(_FILE_HEADER.pack(_FILE_MAGIC, fingerprint, chunk_size))
+        self._fh = open(path, 'ab')
+
+    def _recover(self, fingerprint: bytes, chunk_size: int):
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            head = f.read(_FILE_HEADER.size)
+            if len(head) == _FILE_HEADER.size:
+                magic, fp, chunk = _FILE_HEADER.unpack(head)
+                if magic != _FILE_MAGIC:
+                    raise ValueError(f"{self.path} is not a sweep result log")
+                if fp != fingerprint or chunk != chunk_size:
+                    raise ValueError(f"{self.path} belongs to a different sweep plan")
+                valid_end = f.tell()
+            for unit_id, _, end in self._blocks(f):
+                self.completed.add(unit_id)
+                valid_end = end
+        if valid_end == 0:
+            with open(self.path, 'wb') as f:
+                f.write(_FILE_HEADER.pack(_FILE_MAGIC, fingerprint, chunk_size))
+        elif valid_end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+
+    @staticmethod
+    def _blocks(f) -> Iterator[Tuple[int, bytes, int]]:
+        """(unit_id, record bytes, end offset) for every complete block."""
+        while True:
+            head = f.read(_BLOCK_HEADER.size)
+            if len(head) < _BLOCK_HEADER.size:
+                return
+            magic, unit_id, count = _BLOCK_HEADER.unpack(head)
+            if magic != _BLOCK_MAGIC:
+                return
+            body = f.read(count * RECORD_DTYPE.itemsize)
+            if len(body) < count * RECORD_DTYPE.itemsize:
+                return
+            yield unit_id, body, f.tell()
+
+    def append(self, unit_id: int, records: np.ndarray):
+        records = np.ascontiguousarray(records, dtype=RECORD_DTYPE)
+        self._fh.write(_BLOCK_HEADER.pack(_BLOCK_MAGIC, unit_id, len(records)) + records.tobytes())
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.completed.add(unit_id)
+
+    def close(self):
+        self._fh.close()
+
+    @staticmethod
+    def read(path: str) -> np.ndarray:
+        """All records of a log as one RECORD_DTYPE array."""
+        with open(path, 'rb') as f:
+            f.read(_FILE_HEADER.size)
+            chunks = [body for _, body, _ in ResultStore._blocks(f)]
+        return np.frombuffer(b''.join(chunks), dtype=RECORD_DTYPE)
+
+
+# -------------------------------------------------------------------
+# RUNNER
+# -------------------------------------------------------------------
+def _run_unit(unit_id: int, param_index: int, params: Params, seeds: np.ndarray, max_rounds: int):
+    (a1, b1), (a2, b2) = params
+    engine = simulate_games(a1, b1, a2, b2, seeds, max_rounds=max_rounds)
+    records = np.empty(len(seeds), dtype=RECORD_DTYPE)
+    records['param']  = param_index
+    records['seed']   = seeds
+    records['winner'] = engine.winner
+    records['rounds'] = engine.rounds
+    return unit_id, records
+
+
+def run_sweep(
+    params: Sequence[Params],
+    seeds: Sequence[int],
+    path: str,
+    chunk_size: int = 1000,
+    workers: Optional[int] = None,
+    max_rounds: int = 200,
+    max_restarts: int = 3
+) -> int:
+    """
+    Play every (params, seed) game and append the results to the log at
+    path. Work is split into (param point, seed block) units fanned out
+    over a process pool; units already in the log are skipped, so an
+    interrupted sweep resumes by calling run_sweep again with the same
+    plan. A unit whose worker raises is left out of the log and retried
+    on the next run, and its error is reported in a RuntimeWarning; a
+    dead pool is restarted up to max_restarts times. Returns the number
+    of units still missing from the log.
+    """
+    seeds = np.asarray(seeds, dtype=np.int64)
+    store = ResultStore(path, _fingerprint(params, seeds), chunk_size)
+    workers = workers or os.cpu_count() or 1
+    failed: Dict[int, Exception] = {}
+    try:
+        pending = [u for u in _units(len(params), len(seeds), chunk_size) if u[0] not in store.completed]
+        for _ in range(max_restarts + 1):
+            pending = _drain(pending, params, seeds, store, workers, max_rounds, failed)
+            if not pending:
+                break
+        if failed:
+            lines = ''.join(f"\n  unit {unit_id}: {e!r}" for unit_id, e in sorted(failed.items()))
+            warnings.warn(f"{len(failed)} sweep unit(s) failed and were left out of {path}:{lines}", RuntimeWarning)
+        return sum(1 for u in _units(len(params), len(seeds), chunk_size) if u[0] not in store.completed)
+    finally:
+        store.close()
+
+
+def _drain(units, params, seeds, store, workers, max_rounds, failed) -> list:
+    """
+    Run units with a bounded in-flight window; returns units lost to a
+    broken pool. The error of each unit whose worker raised goes in
+    failed, by unit id.
+    """
+    queue = iter(units)
+    in_flight = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def submit():
+                for unit in itertools.islice(queue, 4 * workers - len(in_flight)):
+                    unit_id, p, lo, hi = unit
+                    fut = pool.submit(_run_unit, unit_id, p, params[p], seeds[lo:hi], max_rounds)
+                    in_flight[fut] = unit
+            submit()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    unit = in_flight.pop(fut)
+                    try:
+                        unit_id, records = fut.result()
+                    except BrokenProcessPool:
+                        in_flight[fut] = unit
+                        raise
+                    except Exception as e:
+                        failed[unit[0]] = e
+                        continue
+                    store.append(unit_id, records)
+                submit()
+    except BrokenProcessPool:
+        return list(in_flight.values()) + list(queue)
+    return []
+
+
+def summarize(records: np.ndarray, n_params: int) -> np.ndarray:
+    """Per param point: games played, Alice wins, Bob wins, mean rounds."""
+    games = np.bincount(records['param'], minlength=n_params)
+    alice = np.bincount(records['param'], weights=records['winner'] == 0, minlength=n_params)
+    bob   = np.bincount(records['param'], weights=records['winner'] == 1, minlength=n_params)
+    rounds = np.bincount(records['param'], weights=records['rounds'], minlength=n_params)
+    out = np.zeros(n_params, dtype=[('games', '<i8'), ('alice', '<i8'), ('bob', '<i8'), ('mean_rounds', '<f8')])
+    out['games'], out['alice'], out['bob'] = games, alice, bob
+    out['mean_rounds'] = rounds / np.maximum(games, 1)
+    return out
+
+
+
+# -------------------------------------------------------------------
+# PROFILING
+# -------------------------------------------------------------------
+def _profile_unit(params: Params, seeds: np.ndarray) -> dict:
+    from test import simulate_game
+    (a1, b1), (a2, b2) = params
+    stats, sink = EngineStats(), NullSink()
+    for seed in seeds:
+        simulate_game(a1, b1, a2, b2, seed=int(seed), sink=sink, stats=stats)
+    return stats.as_dict()
+
+
+def profile_games(
+    params: Sequence[Params],
+    seeds: Sequence[int],
+    chunk_size: int = 100,
+    workers: Optional[int] = None,
+    path: Optional[str] = None
+) -> EngineStats:
+    """
+    Play every (params, seed) game on the instrumented TradeEngine (the
+    batch engine has no per-phase hooks) over a process pool, and merge
+    the per-worker EngineStats. path saves the total as JSON.
+    """
+    seeds = np.asarray(seeds, dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+    total = EngineStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_profile_unit, params[p], seeds[lo:hi])
+                   for _, p, lo, hi in _units(len(params), len(seeds), chunk_size)]
+        for fut in futures:
+            total.merge(fut.result())
+    if path:
+        total.save(path)
+    return total
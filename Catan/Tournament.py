@@ -0,0 +1,257 @@
+# Tournament.py
+
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Players import Player, DICE_PROBABILITIES
+from Agents import ParameterizedTrader, TraderParams
+from FullEngine import TradeEngine
+from EventSinks import NullSink
+from BatchEngine import GOAL_QUEUE, simulate_games
+from RngStreams import GameStreams
+
+# initial tile resources per seat; the first two are test.simulate_game's Alice and Bob
+SEAT_TILES = [
+    ['lumber', 'brick', 'wool'],
+    ['ore', 'wool', 'grain'],
+    ['brick', 'grain', 'ore'],
+    ['wool', 'lumber', 'brick'],
+]
+
+INITIAL_RATING = 1500.0
+
+
+class Entrant(NamedTuple):
+    """A named Personality recipe: cls(**kwargs) makes a fresh one per game, in any process."""
+    name: str
+    cls: type
+    kwargs: Optional[Dict] = None
+
+    def make(self):
+        return self.cls(**(self.kwargs or {}))
+
+    @property
+    def batch_params(self) -> Optional[TraderParams]:
+        """(alpha, beta) if BatchEngine can play this entrant, else None."""
+        kwargs = self.kwargs or {}
+        if self.cls is ParameterizedTrader and not kwargs.get('use_bank', False):
+            return (kwargs['alpha'], kwargs['beta'])
+        return None
+
+
+class Standing(NamedTuple):
+    name: str
+    rating: float
+    games: int
+    wins: int
+    draws: int              # games without a winner
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+
+# (unit id, entrant index per seat, first seed, stop seed)
+Unit = Tuple[int, Tuple[int, ...], int, int]
+
+
+# -------------------------------------------------------------------
+# GAMES
+# -------------------------------------------------------------------
+def play_game(personalities: Sequence, seed: int, max_rounds: int = 200) -> Tuple[int, int]:
+    """
+    One game of len(personalities) seats, set up as test.simulate_game
+    with streams=True (with two seats it plays exactly that game, and
+    BatchEngine's for the seed): empty hands,
+    GOAL_QUEUE, three random-number tiles of SEAT_TILES per seat. Search
+    agents with a bind method are bound to the engine. Returns (winning
+    seat or -1, rounds played).
+    """
+    streams = GameStreams(seed)
+    players = [Player(f"P{i}", personality=pers) for i, pers in enumerate(personalities)]
+    for i, p in enumerate(players):
+        p.goal_queue = GOAL_QUEUE.copy()
+        p.resource_sources = [
+            (res, streams.tiles.choice(list(DICE_PROBABILITIES.keys())), False)
+            for res in SEAT_TILES[i % len(SEAT_TILES)]
+        ]
+    engine = TradeEngine(players, dice_rolls=None, rng=random.Random(seed), sink=NullSink(), streams=streams)
+    for pers in personalities:
+        if hasattr(pers, 'bind'):
+            pers.bind(engine)
+    try:
+        for round_num in range(1, max_rounds + 2):
+            engine.run_trading_round()
+            for i, p in enumerate(players):
+                if not p.goal_queue:
+                    return i, round_num
+        return -1, max_rounds + 1
+    finally:
+        for pers in personalities:
+            if hasattr(pers, 'close'):
+                pers.close()
+
+
+def play_unit(entrants: Sequence[Entrant], seeds: range, max_rounds: int = 200) -> np.ndarray:
+    """(len(seeds),) winning seat of every game of one seating; BatchEngine when both seats allow it."""
+    params = [e.batch_params for e in entrants]
+    if len(entrants) == 2 and None not in params:
+        (a1, b1), (a2, b2) = params
+        return simulate_games(a1, b1, a2, b2, list(seeds), max_rounds).winner
+    return np.array([play_game([e.make() for e in entrants], s, max_rounds)[0] for s in seeds], dtype=np.int64)
+
+
+def schedule(
+    n_entrants: int,
+    seats: int = 2,
+    games: int = 1000,
+    block: int = 2500,
+    all_seatings: bool = False,
+    base_seed: int = 0
+) -> Iterator[Unit]:
+    """
+    Every table of seats distinct entrants, in every rotation of its
+    seats (every permutation with all_seatings), each seating playing
+    seeds base_seed..base_seed+games-1 in blocks. Units go block by
+    block over all tables, so ratings firm up evenly as results arrive.
+    """
+    tables = []
+    for combo in itertools.combinations(range(n_entrants), seats):
+        if all_seatings:
+            tables.extend(itertools.permutations(combo))
+        else:
+            tables.extend(combo[k:] + combo[:k] for k in range(seats))
+    unit_id = 0
+    for lo in range(base_seed, base_seed + games, block):
+        hi = min(lo + block, base_seed + games)
+        for seating in tables:
+            yield unit_id, seating, lo, hi
+            unit_id += 1
+
+
+def _run_unit(unit: Unit, entrants: Sequence[Entrant], max_rounds: int):
+    unit_id, seating, lo, hi = unit
+    return unit_id, play_unit([entrants[i] for i in seating], range(lo, hi), max_rounds)
+
+
+# -------------------------------------------------------------------
+# TOURNAMENT
+# -------------------------------------------------------------------
+class Tournament:
+    """
+    Round robin over entrants with Elo ratings updated as results stream
+    in. Each unit (one seating, one seed block) counts as one rated match
+    per pair of its seats: a seat beats another in a game if it wins, and
+    they draw if someone else or no one wins. A seat's rating moves by
+    k_factor / (seats - 1) times its summed (mean score - expected) over
+    the other seats. Units are applied in schedule order whatever order
+    workers finish them in, so ratings don't depend on the pool size.
+    """
+
+    def __init__(
+        self,
+        entrants: Sequence[Entrant],
+        seats: int = 2,
+        games: int = 1000,
+        block: int = 2500,
+        all_seatings: bool = False,
+        k_factor: float = 16.0,
+        max_rounds: int = 200,
+        base_seed: int = 0
+    ):
+        if len(entrants) < seats:
+            raise ValueError(f"need at least {seats} entrants for {seats}-seat tables")
+        self.entrants = list(entrants)
+        self.seats = seats
+        self.units = list(schedule(len(entrants), seats, games, block, all_seatings, base_seed))
+        self.k_factor = k_factor
+        self.max_rounds = max_rounds
+
+        n = len(entrants)
+        self.ratings = np.full(n, INITIAL_RATING)
+        self.games = np.zeros(n, dtype=np.int64)
+        self.wins = np.zeros(n, dtype=np.int64)
+        self.draws = np.zeros(n, dtype=np.int64)
+        # summed pairwise score of row against column, and games between them
+        self.pair_score = np.zeros((n, n))
+        self.pair_games = np.zeros((n, n), dtype=np.int64)
+        self.done = 0
+
+    def record(self, seating: Sequence[int], winners: np.ndarray):
+        """Add one unit's winning seats (-1: none) for seating to the tallies and ratings."""
+        seating = np.asarray(seating)
+        k, g = len(seating), len(winners)
+        won = np.bincount(winners[winners >= 0], minlength=k)
+        self.games[seating] += g
+        self.wins[seating] += won
+        self.draws[seating] += int((winners < 0).sum())
+
+        # score[a, b]: mean over games of 1 (a won), 0 (b won), 0.5 (anyone else or no one)
+        score = 0.5 + (won[:, None] - won[None, :]) / (2.0 * g)
+        np.fill_diagonal(score, 0.0)
+        r = self.ratings[seating]
+        expected = 1.0 / (1.0 + 10.0 ** ((r[None, :] - r[:, None]) / 400.0))
+        np.fill_diagonal(expected, 0.0)
+        self.ratings[seating] += self.k_factor / (k - 1) * (score - expected).sum(axis=1)
+
+        off = ~np.eye(k, dtype=bool)
+        rows, cols = np.nonzero(off)
+        np.add.at(self.pair_score, (seating[rows], seating[cols]), score[off] * g)
+        np.add.at(self.pair_games, (seating[rows], seating[cols]), g)
+        self.done += 1
+
+    def run(
+        self,
+        workers: Optional[int] = None,
+        on_unit: Optional[Callable[['Tournament'], None]] = None
+    ) -> List[Standing]:
+        """
+        Play every unit not yet recorded. Units go to a process pool whose
+        idle workers take the next one from a shared queue (a bounded
+        window keeps memory flat); workers=1 plays in this process.
+        on_unit(self) is called after every recorded unit.
+        """
+        workers = workers or os.cpu_count() or 1
+        todo = iter(self.units[self.done:])
+        if workers == 1:
+            for unit in todo:
+                self.record(unit[1], _run_unit(unit, self.entrants, self.max_rounds)[1])
+                if on_unit:
+                    on_unit(self)
+            return self.standings()
+
+        ready: Dict[int, np.ndarray] = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            def submit():
+                for unit in itertools.islice(todo, 4 * workers - len(in_flight)):
+                    in_flight.add(pool.submit(_run_unit, unit, self.entrants, self.max_rounds))
+            submit()
+            while in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    unit_id, winners = fut.result()
+                    ready[unit_id] = winners
+                # apply in schedule order
+                while self.done < len(self.units) and self.units[self.done][0] in ready:
+                    self.record(self.units[self.done][1], ready.pop(self.units[self.done][0]))
+                    if on_unit:
+                        on_unit(self)
+                submit()
+        return self.standings()
+
+    def standings(self) -> List[Standing]:
+        """Entrants by rating, best first."""
+        order = np.argsort(-self.ratings, kind='stable')
+        return [Standing(self.entrants[i].name, float(self.ratings[i]), int(self.games[i]),
+                         int(self.wins[i]), int(self.draws[i])) for i in order]
+
+    def score_matrix(self) -> np.ndarray:
+        """(n, n) mean pairwise score of row against column, nan where they never met."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.pair_score / self.pair_games
@@ -0,0 +1,127 @@
+# Trades.py
+
+import itertools
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Players import RESOURCES, RES_INDEX, BANK_RATE, GENERIC_PORT_RATE, SPECIAL_PORT_RATE
+
+MAX_UNITS = 2           # units per side of a player-to-player offer
+
+KIND_BANK, KIND_PLAYER = 0, 1
+
+
+# -------------------------------------------------------------------
+# TRADE TABLE
+# -------------------------------------------------------------------
+def _bundles(max_units: int):
+    """Every non-empty resource bundle of at most max_units, as count tuples."""
+    n = len(RESOURCES)
+    for units in range(1, max_units + 1):
+        for combo in itertools.combinations_with_replacement(range(n), units):
+            yield tuple(combo.count(j) for j in range(n))
+
+
+def _build_table():
+    give, get, kind, rate = [], [], [], []
+    n = len(RESOURCES)
+    # bank and port trades: rate of one resource for one of another
+    for k in (SPECIAL_PORT_RATE, GENERIC_PORT_RATE, BANK_RATE):
+        for r in range(n):
+            for w in range(n):
+                if r != w:
+                    give.append(tuple(k if j == r else 0 for j in range(n)))
+                    get.append(tuple(1 if j == w else 0 for j in range(n)))
+                    kind.append(KIND_BANK)
+                    rate.append(k)
+    # player offers: disjoint bundles of up to MAX_UNITS each way
+    for g in _bundles(MAX_UNITS):
+        for w in _bundles(MAX_UNITS):
+            if not any(a and b for a, b in zip(g, w)):
+                give.append(g)
+                get.append(w)
+                kind.append(KIND_PLAYER)
+                rate.append(0)
+    return (np.array(give, dtype=np.int8), np.array(get, dtype=np.int8),
+            np.array(kind, dtype=np.int8), np.array(rate, dtype=np.int8))
+
+# one row per trade: what the trader gives, what it gets, bank/player, bank rate
+GIVE, GET, KIND, RATE = _build_table()
+GIVE_RES = GIVE.argmax(axis=1)      # the resource a bank trade gives
+
+# hands are clipped to the most any trade asks for, so feasibility is a table lookup
+CAPS = GIVE.max(axis=0).astype(np.int64)
+RADIX = np.cumprod(np.concatenate([[1], CAPS[:0:-1] + 1]))[::-1]
+
+def _build_feasible() -> np.ndarray:
+    hands = np.stack(np.meshgrid(*[np.arange(c + 1) for c in CAPS], indexing='ij'), -1).reshape(-1, len(CAPS))
+    return (GIVE[None, :, :] <= hands[:, None, :]).all(axis=2)
+
+# FEASIBLE[hand_code(hand), t]: the hand can pay trade t
+FEASIBLE = _build_feasible()
+
+
+def hand_code(hand: Sequence[int]) -> int:
+    return int(np.minimum(hand, CAPS) @ RADIX)
+
+
+@lru_cache(maxsize=None)
+def _rate_mask(rates: Tuple[int, ...], kinds: int) -> np.ndarray:
+    """Trades open to a player with these per-resource bank rates."""
+    mask = np.zeros(len(KIND), dtype=bool)
+    if kinds & (1 << KIND_BANK):
+        mask |= (KIND == KIND_BANK) & (RATE == np.array(rates, dtype=np.int8)[GIVE_RES])
+    if kinds & (1 << KIND_PLAYER):
+        mask |= KIND == KIND_PLAYER
+    return mask
+
+
+def legal_trades(hand: Sequence[int], rates: Sequence[int] = (BANK_RATE,) * len(RESOURCES), bank: bool = True, players: bool = True) -> np.ndarray:
+    """Indices of every trade the hand can pay for: bank trades at the given rates and/or player offers."""
+    kinds = (bank << KIND_BANK) | (players << KIND_PLAYER)
+    return np.flatnonzero(FEASIBLE[hand_code(hand)] & _rate_mask(tuple(rates), kinds))
+
+
+def trade_values(prices: Sequence[float], trades: np.ndarray) -> np.ndarray:
+    """Value of each trade at the given per-resource prices: what is got minus what is given."""
+    p = np.asarray(prices, dtype=np.float64)
+    return GET[trades] @ p - GIVE[trades] @ p
+
+
+def as_dicts(t: int) -> Tuple[Dict[str,int], Dict[str,int]]:
+    """Trade t in the {resource: count} form TradeEngine takes."""
+    return ({RESOURCES[j]: int(c) for j, c in enumerate(GIVE[t]) if c},
+            {RESOURCES[j]: int(c) for j, c in enumerate(GET[t]) if c})
+
+
+def as_vector(bundle: Dict[str,int]) -> np.ndarray:
+    v = np.zeros(len(RESOURCES), dtype=np.int64)
+    for r, c in bundle.items():
+        v[RES_INDEX[r]] = c
+    return v
+
+
+def is_bank_trade(give: Dict[str,int], get: Dict[str,int], rates: Sequence[int]) -> bool:
+    """give pays whole units at the player's rates and get is exactly that many other resources."""
+    if not give or not get or give.keys() & get.keys():
+        return False
+    units = 0
+    for r, c in give.items():
+        k = rates[RES_INDEX[r]]
+        if c <= 0 or c % k:
+            return False
+        units += c // k
+    return all(c > 0 for c in get.values()) and units == sum(get.values())
+
+
+def best_bank_trade(player, min_gain: float = 0.0) -> Optional[Tuple[Dict[str,int], Dict[str,int]]]:
+    """The legal bank/port trade with the highest shadow-price gain, if it beats min_gain."""
+    trades = legal_trades(player.hand_vector(), player.trade_rates, players=False)
+    if not len(trades):
+        return None
+    prices = player.shadow_prices()
+    values = trade_values([prices[r] for r in RESOURCES], trades)
+    best = int(values.argmax())
+    return as_dicts(int(trades[best])) if values[best] > min_gain else None
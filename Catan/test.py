@@ -3,7 +3,10 @@
 from Players import Player, RESOURCES, DICE_PROBABILITIES
 from FullEngine import TradeEngine
 from Agents import ParameterizedTrader
+from EventSinks import EventSink, ConsoleSink
+from EngineStats import EngineStats
 import random
+import sys
 
 # Fixed goal queue
 GOAL_QUEUE = ['road', 'settlement', 'city', 'dev_card']
@@ -11,38 +14,60 @@ GOAL_QUEUE = ['road', 'settlement', 'city', 'dev_card']
 def simulate_game(
     alpha1: float, beta1: float,
     alpha2: float, beta2: float,
-    seed: int = 42
+    seed: int = 42,
+    sink: EventSink = None,
+    streams: bool = False,
+    board: bool = False,
+    stats: EngineStats = None
 ):
+    # streams=True draws dice, tiles and shuffles from per-round GameStreams
+    # instead of one shared Random; initial tiles come from round 0
+    # board=True plays on a random layout for seed, with snake-drafted
+    # openings (Opening.place_opening) instead of random initial tiles
+    # stats: an EngineStats the engine adds its phase timings and counters to
+    # streams, boards and the replay/analytics menu import their (numpy)
+    # modules on use, so workers that only play plain games start fast
+    if streams:
+        from RngStreams import GameStreams
+    game_streams = GameStreams(seed) if streams else None
     rng = random.Random(seed)
+    sink = sink or ConsoleSink()
+    tile_rng = game_streams.tiles if streams else rng
 
     # Create players with individual (alpha, beta)
     p1 = Player("Alice", personality=ParameterizedTrader(alpha1, beta1))
     p2 = Player("Bob",   personality=ParameterizedTrader(alpha2, beta2))
 
-    # --- Fixed initial tiles ---
-    p1.resources = {r: 0 for r in RESOURCES}
-    p1.resource_sources = [
-        (res, rng.choice(list(DICE_PROBABILITIES.keys())), False)
-        for res in ['lumber', 'brick', 'wool']
-    ]
-    p1.buildings  = []
-    p1.goal_queue = GOAL_QUEUE.copy()
-
-    p2.resources = {r: 0 for r in RESOURCES}
-    p2.resource_sources = [
-        (res, rng.choice(list(DICE_PROBABILITIES.keys())), False)
-        for res in ['ore', 'wool', 'grain']
-    ]
-    p2.buildings  = []
-    p2.goal_queue = GOAL_QUEUE.copy()
-    # ---------------------------
+    for p in (p1, p2):
+        p.resources = {r: 0 for r in RESOURCES}
+        p.buildings  = []
+        p.goal_queue = GOAL_QUEUE.copy()
+
+    game_board = None
+    if board:
+        from BoardGraph import GameBoard
+        from Layouts import generate_layouts
+        from Opening import place_opening
+        game_board = GameBoard(generate_layouts(1, seed).layout(0), 2)
+        place_opening(game_board, [p1, p2])
+    else:
+        # --- Fixed initial tiles ---
+        p1.resource_sources = [
+            (res, tile_rng.choice(list(DICE_PROBABILITIES.keys())), False)
+            for res in ['lumber', 'brick', 'wool']
+        ]
+        p2.resource_sources = [
+            (res, tile_rng.choice(list(DICE_PROBABILITIES.keys())), False)
+            for res in ['ore', 'wool', 'grain']
+        ]
+        # ---------------------------
 
     initial_tiles = {
         p1.name: list(p1.resource_sources),
         p2.name: list(p2.resource_sources),
     }
 
-    engine = TradeEngine([p1, p2], dice_rolls=None, rng=rng)
+    engine = TradeEngine([p1, p2], dice_rolls=None, rng=rng, sink=sink, streams=game_streams, board=game_board, stats=stats)
 
     rounds_log = []
     round_num = 0
@@ -50,35 +75,50 @@ def simulate_game(
     while True:
         round_num += 1
         roll, trades, builds = engine.run_trading_round()
-        tiles_snapshot = {
-            p1.name: list(p1.resource_sources),
-            p2.name: list(p2.resource_sources),
-        }
 
+        # only tile changes are logged; see replay_tiles
         rounds_log.append({
             'round': round_num,
             'roll': roll,
             'trades': trades,
             'builds': builds,
-            'tiles': tiles_snapshot
+            'tile_changes': engine.tile_changes
         })
 
         for p in (p1, p2):
             if not p.goal_queue:
-                print(f"\n!!! {p.name} wins in {round_num} rounds !!!\n")
+                sink.on_game_over(p.name, round_num)
                 return rounds_log, p.name, initial_tiles
 
         if round_num > 200:
-            print("\n--- No winner after 200 rounds ---\n")
+            sink.on_game_over(None, round_num)
             return rounds_log, None, initial_tiles
 
-def main():
-    # Example: Alice is greedy (alpha=1.3, beta=1.3), Bob is fair (alpha=1.0, beta=0.9)
-    rounds_log, winner, initial_tiles = simulate_game(
-        alpha1=0.5, beta1=0.5,
-        alpha2=3.0, beta2=3,
-        seed=42
-    )
+def replay_tiles(rounds_log, initial_tiles):
+    """Yield (log entry, tiles per player after that round) from the logged deltas."""
+    tiles = {name: list(t) for name, t in initial_tiles.items()}
+    for e in rounds_log:
+        for name, added, upgraded in e['tile_changes']:
+            for i in upgraded:
+                res, dice, _ = tiles[name][i]
+                tiles[name][i] = (res, dice, True)
+            tiles[name].extend(added)
+        yield e, tiles
+
+def main(replay_path=None):
+    from Replay import Replay
+    import Analytics
+    if replay_path:
+        # a game recorded with Replay.Recorder, read round by round as the menu asks
+        rounds_log = Replay(replay_path)
+        winner, initial_tiles = rounds_log.winner, rounds_log.initial_tiles()
+    else:
+        # Example: Alice is greedy (alpha=1.3, beta=1.3), Bob is fair (alpha=1.0, beta=0.9)
+        rounds_log, winner, initial_tiles = simulate_game(
+            alpha1=0.5, beta1=0.5,
+            alpha2=3.0, beta2=3,
+            seed=42
+        )
 
     MENU = """
 Select what to display:
@@ -111,10 +151,10 @@ Select what to display:
                     typ = "City" if is_city else "Settlement"
                     print(f"   - {res} @ {dice} ({typ})")
             print()
-            for e in rounds_log:
+            for e, round_tiles in replay_tiles(rounds_log, initial_tiles):
                 if e['builds']:
                     print(f"After round {e['round']}:")
-                    for name, tiles in e['tiles'].items():
+                    for name, tiles in round_tiles.items():
                         print(f" {name}:")
                         for res, dice, is_city in tiles:
                             typ = "City" if is_city else "Settlement"
@@ -122,13 +162,12 @@ Select what to display:
                     print()
         elif choice == '4':
             print("\n-- Tile Income Events --")
-            for e in rounds_log:
-                roll = e['roll']
-                for name, tiles in e['tiles'].items():
-                    for res, dice, is_city in tiles:
-                        if dice == roll:
-                            amt = 2 if is_city else 1
-                            print(f"Round {e['round']}: {name}'s {res}@{dice} produced {amt}")
+            game = rounds_log if isinstance(rounds_log, Replay) else (rounds_log, winner, initial_tiles)
+            log = Analytics.from_games([game])
+            income = Analytics.income_events(log)
+            dice = log.tiles.dice[income.tile]
+            for r, seat, res, d, amt in zip(income.round, income.seat, income.resource, dice, income.amount):
+                print(f"Round {r}: {log.names[seat]}'s {RESOURCES[res]}@{d} produced {amt}")
             print()
         elif choice == 'q':
             print("Exiting.")
@@ -139,4 +178,4 @@ Select what to display:
     print(f"Simulation complete. Winner: {winner}")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)